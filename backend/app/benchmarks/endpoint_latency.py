@@ -0,0 +1,72 @@
+import argparse
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Latency benchmark for the graph endpoints under mixed concurrent load.
+# Sends a mix of slow (/read-db-graph) and fast (Sankey, evidence, date filter) requests
+# from several client threads and prints p50/p95/p99 per endpoint.
+# Run it once before and once after a backend change to compare tail latency:
+#   python benchmarks/endpoint_latency.py --url http://localhost:8080 --requests 400 --concurrency 16
+
+MIXED_LOAD = [
+    ("/read-db-graph", 1),
+    ("/sankey-communication-flows", 4),
+    ("/sankey-communication-flows?start_date=2040-10-01T00:00:00&end_date=2040-10-05T00:00:00", 4),
+    ("/evidence-for-event?event_id=Event_Monitoring_0", 4),
+    ("/filter-by-date?date=2040-10-03", 4),
+    ("/event-entities", 2),
+]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def call(base_url, path):
+    start = time.perf_counter()
+    if path == "/event-entities":
+        body = json.dumps(["Event_Monitoring_0", "Event_Assessment_600"]).encode()
+        req = urllib.request.Request(base_url + path, data=body, headers={"Content-Type": "application/json"})
+    else:
+        req = urllib.request.Request(base_url + path)
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        size = len(resp.read())
+    return path, time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-load latency benchmark")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    schedule = []
+    while len(schedule) < args.requests:
+        for path, weight in MIXED_LOAD:
+            schedule += [path] * weight
+    schedule = schedule[:args.requests]
+
+    timings = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for path, seconds, _ in pool.map(lambda p: call(args.url, p), schedule):
+            timings.setdefault(path.split("?")[0], []).append(seconds * 1000)
+    total = time.perf_counter() - start
+
+    all_ms = [ms for values in timings.values() for ms in values]
+    print(f"{len(all_ms)} requests in {total:.1f}s ({len(all_ms) / total:.1f} req/s), concurrency {args.concurrency}")
+    print(f"{'endpoint':<32}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for path, values in sorted(timings.items()):
+        print(f"{path:<32}{len(values):>6}{percentile(values, 50):>10.1f}{percentile(values, 95):>10.1f}{percentile(values, 99):>10.1f}")
+    print(f"{'all':<32}{len(all_ms):>6}{percentile(all_ms, 50):>10.1f}{percentile(all_ms, 95):>10.1f}{percentile(all_ms, 99):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from neo4j import GraphDatabase
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.graph_loader import DATA_PATH, read_graph_file, apply_delta, full_load, delta_load
+
+# Benchmark for the graph loader: full load vs delta load.
+# Loads the data file completely, then applies a synthetic delta (--changes messages with a new
+# content and --changes new messages between random entities) as a delta load, and also times a
+# delta load without any change. Prints wall time and rows written per phase.
+# REPLACES THE LOADED GRAPH. Run inside the backend container:
+#   python benchmarks/graph_load.py --runs 3 --changes 20
+
+NEO4J_URI = "bolt://" + os.environ.get('DB_HOST', 'localhost') + ":7687"
+NEO4J_USER = "neo4j"
+NEO4J_PASSWORD = os.environ.get('DB_PASSWORD')
+
+
+def synthetic_delta(data, changes, seed=0):
+    rng = random.Random(seed)
+    communications = [n for n in data["nodes"] if n.get("sub_type") == "Communication"]
+    entities = [n["id"] for n in data["nodes"] if n.get("type") == "Entity"]
+    nodes = [dict(node, content=f"{node.get('content', '')} (edited)") for node in rng.sample(communications, changes)]
+    edges = []
+    for i in range(changes):
+        template = rng.choice(communications)
+        comm_id = f"Event_Communication_delta_{i}"
+        nodes.append(dict(template, id=comm_id, content=f"Delta message {i}"))
+        edges.append({"id": f"delta_sent_{i}", "type": "sent", "source": rng.choice(entities), "target": comm_id})
+        edges.append({"id": f"delta_received_{i}", "type": "received", "source": comm_id, "target": rng.choice(entities)})
+    return {"nodes": nodes, "edges": edges}
+
+
+def timed(label, runs, load):
+    timings = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = load()
+        timings.append(time.perf_counter() - start)
+    written = {phase: stats.get("rows") for phase, stats in result["stats"].items() if "rows" in stats}
+    print(f"{label:<22} {statistics.median(timings):8.2f} s   rows written {written}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default=DATA_PATH)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--changes", type=int, default=20)
+    args = parser.parse_args()
+
+    data = read_graph_file(args.path)
+    changed = apply_delta(data, synthetic_delta(data, args.changes))
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        timed("full load", args.runs, lambda: full_load(driver, data))
+        timed("delta load (no change)", args.runs, lambda: delta_load(driver, data))
+
+        # Every delta run starts from the original graph
+        timings = []
+        for _ in range(args.runs):
+            delta_load(driver, data)
+            start = time.perf_counter()
+            result = delta_load(driver, changed)
+            timings.append(time.perf_counter() - start)
+        print(f"{'delta load':<22} {statistics.median(timings):8.2f} s   diff {result['stats']['diff']}")
+        timed("full load (changed)", args.runs, lambda: full_load(driver, changed))
+    finally:
+        delta_load(driver, data)
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
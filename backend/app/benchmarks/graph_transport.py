@@ -0,0 +1,60 @@
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.graph_columnar import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, ARROW_MEDIA_TYPE, encode_response
+
+# Benchmark for the graph transport formats.
+# Fetches a graph endpoint of a running backend once as JSON, then encodes that response as
+# JSON, columnar MessagePack and columnar Arrow IPC in-process (serialisation time, bytes, gzip bytes)
+# and finally downloads it in every format through the Accept header (bytes on the wire, fetch time).
+# Run against a loaded backend:
+#   python benchmarks/graph_transport.py --url http://localhost:8080 --path /read-db-graph
+
+FORMATS = [JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, ARROW_MEDIA_TYPE]
+
+
+def fetch(url, media_type):
+    request = urllib.request.Request(url, headers={"Accept": media_type})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=300) as resp:
+        body = resp.read()
+    return body, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--path", default="/read-db-graph")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    url = args.url.rstrip("/") + args.path
+
+    content = json.loads(fetch(url, JSON_MEDIA_TYPE)[0])
+    print(f"Encoding {args.path} in-process")
+    for media_type in FORMATS:
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            body = encode_response(content, media_type)
+            timings.append(time.perf_counter() - start)
+        print(f"  {media_type:<38} {statistics.median(timings) * 1000:8.1f} ms   "
+              f"{len(body) / 1e6:6.2f} MB   gzip {len(gzip.compress(body)) / 1e6:6.2f} MB")
+
+    print(f"Fetching {args.path} (encoded bodies are cached per graph version)")
+    for media_type in FORMATS:
+        timings = []
+        for _ in range(args.runs):
+            body, seconds = fetch(url, media_type)
+            timings.append(seconds)
+        print(f"  {media_type:<38} {statistics.median(timings) * 1000:8.1f} ms   {len(body) / 1e6:6.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
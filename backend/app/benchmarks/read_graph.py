@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.request
+
+from neo4j import AsyncGraphDatabase
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.graph_snapshot import read_graph_snapshot
+
+# Benchmark for /read-db-graph.
+# Compares the old five-query read (aggregated read plus a second full origin read) with the
+# single-pass graph snapshot: wall time, response size in bytes and whether both return the same views.
+# With --url the running endpoint is timed as well, cached and in both streaming modes.
+# Run inside the backend container on a loaded database:
+#   python benchmarks/read_graph.py --runs 10 --url http://localhost:8080
+
+NEO4J_URI = "bolt://" + os.environ.get('DB_HOST', 'localhost') + ":7687"
+NEO4J_USER = "neo4j"
+NEO4J_PASSWORD = os.environ.get('DB_PASSWORD')
+
+
+async def _read_records(driver, query):
+    async with driver.session() as session:
+        result = await session.run(query)
+        return [record async for record in result]
+
+
+# The original implementation, kept here as the reference output
+async def legacy_read_db_graph(driver):
+    node_records, comm_records, edge_records, origin_node_records, origin_edge_records = await asyncio.gather(
+        _read_records(driver, "MATCH (n) WHERE NOT (n:Event AND n.sub_type = 'Communication') RETURN n"),
+        _read_records(driver, """
+            MATCH (sender:Entity)-[:sent]->(comm:Event {sub_type: 'Communication'})-[:received]->(receiver:Entity)
+            RETURN sender.id AS source, receiver.id AS target, collect(comm.content) AS contents, collect(comm.id) AS event_ids, count(*) AS count, collect(comm.timestamp) AS timestamps
+        """),
+        _read_records(driver, """
+            MATCH (a)-[r]->(b)
+            WHERE NOT (type(r) = 'COMMUNICATION' AND a:Entity AND b:Entity)
+            RETURN a.id AS source, b.id AS target, r, r.id AS rel_id, r.type AS rel_type
+        """),
+        _read_records(driver, "MATCH (n) RETURN n"),
+        _read_records(driver, "MATCH (a)-[r]->(b) RETURN a.id AS source, b.id AS target, r"),
+    )
+    nodes = [{**dict(record["n"].items()), "id": record["n"].get("id")} for record in node_records]
+    comm_nodes = []
+    comm_edges = []
+    for rec in comm_records:
+        agg_id = f"Communication between {rec['source']} and {rec['target']}"
+        comm_nodes.append({
+            "id": agg_id, "type": "Event", "source": rec["source"], "target": rec["target"],
+            "count": rec["count"], "contents": rec["contents"], "event_ids": rec["event_ids"],
+            "timestamps": rec["timestamps"], "sub_type": "Communication"
+        })
+        comm_edges.append({"source": rec["source"], "target": agg_id, "type": "Event", "sub_type": "Communication", "is_edge": "Y"})
+        comm_edges.append({"source": agg_id, "target": rec["target"], "type": "Event", "sub_type": "Communication", "is_edge": "Y"})
+    edges = []
+    for record in edge_records:
+        edge_data = dict(record["r"].items())
+        edge_data["source"] = record["source"]
+        edge_data["target"] = record["target"]
+        edge_data["id"] = record["rel_id"]
+        edge_data["type"] = record["rel_type"] if record["rel_type"] else "Event edges"
+        edges.append(edge_data)
+    origin_nodes = [{**dict(record["n"].items()), "id": record["n"].get("id")} for record in origin_node_records]
+    origin_edges = [
+        {**dict(record["r"].items()), "source": record["source"], "target": record["target"]}
+        for record in origin_edge_records
+    ]
+    return {"nodes": origin_nodes, "links": origin_edges, "comm_nodes": nodes + comm_nodes, "comm_links": edges + comm_edges}
+
+
+async def snapshot_read_db_graph(driver):
+    snapshot = await read_graph_snapshot(driver)
+    raw = snapshot.raw_view()
+    aggregated = snapshot.aggregated_view()
+    return {"nodes": raw["nodes"], "links": raw["links"], "comm_nodes": aggregated["nodes"], "comm_links": aggregated["links"]}
+
+
+def _canonical(items):
+    return sorted(json.dumps(item, sort_keys=True, default=str) for item in items)
+
+
+def _canonical_comm_node(node):
+    # Collect order inside an aggregate is not defined by Cypher
+    if "event_ids" in node:
+        node = {**node, "contents": sorted(node["contents"]), "event_ids": sorted(node["event_ids"]),
+                "timestamps": sorted(node["timestamps"])}
+    return node
+
+
+def compare(legacy, snapshot):
+    for key in ["nodes", "links", "comm_links"]:
+        same = _canonical(legacy[key]) == _canonical(snapshot[key])
+        print(f"  {key:<11} legacy={len(legacy[key]):>6} snapshot={len(snapshot[key]):>6} {'identical' if same else 'DIFFERENT'}")
+    same = _canonical(map(_canonical_comm_node, legacy["comm_nodes"])) == \
+        _canonical(map(_canonical_comm_node, snapshot["comm_nodes"]))
+    print(f"  {'comm_nodes':<11} legacy={len(legacy['comm_nodes']):>6} snapshot={len(snapshot['comm_nodes']):>6} {'identical' if same else 'DIFFERENT'}")
+
+
+async def time_reads(driver, runs):
+    results = {}
+    for name, read in [("legacy", legacy_read_db_graph), ("snapshot", snapshot_read_db_graph)]:
+        await read(driver)  # warm up the page cache and the query plans
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            response = await read(driver)
+            timings.append(time.perf_counter() - start)
+        size = len(json.dumps({"success": True, **response}, default=str).encode())
+        results[name] = response
+        print(f"{name:<9} median {statistics.median(timings) * 1000:8.1f} ms   min {min(timings) * 1000:8.1f} ms   "
+              f"response {size / 1e6:6.2f} MB")
+    compare(results["legacy"], results["snapshot"])
+
+
+# Cached JSON, chunked JSON stream and NDJSON stream, gzip-compressed on the wire.
+# Reports time to first byte, total time and bytes received.
+ENDPOINT_MODES = [
+    ("cached", "/read-db-graph", {}),
+    ("stream", "/read-db-graph?stream=true", {"Accept-Encoding": "gzip"}),
+    ("ndjson", "/read-db-graph", {"Accept": "application/x-ndjson", "Accept-Encoding": "gzip"}),
+]
+
+
+def time_endpoint(url, runs):
+    for name, path, headers in ENDPOINT_MODES:
+        first_bytes = []
+        timings = []
+        size = 0
+        for _ in range(runs + 1):
+            start = time.perf_counter()
+            with urllib.request.urlopen(urllib.request.Request(url + path, headers=headers), timeout=300) as resp:
+                first = resp.read(1)
+                first_bytes.append(time.perf_counter() - start)
+                size = len(first) + len(resp.read())
+            timings.append(time.perf_counter() - start)
+        first_bytes, timings = first_bytes[1:], timings[1:]
+        print(f"{name:<9} median {statistics.median(timings) * 1000:8.1f} ms   "
+              f"first byte {statistics.median(first_bytes) * 1000:8.1f} ms   response {size / 1e6:6.2f} MB")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--url", default=None, help="also time GET /read-db-graph of a running backend")
+    args = parser.parse_args()
+
+    driver = AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        await time_reads(driver, args.runs)
+    finally:
+        await driver.close()
+    if args.url:
+        time_endpoint(args.url.rstrip("/"), args.runs)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
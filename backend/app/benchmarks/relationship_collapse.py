@@ -0,0 +1,179 @@
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from neo4j import GraphDatabase
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.bulk_loader import BulkLoader
+from services.relationship_collapse import collapse_relationships
+
+# Benchmark for the Relationship collapse step.
+# Loads MC3_graph.json twice, once with the old per-relationship Cypher loop and once
+# with the in-memory collapse, and checks that both produce the same Entity-Entity edges.
+# Afterwards the in-memory collapse is timed on 1x/10x/100x copies of the dataset.
+# Run inside the backend container: python benchmarks/relationship_collapse.py
+# Warning: this clears the database, reload the graph afterwards.
+
+NEO4J_URI = "bolt://" + os.environ.get('DB_HOST', 'localhost') + ":7687"
+NEO4J_USER = "neo4j"
+NEO4J_PASSWORD = os.environ.get('DB_PASSWORD')
+
+
+# The original implementation, kept here as the reference output
+def legacy_create_relationship_edges(tx):
+    relationships = tx.run("MATCH (r:Relationship) RETURN r").data()
+    edge_counter = {}
+
+    for record in relationships:
+        r = record['r']
+        r_id = r['id']
+        sub_type = r.get('sub_type', 'RELATIONSHIP')
+        base_props = dict(r)
+
+        entities = tx.run("""
+            MATCH (e:Entity)-[]-(r:Relationship {id: $r_id})
+            RETURN e.id AS entity_id
+        """, r_id=r_id).data()
+        entity_ids = [e['entity_id'] for e in entities]
+
+        evidence = tx.run("""
+            MATCH (comm:Event {sub_type: 'Communication'})-[:evidence_for]->(r:Relationship {id: $r_id})
+            RETURN collect(comm.content) AS contents,
+                   count(comm) AS count,
+                   collect(comm.id) AS comm_ids
+        """, r_id=r_id).single()
+
+        if evidence:
+            base_props["evidence_count"] = evidence["count"]
+            base_props["evidence_contents"] = evidence["contents"]
+            base_props["CommIDs"] = evidence["comm_ids"]
+        else:
+            base_props["evidence_count"] = 0
+            base_props["evidence_contents"] = []
+            base_props["CommIDs"] = []
+
+        source_entities = tx.run("""
+            MATCH (e:Entity)-[]->(r:Relationship {id: $r_id})
+            RETURN collect(DISTINCT e.id) AS sources
+        """, r_id=r_id).single()["sources"]
+
+        target_entities = tx.run("""
+            MATCH (r:Relationship {id: $r_id})-[]->(e:Entity)
+            RETURN collect(DISTINCT e.id) AS targets
+        """, r_id=r_id).single()["targets"]
+
+        base_props["source"] = source_entities
+        base_props["target"] = target_entities
+        base_props["directed"] = len(source_entities) == 1 and len(target_entities) == 1
+
+        for i in range(len(entity_ids)):
+            for j in range(i + 1, len(entity_ids)):
+                source = entity_ids[i]
+                target = entity_ids[j]
+                key = tuple(sorted((source, target)))
+
+                props = base_props.copy()
+                edge_counter[key] = edge_counter.get(key, 0) + 1
+                props["number"] = edge_counter[key]
+
+                tx.run(f"""
+                    MATCH (a:Entity {{id: $source}}), (b:Entity {{id: $target}})
+                    MERGE (a)-[rel:`{sub_type}`]->(b)
+                    SET rel += $props
+                """, source=source, target=target, props=props)
+
+        tx.run("MATCH (r:Relationship {id: $r_id}) DETACH DELETE r", r_id=r_id)
+
+
+# Entity-Entity edges in a direction-independent form, list properties compared as multisets
+def snapshot(driver):
+    with driver.session() as session:
+        records = session.run("""
+            MATCH (a:Entity)-[r]->(b:Entity)
+            RETURN a.id AS a, b.id AS b, type(r) AS type, properties(r) AS props
+        """).data()
+    edges = Counter()
+    for rec in records:
+        props = {
+            k: tuple(sorted(map(str, v))) if isinstance(v, list) else v
+            for k, v in rec["props"].items()
+        }
+        pair = tuple(sorted((rec["a"], rec["b"])))
+        edges[(pair, rec["type"], tuple(sorted(props.items())))] += 1
+    return edges
+
+
+def run_legacy(driver, data):
+    loader = BulkLoader(driver)
+    loader.clear()
+    loader.load_nodes(data["nodes"])
+    loader.load_edges([e for e in data["edges"] if "source" in e and "target" in e])
+    start = time.perf_counter()
+    with driver.session() as session:
+        session.execute_write(legacy_create_relationship_edges)
+    return time.perf_counter() - start
+
+
+def run_collapse(driver, data):
+    loader = BulkLoader(driver)
+    loader.clear()
+    start = time.perf_counter()
+    nodes, edges, relationship_edges = collapse_relationships(data["nodes"], data["edges"])
+    loader.load_nodes(nodes)
+    loader.load_edges([e for e in edges if "source" in e and "target" in e])
+    loader.load_edge_rows(relationship_edges, phase="relationships")
+    return time.perf_counter() - start
+
+
+# Copy the dataset n times with suffixed ids to check that the collapse scales linearly
+def scaled(data, n):
+    nodes, edges = [], []
+    for i in range(n):
+        suffix = f"#{i}" if i else ""
+        nodes += [dict(node, id=node["id"] + suffix) for node in data["nodes"]]
+        edges += [dict(e, source=e["source"] + suffix, target=e["target"] + suffix) for e in data["edges"]]
+    return {"nodes": nodes, "edges": edges}
+
+
+def main():
+    with open("MC3_graph.json", "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        legacy_seconds = run_legacy(driver, json.loads(json.dumps(data)))
+        legacy = snapshot(driver)
+        collapse_seconds = run_collapse(driver, json.loads(json.dumps(data)))
+        collapsed = snapshot(driver)
+    finally:
+        driver.close()
+
+    print(f"legacy collapse:    {legacy_seconds:.2f}s ({sum(legacy.values())} edges)")
+    print(f"in-memory collapse: {collapse_seconds:.2f}s incl. node/edge load ({sum(collapsed.values())} edges)")
+    missing = legacy - collapsed
+    extra = collapsed - legacy
+    if missing or extra:
+        print(f"MISMATCH: {sum(missing.values())} edges missing, {sum(extra.values())} unexpected")
+        for key in list(missing)[:5]:
+            print("  missing:", key[:2])
+        for key in list(extra)[:5]:
+            print("  unexpected:", key[:2])
+    else:
+        print("Output matches the legacy implementation.")
+
+    for n in [1, 10, 100]:
+        big = scaled(data, n)
+        relationships = sum(1 for node in big["nodes"] if node.get("type") == "Relationship")
+        start = time.perf_counter()
+        collapse_relationships(big["nodes"], big["edges"])
+        seconds = time.perf_counter() - start
+        print(f"{n:>3}x: {relationships} relationships collapsed in {seconds:.3f}s")
+
+    return 1 if missing or extra else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,9 @@
+import time
+START_TIME = time.perf_counter()
+
 import argparse
+import asyncio
+import os
 import sys
 import uvicorn
 from fastapi import FastAPI
@@ -7,16 +12,41 @@ from contextlib import asynccontextmanager
 
 
 from routes.router import router
+from services.database import init_driver, close_driver, init_async_driver, close_async_driver
+from services.models import registry
+from services.schema import ensure_schema
+
+# Load the search models in the background after startup (set to "false" to load on first use)
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "true").lower() != "false"
+
+# Create missing constraints and indexes; the backend still starts if the database is not up yet
+def _ensure_schema(driver):
+    try:
+        ensure_schema(driver)
+    except Exception as e:
+        print(f"Could not set up the database schema: {e}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # App startup
     print("Starting backend...")
+    driver = init_driver()
+    init_async_driver()
+    schema_task = asyncio.create_task(asyncio.to_thread(_ensure_schema, driver))
+    registry.startup_seconds = round(time.perf_counter() - START_TIME, 2)
+    print(f"Backend ready to serve after {registry.startup_seconds}s")
+    warmup = asyncio.create_task(asyncio.to_thread(registry.warm_up)) if MODEL_WARMUP else None
 
     yield
     
     # App shutdown
     print("Shutting down backend...")
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    if not schema_task.done():
+        schema_task.cancel()
+    close_driver()
+    await close_async_driver()
 
 def main(args):
     print("Starting uvicorn")
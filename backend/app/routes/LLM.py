@@ -1,21 +1,20 @@
-from fastapi import APIRouter, Query
-from neo4j import GraphDatabase
-from langchain.chains import RetrievalQA
-from langchain.vectorstores import Neo4jVector
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.llms import GPT4All  # or Ollama, LLaMA, etc.
+from fastapi import APIRouter, Query, Depends
+from neo4j import Driver
+
+from services.database import get_driver
 
 router = APIRouter()
-# Credentials
-NEO4J_URI = "bolt://" + os.environ.get('DB_HOST') + ":7687"
-NEO4J_USER = "neo4j"
-NEO4J_PASSWORD = os.environ.get('DB_PASSWORD')
 
 @router.get("/ask")
-def ask_question(question: str):
+def ask_question(question: str, driver: Driver = Depends(get_driver)):
     print(f"Received question: {question}")
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
     try:
+        # langchain and the local LLM are heavy, only import them when a question is asked
+        from langchain.chains import RetrievalQA
+        from langchain.vectorstores import Neo4jVector
+        from langchain.embeddings import HuggingFaceEmbeddings
+        from langchain.llms import GPT4All  # or Ollama, LLaMA, etc.
+
         vectorstore = Neo4jVector(
             driver=driver,
             embedding=HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"),
@@ -32,5 +31,3 @@ def ask_question(question: str):
 
     except Exception as e:
         return {"success": False, "error": str(e)}
-    finally:
-        driver.close()
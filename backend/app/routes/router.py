@@ -1,27 +1,51 @@
-import random
-from fastapi import APIRouter, Query
+import asyncio
+from fastapi import APIRouter, Query, Depends, Request
 from fastapi.responses import HTMLResponse, JSONResponse
-from typing import Optional, List, Dict, Any
-from neo4j import GraphDatabase
-import networkx as nx
-from networkx.readwrite import json_graph
+from typing import Optional, List
+from neo4j import AsyncDriver
 import os
-import time
-import pandas as pd
-from fastapi import BackgroundTasks
-import json
-from collections import defaultdict
-
-# Credentials
-NEO4J_URI = "bolt://" + os.environ.get('DB_HOST') + ":7687"
-NEO4J_USER = "neo4j"
-NEO4J_PASSWORD = os.environ.get('DB_PASSWORD')
+from services.graph_loader import data_file, forget_loaded_graph
+from services.jobs import start_load_job, get_job, cancel_job, list_jobs, last_job_id, load_lock, JobBusy
+from services.load_status import read_load_status
+from services.database import get_async_driver, pool_stats
+from services.models import registry
+from services.schema import schema_status, explain_hot_queries
+from services.graph_cache import graph_cache, bump_graph_version
+from services.comm_cube import comm_cube_cache, parse_granularity, hour_label, HOUR_SECONDS
+from services.timestamps import public_properties, day_range, range_bounds, epoch_label
+from services.analytics import analytics_cache
+from services.flows import FLOW_LEVELS, pair_flows, flow_labels, sankey_links
+from services.pseudonyms import pseudonym_cache
+from services.topics import topic_cache
+from services.entity_groups import entity_groups, collapsed_graph_cache, save_group, delete_group, UnknownGroup
+from services.search import MESSAGE_QUERY_PREFIX, EVENT_QUERY_PREFIX, query_encoder, refresh_corpus
+from services.text_index import reciprocal_rank_fusion
+from services.graph_stream import stream_nodes, stream_edges, stream_typed_nodes, stream_typed_edges, AggregatedStream
+from services.streaming import stream_sections, wants_ndjson
 
 router = APIRouter()
 
 # Global variables
+# Entity groups (group name -> member entity IDs), kept in sync with the group file of
+# services/entity_groups.py, which all workers share
 grouped_entity_map: dict[str, list[str]] = {}
 
+
+def _refresh_groups():
+    """
+    Reload grouped_entity_map if another request or worker changed the groups; returns their version.
+    """
+    version, groups = entity_groups.current()
+    if groups != grouped_entity_map:
+        grouped_entity_map.clear()
+        grouped_entity_map.update(groups)
+    return version
+
+
+# Group members of an entity ID or group name
+def _group_members(entity_id):
+    return grouped_entity_map.get(entity_id, [entity_id])
+
 # Root endpoint
 # This is the root endpoint for the FastAPI application.
 # It returns a simple HTML page with the title "AVA Template Python API".
@@ -40,531 +64,280 @@ async def root():
     return HTMLResponse(content=html_content, status_code=200)
 # Just used for debugging
 
+# Connection pool statistics
+# Returns the Neo4j pool settings and open/in-use connections of the worker that served the request.
+@router.get("/db-pool-stats", response_class=JSONResponse)
+async def db_pool_stats():
+    return {"success": True, "stats": pool_stats()}
+
+# Readiness
+# The graph endpoints serve right away, the search models are warmed up in the background.
+# Returns 503 until all registered models are loaded.
+@router.get("/ready", response_class=JSONResponse)
+async def ready():
+    status = registry.status()
+    return JSONResponse(content={"success": status["ready"], **status}, status_code=200 if status["ready"] else 503)
+
+# Graph cache statistics
+# Reports the graph version and the hit rates of the in-memory graph cache of this worker.
+@router.get("/graph-cache-stats", response_class=JSONResponse)
+async def graph_cache_stats():
+    return {"success": True, "worker_pid": os.getpid(), **graph_cache.stats()}
+
+# Schema status
+# Reports the schema version, all indexes and constraints, and (explain=true) which indexes
+# the queries of the hot endpoints use according to EXPLAIN.
+@router.get("/schema", response_class=JSONResponse)
+async def schema(explain: bool = Query(True), driver: AsyncDriver = Depends(get_async_driver)):
+    try:
+        status = await schema_status(driver)
+        if explain:
+            status["explain"] = await explain_hot_queries(driver)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    return {"success": True, **status}
+
 # Clrear the database
 # This endpoint clears the Neo4j database by deleting all nodes and relationships.
+# It holds the load lock while it runs, so it returns 409 while a load job (and its staged graph) is running.
 @router.get("/clear-db", response_class=JSONResponse)
-async def clear_db():
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-    
-    with driver.session() as session:
-        session.run("MATCH (n) DETACH DELETE n")
-        print("Database cleared.")
+async def clear_db(driver: AsyncDriver = Depends(get_async_driver)):
+    try:
+        with load_lock():
+            async with driver.session() as session:
+                result = await session.run("MATCH (n) DETACH DELETE n")
+                await result.consume()
+    except JobBusy as e:
+        return JSONResponse(status_code=409, content={"success": False, "error": str(e), "job_id": e.job_id})
+    forget_loaded_graph()
+    bump_graph_version()
     print("Database cleared.")
     return {"success": True}
 
 # Load graph from JSON
 # This endpoint loads graph data from a JSON file into the Neo4j database.
-# It uses a background task to perform the loading operation.
+# The load runs as a job in its own process (services/jobs.py), the response carries its job id.
+# Only one load runs at a time across all workers, starting another one returns 409.
+# mode=full (default) reloads everything, mode=delta only writes the nodes and edges that changed.
+# path selects another graph file, delta a delta document applied to the loaded graph
+# (see services/graph_loader.py for its format). Both are relative to the backend directory.
 @router.get("/load-graph-json", response_class=JSONResponse)
-async def load_graph_json(background_tasks: BackgroundTasks):
-    background_tasks.add_task(_load_graph_json)
-    return {"success": True, "message": "Graph loading started in background."}
-
-# Tried using networkx to load graph data
-async def _load_data():
-    print("Loading graph data from file...")
-    data_path = "MC3_graph.json"
-    schema_path = "MC3_schema.json"
-
-    with open(data_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    with open(schema_path, "r", encoding="utf-8") as f:
-        schema = json.load(f)["schema"]
-
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-    print("Connecting to Neo4j database...")
+async def load_graph_json(
+    mode: str = Query("full"),
+    path: Optional[str] = Query(None),
+    delta: Optional[str] = Query(None)
+):
     try:
-        
-        G = json_graph.node_link_graph(data, directed=True, multigraph=False)
-        print("Still going...")
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-        with driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")  # Optionally clear the database
-            print("Database cleared.")
-            # Add Nodes
-            for node_id, attrs in G.nodes(data=True):
-                attrs["id"] = attrs.get("id", node_id)
-                node_type = attrs.get("type", "Unknown")
-                label = node_type  # Use the node type as the label in Neo4j
-
-                props_str = ", ".join(f"{k}: ${k}" for k in attrs)
-                query = f"MERGE (n:{label} {{id: $id}}) SET n += {{{props_str}}}"
-                session.run(query, **attrs)
-            print("Nodes loaded successfully.")
-            # Add Edges
-            for u, v, edge_attrs in G.edges(data=True):
-                edge_type = edge_attrs.get("type", "RELATED_TO")
-                edge_attrs["source"] = u
-                edge_attrs["target"] = v
-
-                props_str = ", ".join(f"{k}: ${k}" for k in edge_attrs if k not in ("source", "target"))
-                query = f"""
-                MATCH (a {{id: $source}}), (b {{id: $target}})
-                MERGE (a)-[r:{edge_type}]->(b)
-                SET r += {{{props_str}}}
-                """
-                session.run(query, **edge_attrs)
-            print("Edges loaded successfully.")
-        print("Graph loaded successfully.")
-        return {"success": True, "message": "Graph loaded into Neo4j successfully."}
-
-    except Exception as e:
-        print("failed to load graph data:", str(e))
+        if mode not in ("full", "delta"):
+            raise ValueError(f"Unknown load mode '{mode}', use full or delta")
+        for file_path in (path, delta):
+            if file_path is not None:
+                data_file(file_path)
+        job = await asyncio.to_thread(start_load_job, mode, path, delta)
+    except ValueError as e:
         return {"success": False, "error": str(e)}
-# This function loads graph data from a JSON file into the Neo4j database.
-# It reads the data and schema from the specified JSON files, clears the database,
-# and then creates nodes and edges based on the data.
-# It is called in the background when the /load-graph-json endpoint is accessed.
-async def _load_graph_json():
-    print("Loading graph data from JSON...")
-    data_path = "MC3_graph.json"
-    schema_path = "MC3_schema.json"
-
-    with open(data_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    with open(schema_path, "r", encoding="utf-8") as f:
-        schema = json.load(f)["schema"]
-
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-    evidence_counts = {}
-    for edge in data.get("edges", []):
-        if edge.get("type") == "evidence_for":
-            target_id = edge.get("target")
-            evidence_counts[target_id] = evidence_counts.get(target_id, 0) + 1
-
-    # Apply counts to the nodes data
-    for node in data.get("nodes", []):
-        if node.get("type") == "Event" and node.get("sub_type") != "Communication":
-            node_id = node.get("id")
-            if node_id in evidence_counts:
-                node["count"] = evidence_counts[node_id]
-            else:
-                node["count"] = 0 # Ensure all non-comm events have a count property
-    def create_node(tx, node):
-        node_type = node.get("type")
-        if node_type not in ["Entity", "Event", "Relationship"]:
-            return  # skip unknown types
-
-        props = {k: v for k, v in node.items() if k != "type"}
-        props["type"] = node_type
-        set_clause = ", ".join([f'n.{k} = ${k}' for k in props.keys()])
-
-        query = f"""
-            MERGE (n:{node_type} {{id: $id}})
-            SET {set_clause}
-        """
-        tx.run(query, **props)
-
-    def create_edge(tx, edge):
-        source_id = edge.get("source")
-        target_id = edge.get("target")
-        rel_type = edge.get("type", "RELATED_TO")  # default fallback
-        edge_id = edge.get("id")
-
-        props = {k: v for k, v in edge.items() if k not in ["source", "target"]}
-        set_clause = ", ".join([f"r.{k} = ${k}" for k in props.keys()])
-        set_clause = f"SET {set_clause}" if set_clause else ""
-
-        tx.run(f"""
-            MATCH (a {{id: $source_id}}), (b {{id: $target_id}})
-            MERGE (a)-[r:`{rel_type}`]->(b)
-            {set_clause}
-        """, source_id=source_id, target_id=target_id, **props)
-    
-    
-
-    with driver.session() as session:
-        session.run("MATCH (n) DETACH DELETE n")  # Clear
-        print("Database cleared.")
-        # Load nodes
-        for node in data.get("nodes", []):
-            session.write_transaction(create_node, node)
-        print("Nodes loaded successfully.")
-        # Load edges
-        for edge in data.get("edges", []):
-            if "source" in edge and "target" in edge:
-                session.write_transaction(create_edge, edge)
-        print("Edges loaded successfully.")
-        # Transform Relationships
-        session.write_transaction(create_relationship_edges)
-        print("Relationships transformed successfully.")
-    print("Graph loaded successfully.")
-    return {"success": True, "message": "All nodes and edges loaded."}
-
-
-def create_relationship_edges(tx):
-    # Get all Relationship nodes
-    relationships = tx.run("MATCH (r:Relationship) RETURN r").data()
-
-    # Track edge counts between each entity pair to assign a unique "number"
-    edge_counter = {}
-
-    for record in relationships:
-        r = record['r']
-        r_id = r['id']
-        sub_type = r.get('sub_type', 'RELATIONSHIP')
-        base_props = dict(r)
-
-        # Get all connected Entities
-        entities = tx.run("""
-            MATCH (e:Entity)-[]-(r:Relationship {id: $r_id})
-            RETURN e.id AS entity_id
-        """, r_id=r_id).data()
-        entity_ids = [e['entity_id'] for e in entities]
-
-        # Aggregate evidence_for info from Communication events
-        evidence = tx.run("""
-            MATCH (comm:Event {sub_type: 'Communication'})-[:evidence_for]->(r:Relationship {id: $r_id})
-            RETURN collect(comm.content) AS contents, 
-                   count(comm) AS count, 
-                   collect(comm.id) AS comm_ids
-        """, r_id=r_id).single()
-
-        if evidence:
-            base_props["evidence_count"] = evidence["count"]
-            base_props["evidence_contents"] = evidence["contents"]
-            base_props["CommIDs"] = evidence["comm_ids"]
-        else:
-            base_props["evidence_count"] = 0
-            base_props["evidence_contents"] = []
-            base_props["CommIDs"] = []
-
-        # Find source and target based on edge direction
-        source_entities = tx.run("""
-            MATCH (e:Entity)-[]->(r:Relationship {id: $r_id})
-            RETURN collect(DISTINCT e.id) AS sources
-        """, r_id=r_id).single()["sources"]
-
-        target_entities = tx.run("""
-            MATCH (r:Relationship {id: $r_id})-[]->(e:Entity)
-            RETURN collect(DISTINCT e.id) AS targets
-        """, r_id=r_id).single()["targets"]
-
-        base_props["source"] = source_entities
-        base_props["target"] = target_entities
-        base_props["directed"] = len(source_entities) == 1 and len(target_entities) == 1
-
-        # Create edges between all unique pairs of entities
-        for i in range(len(entity_ids)):
-            for j in range(i + 1, len(entity_ids)):
-                source = entity_ids[i]
-                target = entity_ids[j]
-                key = tuple(sorted((source, target)))
-
-                # Clone base_props so numbering is not shared across other pairs
-                props = base_props.copy()
-                edge_counter[key] = edge_counter.get(key, 0) + 1
-                props["number"] = edge_counter[key]
-
-                tx.run(f"""
-                    MATCH (a:Entity {{id: $source}}), (b:Entity {{id: $target}})
-                    MERGE (a)-[rel:`{sub_type}`]->(b)
-                    SET rel += $props
-                """, source=source, target=target, props=props)
-        
-        
-        # Delete the original Relationship node
-        tx.run("MATCH (r:Relationship {id: $r_id}) DETACH DELETE r", r_id=r_id)
-
-
-
-
-
-def create_communication_edges(tx):
-    # Get all Communication Events
-    comms = tx.run("MATCH (e:Event {sub_type: 'Communication'}) RETURN e").data()
-
-    for comm in comms:
-        event = comm['e']
-        event_id = event['id']
-        props = dict(event)
-
-        # Get sender and receiver Entities
-        participants = tx.run("""
-            MATCH (a:Entity)-[:sent]->(comm:Event {id: $event_id})-[:received]->(b:Entity)
-            RETURN a.id AS sender, b.id AS receiver
-        """, event_id=event_id).data()
-
-        if not participants:
-            continue  # Skip if no sender/receiver found
-
-        sender = participants[0]['sender']
-        receiver = participants[0]['receiver']
-
-        # Get all `evidence_for` targets
-        evidence_links = tx.run("""
-            MATCH (comm:Event {id: $event_id})-[:evidence_for]->(target)
-            RETURN target.id AS target_id, labels(target) AS target_labels
-        """, event_id=event_id).data()
-
-        if evidence_links:
-            for link in evidence_links:
-                target_id = link['target_id']
-                target_labels = link['target_labels']
-
-                if 'Event' in target_labels:
-                    # Create A -> EVIDENCE_FOR -> Event
-                    tx.run("""
-                        MATCH (a:Entity {id: $sender}), (e:Event {id: $target_id})
-                        MERGE (a)-[r:EVIDENCE_FOR]->(e)
-                        SET r += $props
-                    """, sender=sender, target_id=target_id, props=props)
-
-                    # Create Event -> EVIDENCE_FOR -> B
-                    tx.run("""
-                        MATCH (e:Event {id: $target_id}), (b:Entity {id: $receiver})
-                        MERGE (e)-[r:EVIDENCE_FOR]->(b)
-                        SET r += $props
-                    """, target_id=target_id, receiver=receiver, props=props)
-
-                elif 'Relationship' in target_labels:
-                    # Add metadata to existing Relationship edges between Entities
-                    tx.run("""
-                        MATCH (a:Entity)-[r]->(b:Entity)
-                        WHERE (a.id = $sender AND b.id = $receiver) OR (a.id = $receiver AND b.id = $sender)
-                        AND type(r) = $rel_type
-                        SET r += $props
-                    """, sender=sender, receiver=receiver, rel_type=tx.run("""
-                        MATCH (r:Relationship {id: $target_id}) RETURN r.sub_type AS rel_type
-                    """, target_id=target_id).single()['rel_type'], props=props)
-
-        else:
-            # Pure communication between Entities
-            tx.run("""
-                MATCH (a:Entity {id: $sender}), (b:Entity {id: $receiver})
-                MERGE (a)-[r:COMMUNICATION]->(b)
-                SET r += $props
-            """, sender=sender, receiver=receiver, props=props)
-
-        # Delete the Communication node
-        tx.run("MATCH (e:Event {id: $event_id}) DETACH DELETE e", event_id=event_id)
+    except JobBusy as e:
+        return JSONResponse(status_code=409, content={"success": False, "error": str(e), "job_id": e.job_id})
+    return {"success": True, "job_id": job["id"], "message": f"Graph loading ({mode}) started in background."}
+
+# Load status
+# Progress of the running (or last) load: state, current phase, rows written of the rows planned,
+# overall throughput and per-phase rows, seconds and rows per second.
+# The live graph keeps serving during a load, it is replaced in one step at the "switch" phase.
+@router.get("/load-status", response_class=JSONResponse)
+async def load_status():
+    job_id = last_job_id()
+    job = await asyncio.to_thread(get_job, job_id) if job_id else None
+    return {"success": True, **(job or read_load_status())}
+
+# Jobs
+# Recent jobs, newest first, and the record of a single job (state, phase, progress counters,
+# phase timings, result or error). Cancelling stops a load at its next batch; a full load that
+# is cancelled before its switch leaves the live graph untouched.
+@router.get("/jobs", response_class=JSONResponse)
+async def jobs():
+    return {"success": True, "jobs": await asyncio.to_thread(list_jobs)}
+
+
+@router.get("/jobs/{job_id}", response_class=JSONResponse)
+async def job_status(job_id: str):
+    job = await asyncio.to_thread(get_job, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": f"Unknown job '{job_id}'"})
+    return {"success": True, **job}
+
+
+@router.post("/jobs/{job_id}/cancel", response_class=JSONResponse)
+async def cancel_job_endpoint(job_id: str):
+    job = await asyncio.to_thread(cancel_job, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": f"Unknown job '{job_id}'"})
+    return {"success": True, **job}
 
 # Read DB graph
 # This endpoint reads the graph data from the Neo4j database.
 # It retrieves nodes and edges, categorizes them into different types, and returns them in a JSON response.
 @router.get("/read-db-graph-2", response_class=JSONResponse)
-async def read_db_graph_2():
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+async def read_db_graph_2(
+    request: Request,
+    stream: bool = Query(False, description="Stream the records from Neo4j instead of serving the cached graph"),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
     print("Reading graph data from Neo4j...")
-    with driver.session() as session:
-        result_nodes = session.run("MATCH (n) RETURN n.id AS id, labels(n) AS labels, n.sub_type AS sub_type, properties(n) AS props")
-        nodes = []
-        for r in result_nodes:
-            node_type = "Unknown"
-            labels = r["labels"]
-            if "Entity" in labels:
-                node_type = "Entity"
-            elif "Event" in labels:
-                node_type = "Event"
-            elif "Relationship" in labels:
-                node_type = "Relationship"
-            nodes.append({
-                "id": r["id"],
-                "label": r.get("label"),
-                "type": node_type,
-                "sub_type": r.get("sub_type"),
-                **r["props"]
-            })
-
-        result_edges = session.run("""
-            MATCH (a)-[r]->(b)
-            RETURN a.id AS source, b.id AS target, type(r) AS type
-        """)
-        links = [{"source": r["source"], "target": r["target"], "type": r["type"]} for r in result_edges]
+    if stream or wants_ndjson(request):
+        return stream_sections(request, [("nodes", stream_typed_nodes(driver)), ("links", stream_typed_edges(driver))])
+    try:
+        response = await graph_cache.respond(request, driver, lambda snapshot: {"success": True, **snapshot.typed_view()})
+    except Exception as e:
+        return {"success": False, "error": str(e)}
     print("Graph data read successfully.")
-    return {"success": True, "nodes": nodes, "links": links}
+    return response
+
 
 
 
+# Run a read query in its own session and collect all records.
+# Separate sessions let independent queries of one request run concurrently.
+async def _read_records(driver: AsyncDriver, query: str, **params):
+    async with driver.session() as session:
+        result = await session.run(query, **params)
+        return [record async for record in result]
 
+
+# Read DB graph with aggregated communications
+# Nodes and edges are read once (see services/graph_snapshot.py). "nodes"/"links" are the raw graph,
+# "comm_nodes"/"comm_links" the same graph with one aggregate node per sender/receiver pair
+# instead of the single Communication events.
+# With stream=true (or Accept: application/x-ndjson) the records are streamed from the Neo4j cursors
+# as they arrive, compressed as negotiated, without building the response or the snapshot in memory.
 @router.get("/read-db-graph", response_class=JSONResponse)
-async def read_db_graph():
+async def read_db_graph(
+    request: Request,
+    stream: bool = Query(False, description="Stream the records from Neo4j instead of serving the cached graph"),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
     print("Reading graph data from Neo4j (aggregated communications)...")
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-    nodes = []
-    edges = []
-    comm_agg_nodes = []
-    comm_agg_edges = []
-    comm_node_id_map = {}  # (src, tgt) -> agg node id
+    if stream or wants_ndjson(request):
+        aggregated = AggregatedStream(driver)
+        return stream_sections(request, [
+            ("nodes", stream_nodes(driver)),
+            ("links", stream_edges(driver)),
+            ("comm_nodes", aggregated.nodes()),
+            ("comm_links", aggregated.links())
+        ])
     try:
-        with driver.session() as session:
-            
-            result = session.run("MATCH (n) WHERE NOT (n:Event AND n.sub_type = 'Communication') RETURN n")
-            for record in result:
-                n = record["n"]
-                node_data = dict(n.items())
-                node_data["id"] = n.get("id")
-                nodes.append(node_data)
-                
-
-            comm_result = session.run("""
-                MATCH (sender:Entity)-[:sent]->(comm:Event {sub_type: 'Communication'})-[:received]->(receiver:Entity)
-                RETURN sender.id AS source, receiver.id AS target, collect(comm.content) AS contents, collect(comm.id) AS event_ids, count(*) AS count, collect(comm.timestamp) AS timestamps
-            """)
-            for rec in comm_result:
-                agg_id = f"Communication between {rec['source']} and {rec['target']}"
-                comm_agg_nodes.append({
-                    "id": agg_id,
-                    "type": "Event",
-                    "source": rec["source"],
-                    "target": rec["target"],
-                    "count": rec["count"],
-                    "contents": rec["contents"],
-                    "event_ids": rec["event_ids"],
-                    "timestamps": rec["timestamps"],
-                    "sub_type": "Communication"
-                })
-                comm_node_id_map[(rec["source"], rec["target"])] = agg_id
-                comm_agg_edges.append({
-                    "source": rec["source"],
-                    "target": agg_id,
-                    "type": "Event",
-                    "sub_type": "Communication",
-                    "is_edge": "Y"
-                })
-                comm_agg_edges.append({
-                    "source": agg_id,
-                    "target": rec["target"],
-                    "type": "Event",
-                    "sub_type": "Communication",
-                    "is_edge": "Y"
-                })
-
-            result = session.run("""
-                MATCH (a)-[r]->(b)
-                WHERE NOT (type(r) = 'COMMUNICATION' AND a:Entity AND b:Entity)
-                RETURN a.id AS source, b.id AS target, r, r.id AS rel_id, r.type AS rel_type
-            """)
-
-            for record in result:
-                r = record["r"]
-                edge_data = dict(r.items())  # includes all properties
-                edge_data["source"] = record["source"]
-                edge_data["target"] = record["target"]
-                edge_data["id"] = record["rel_id"]  
-                rel_type = record["rel_type"]
-                edge_data["type"] = rel_type if rel_type else "Event edges" 
-                edges.append(edge_data)
-
-            print("Got aggregated Graphdata")
-            
-            
-            all_nodes = nodes.copy() + comm_agg_nodes.copy()
-            all_edges = edges.copy() + comm_agg_edges.copy()
-
-            # Origin read
-            nodes = []
-            edges = []
-            results = session.run("MATCH (n) RETURN n")
-            for record in results:
-                n = record["n"]
-                node_data = dict(n.items())
-                node_data["id"] = n.get("id")
-                nodes.append(node_data)
-
-            results = session.run("MATCH (a)-[r]->(b) RETURN a.id AS source, b.id AS target, r")
-            for record in results:
-                r = record["r"]
-                edge_data = dict(r.items())
-                edge_data["source"] = record["source"]
-                edge_data["target"] = record["target"]
-                #edge_data["type"] = r.type if hasattr(r, "type") else r.get("type", "Test")
-                edges.append(edge_data)
-
+        response = await graph_cache.respond(request, driver, _read_db_graph_response)
     except Exception as e:
         print(f"Error reading graph data: {str(e)}")
         return {"success": False, "error": str(e)}
-    finally:
-        driver.close()
     print("Fetched all data")
-    return {"success": True, "nodes": nodes, "links": edges, "comm_nodes": all_nodes, "comm_links": all_edges}
+    return response
+
+
+def _read_db_graph_response(snapshot):
+    raw = snapshot.raw_view()
+    aggregated = snapshot.aggregated_view()
+    return {
+        "success": True,
+        "nodes": raw["nodes"],
+        "links": raw["links"],
+        "comm_nodes": aggregated["nodes"],
+        "comm_links": aggregated["links"]
+    }
+
 
 @router.get("/evidence-for-event", response_class=JSONResponse)
-async def evidence_for_event(event_id: str = Query(..., description="ID of the selected event")):
+async def evidence_for_event(
+    event_id: str = Query(..., description="ID of the selected event"),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
     """
     Given a selected event (e.g., 'Event_Monitoring_0'), return detailed information for each
     communication event that points to it via [:evidence_for] edges, as well as full metadata
     for the target event and its connected entity source/target nodes.
     """
     print("Getting evidence for event:", event_id)
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
     results = []
     info = {}
 
     try:
-        with driver.session() as session:
-            # get evidence communication events
-            evidence_query = """
-                MATCH (sender:Entity)-[:sent]->(comm:Event {sub_type: 'Communication'})-[:received]->(receiver:Entity),
-                      (comm)-[:evidence_for]->(e:Event {id: $event_id})
-                RETURN comm, sender.id AS source, receiver.id AS target
-                ORDER BY comm.timestamp
-            """
-            evidence_records = session.run(evidence_query, event_id=event_id)
+        # get evidence communication events
+        evidence_query = """
+            MATCH (sender:Entity)-[:sent]->(comm:Event {sub_type: 'Communication'})-[:received]->(receiver:Entity),
+                  (comm)-[:evidence_for]->(e:Event {id: $event_id})
+            RETURN comm, sender.id AS source, receiver.id AS target
+            ORDER BY comm.timestamp
+        """
+        # get selected event data and its source and target
+        info_query = """
+            MATCH (e:Event {id: $event_id})
+            OPTIONAL MATCH (source:Entity)-[:RELATED_TO]->(e)
+            OPTIONAL MATCH (e)-[:RELATED_TO]->(target:Entity)
+            RETURN e, collect(DISTINCT source) AS sources, collect(DISTINCT target) AS targets
+        """
+        evidence_records, info_records = await asyncio.gather(
+            _read_records(driver, evidence_query, event_id=event_id),
+            _read_records(driver, info_query, event_id=event_id),
+        )
 
-            print("Processing communication evidence...")
-            for record in evidence_records:
-                comm = record["comm"]
-                results.append({
-                    "event_id": comm.id,
-                    "timestamp": comm.get("timestamp", ""),
-                    "source": record.get("source", "–"),
-                    "target": record.get("target", "–"),
-                    "content": comm.get("content", ""),
-                    "sub_type": comm.get("sub_type", "")
-                })
+        print("Processing communication evidence...")
+        for record in evidence_records:
+            comm = record["comm"]
+            results.append({
+                "event_id": comm.id,
+                "timestamp": comm.get("timestamp", ""),
+                "source": record.get("source", "–"),
+                "target": record.get("target", "–"),
+                "content": comm.get("content", ""),
+                "sub_type": comm.get("sub_type", "")
+            })
 
-            # get selected event data and its source and target
-            info_query = """
-                MATCH (e:Event {id: $event_id})
-                OPTIONAL MATCH (source:Entity)-[:RELATED_TO]->(e)
-                OPTIONAL MATCH (e)-[:RELATED_TO]->(target:Entity)
-                RETURN e, collect(DISTINCT source) AS sources, collect(DISTINCT target) AS targets
-            """
-            info_record = session.run(info_query, event_id=event_id).single()
-            if info_record:
-                event_node = info_record["e"]
-                source_entities = info_record["sources"]
-                target_entities = info_record["targets"]
+        info_record = info_records[0] if info_records else None
+        if info_record:
+            event_node = info_record["e"]
+            source_entities = info_record["sources"]
+            target_entities = info_record["targets"]
 
-                info["event"] = dict(event_node.items())
-                info["sources"] = [dict(entity.items()) for entity in source_entities if entity]
-                info["targets"] = [dict(entity.items()) for entity in target_entities if entity]
-            print("Got evidence and info")
+            info["event"] = public_properties(dict(event_node.items()))
+            info["sources"] = [public_properties(dict(entity.items())) for entity in source_entities if entity]
+            info["targets"] = [public_properties(dict(entity.items())) for entity in target_entities if entity]
+        print("Got evidence and info")
 
     except Exception as e:
         print(f"Error in evidence_for_event: {str(e)}")
         return {"success": False, "error": str(e)}
 
-    finally:
-        driver.close()
     print("Returned evidence")
     return {"success": True, "data": results, "info": info}
 
 
 
 @router.get("/get-events-by-date", response_class=JSONResponse)
-async def get_events_by_date(date: str):
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+async def get_events_by_date(date: str, driver: AsyncDriver = Depends(get_async_driver)):
+    try:
+        start, end = day_range(date)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
 
+    # Range predicate on the indexed epoch seconds, answered with an index range seek
     cypher = """
     MATCH (e:Event)
-    WHERE date(e.timestamp) = date($date)
+    WHERE e.timestamp_epoch >= $start AND e.timestamp_epoch < $end
     OPTIONAL MATCH (e)-[r]-(n)
     RETURN e, r, n
     """
     result_nodes = []
     result_links = []
 
-    with driver.session() as session:
-        res = session.run(cypher, date=date)
-        for record in res:
+    async with driver.session() as session:
+        res = await session.run(cypher, start=start, end=end)
+        async for record in res:
             e = record["e"]
             n = record.get("n")
             r = record.get("r")
-            result_nodes.append(dict(e))
+            result_nodes.append(public_properties(dict(e)))
             if n:
-                result_nodes.append(dict(n))
+                result_nodes.append(public_properties(dict(n)))
             if r:
                 result_links.append({
                     "source": r.start_node["id"],
@@ -575,144 +348,453 @@ async def get_events_by_date(date: str):
     return {"success": True, "nodes": result_nodes, "links": result_links}
 
 @router.get("/filter-by-date", response_class=JSONResponse)
-async def filter_by_date(date: str = Query(..., description="YYYY-MM-DD format")):
+async def filter_by_date(
+    request: Request,
+    date: str = Query(..., description="YYYY-MM-DD format"),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
     """
     Filter graph based on Event timestamp (date). Returns matching Events and their 1-hop neighbors.
     """
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-    nodes = []
-    edges = []
+    try:
+        return await graph_cache.respond(request, driver, lambda snapshot: {"success": True, **snapshot.events_on_date(date)})
+    except Exception as e:
+        return {"success": False, "error": str(e)}
 
+# Filter by time range
+# Events from start to end (any number of days) and their 1-hop neighbors, answered from the cached
+# graph with a binary search over the events sorted by timestamp_epoch. Date-only ends include the whole day.
+@router.get("/filter-by-range", response_class=JSONResponse)
+async def filter_by_range(
+    request: Request,
+    start: Optional[str] = Query(None, description="Start of the range (e.g. '2040-10-01' or '2040-10-01 09:00:00')"),
+    end: Optional[str] = Query(None, description="End of the range, inclusive (e.g. '2040-10-03')"),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
     try:
-        with driver.session() as session:
-            query = """
-            MATCH (e:Event)
-            WHERE substring(e.timestamp, 0, 10) = $date
-            OPTIONAL MATCH (e)-[r]-(m)
-            RETURN DISTINCT e, r, m
-            """
-            result = session.run(query, date=date)
+        start_epoch, end_epoch = range_bounds(start, end)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    try:
+        return await graph_cache.respond(
+            request, driver,
+            lambda snapshot: {"success": True, **snapshot.neighbourhood(snapshot.events_in_range(start_epoch, end_epoch))}
+        )
+    except Exception as e:
+        return {"success": False, "error": str(e)}
 
-            node_map = {}
-            edge_list = []
 
-            for record in result:
-                e_node = record["e"]
-                m_node = record.get("m")
-                r = record.get("r")
+# Ego network
+# The k-hop neighbourhood of one entity or event, traversed over the adjacency lists of the cached
+# graph (services/graph_snapshot.py) instead of loading the whole graph into the client.
+# Optionally limited to a time window (events outside it are not entered), to some edge types and
+# to max_fanout neighbours per node. Nodes are paged by distance; every link is on the page of its
+# later node, so the pages together are the whole subgraph. Pages are cached per graph version.
+EGO_MAX_HOPS = int(os.environ.get("EGO_MAX_HOPS", 4))
+EGO_MAX_NODES = int(os.environ.get("EGO_MAX_NODES", 20000))
+
+
+@router.get("/ego-network", response_class=JSONResponse)
+async def ego_network(
+    request: Request,
+    id: str = Query(..., description="ID of the entity or event in the center"),
+    hops: int = Query(2, ge=1, le=EGO_MAX_HOPS, description="Number of hops"),
+    start: Optional[str] = Query(None, description="Start of the time window (e.g. '2040-10-01' or '2040-10-01 09:00:00')"),
+    end: Optional[str] = Query(None, description="End of the time window, inclusive"),
+    edge_types: Optional[List[str]] = Query(None, description="Edge types to follow (e.g. sent,received), default all"),
+    direction: str = Query("both", description="both, out or in"),
+    max_fanout: Optional[int] = Query(None, ge=1, description="Most neighbours taken from one node"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(500, ge=1, le=5000),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
+    if direction not in ("both", "out", "in"):
+        return {"success": False, "error": f"Unknown direction '{direction}', use both, out or in"}
+    try:
+        start_epoch, end_epoch = range_bounds(start, end)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    types = [t for value in edge_types or [] for t in value.split(",") if t] or None
+
+    def build(snapshot):
+        position = snapshot.index.get(id)
+        if position is None:
+            return {"success": False, "error": f"Node '{id}' not found"}
+        order, distances, edge_positions, truncated = snapshot.ego_network(
+            position, hops, start_epoch, end_epoch, types, direction, max_fanout, EGO_MAX_NODES
+        )
+        first = (page - 1) * page_size
+        page_positions = order[first:first + page_size]
+        rank = {p: i for i, p in enumerate(order)}
+        links = []
+        for edge_position in edge_positions:
+            edge = snapshot.edges[edge_position]
+            later = max(rank[snapshot.index[edge["source"]]], rank[snapshot.index[edge["target"]]])
+            if first <= later < first + page_size:
+                links.append({
+                    "source": edge["source"],
+                    "target": edge["target"],
+                    "type": snapshot.edge_types[edge_position],
+                    **edge
+                })
+        return {
+            "success": True,
+            "id": id,
+            "hops": hops,
+            "total_nodes": len(order),
+            "total_links": len(edge_positions),
+            "page": page,
+            "page_size": page_size,
+            "pages": -(-len(order) // page_size),
+            "truncated": [snapshot.nodes[p]["id"] for p in truncated],
+            "nodes": [{**snapshot.nodes[p], "hops": distances[p]} for p in page_positions],
+            "links": links
+        }
 
-                # Add Event node
-                if e_node and e_node.id not in node_map:
-                    node_map[e_node.id] = e_node
-                # Add neighbor node
-                if m_node and m_node.id not in node_map:
-                    node_map[m_node.id] = m_node
-                # Add relationship
-                if r:
-                    edge_list.append({
-                        "source": r.start_node.id,
-                        "target": r.end_node.id,
-                        "type": r.type,
-                        **r._properties
-                    })
+    try:
+        return await graph_cache.respond(request, driver, build)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
 
-            nodes = [dict(n._properties, id=n.id) for n in node_map.values()]
-            edges = edge_list
 
+# Entity groups
+# Server-side grouping of entities (e.g. the pseudonyms of one person) into one node. Groups are
+# stored in a file shared by all workers and survive graph loads; members have to be loaded entities
+# and every entity is in at most one group. The Sankey (level=group), the communication histogram
+# and /grouped-graph return views with the groups collapsed.
+@router.get("/entity-groups", response_class=JSONResponse)
+async def list_entity_groups():
+    version = _refresh_groups()
+    return {"success": True, "version": version, "groups": grouped_entity_map}
+
+
+@router.post("/entity-groups", response_class=JSONResponse)
+async def create_entity_group(
+    members: List[str],
+    name: str = Query(..., description="Group name (e.g. 'Musicians')"),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
+    return await _save_entity_group(driver, name, members, create=True)
+
+
+@router.put("/entity-groups/{name}", response_class=JSONResponse)
+async def update_entity_group(name: str, members: List[str], driver: AsyncDriver = Depends(get_async_driver)):
+    return await _save_entity_group(driver, name, members, create=False)
+
+
+@router.delete("/entity-groups/{name}", response_class=JSONResponse)
+async def delete_entity_group(name: str):
+    try:
+        version, groups = await asyncio.to_thread(delete_group, name)
+    except UnknownGroup as e:
+        return JSONResponse(status_code=404, content={"success": False, "error": str(e)})
+    _refresh_groups()
+    return {"success": True, "version": version, "groups": groups}
+
+
+async def _save_entity_group(driver, name, members, create):
+    try:
+        snapshot = await graph_cache.get_snapshot(driver)
+        entity_ids = {node["id"] for node, labels in zip(snapshot.nodes, snapshot.labels) if "Entity" in labels}
+        version, groups = await asyncio.to_thread(save_group, name, members, entity_ids, create)
+    except UnknownGroup as e:
+        return JSONResponse(status_code=404, content={"success": False, "error": str(e)})
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    _refresh_groups()
+    return {"success": True, "version": version, "group": name.strip(), "members": groups[name.strip()]}
+
+
+# Grouped graph
+# The aggregated communication graph (comm_nodes/comm_links of /read-db-graph) with every entity
+# group collapsed into one node that lists its members and merged message counts. Group changes
+# only regroup the communications and edges of the entities that moved.
+@router.get("/grouped-graph", response_class=JSONResponse)
+async def grouped_graph(request: Request, driver: AsyncDriver = Depends(get_async_driver)):
+    version = _refresh_groups()
+    groups = dict(grouped_entity_map)
+
+    def build(snapshot):
+        return {"success": True, "groups_version": version, **collapsed_graph_cache.get(snapshot).view(groups)}
+
+    try:
+        return await graph_cache.respond(request, driver, build, variant=version)
     except Exception as e:
         return {"success": False, "error": str(e)}
-    finally:
-        driver.close()
 
-    return {"success": True, "nodes": nodes, "links": edges}
 
 @router.get("/sankey-communication-flows", response_class=JSONResponse)
 async def sankey_communication_flows(
-    sender: Optional[str] = Query(None, description="Sender Entity ID"),
-    receiver: Optional[str] = Query(None, description="Receiver Entity ID"),
+    request: Request,
+    sender: Optional[str] = Query(None, description="Sender Entity ID (or sub_type / group name at those levels)"),
+    receiver: Optional[str] = Query(None, description="Receiver Entity ID (or sub_type / group name at those levels)"),
     start_date: Optional[str] = Query(None, description="Start of timestamp filter (e.g., '2040-10-01 09:00:00')"),
-    end_date: Optional[str] = Query(None, description="End of timestamp filter (e.g., '2040-10-01 11:00:00')")
+    end_date: Optional[str] = Query(None, description="End of timestamp filter (e.g., '2040-10-01 11:00:00')"),
+    level: str = Query("entity", description="entity, sub_type or group (the groups of grouped_entity_map)"),
+    top: Optional[int] = Query(None, ge=1, description="Keep only the largest links"),
+    topic: Optional[int] = Query(None, description="Only the messages of this topic (see /topics)"),
+    driver: AsyncDriver = Depends(get_async_driver)
 ):
     """
     Returns Sankey data showing how many communications were sent from one entity to another,
-    optionally filtered by sender, receiver, and timestamp range.
+    optionally filtered by sender, receiver, and timestamp range. The counts are summed from the
+    hourly buckets of the communication cube (services/flows.py), optionally rolled up by entity
+    sub_type or entity group and pruned to the top largest links.
     """
-    start_date = start_date.replace("T", " ") if start_date else None
-    end_date = end_date.replace("T", " ") if end_date else None
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    if level not in FLOW_LEVELS:
+        return {"success": False, "error": f"Unknown level '{level}', use {', '.join(FLOW_LEVELS)}"}
     try:
-        with driver.session() as session:
-            cypher_parts = [
-                "MATCH (sender:Entity)-[:sent]->(comm:Event {sub_type: 'Communication'})-[:received]->(receiver:Entity)"
-            ]
+        start, end = range_bounds(start_date, end_date)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    groups_version = _refresh_groups() if level == "group" else None
+    groups = dict(grouped_entity_map)
+
+    def build(snapshot):
+        counts = pair_flows(cube, snapshot, start, end, positions)
+        label = flow_labels(snapshot, level, groups)
+        links, total, pruned_links, pruned_value = sankey_links(counts, label, sender, receiver, top)
+        if not links:
+            return {"success": False, "message": "No communication flows found for the given parameters."}
+        return {
+            "success": True,
+            "level": level,
+            "total": total,
+            "pruned_links": pruned_links,
+            "pruned_value": pruned_value,
+            "links": links
+        }
 
-            where_clauses = []
-
-            if sender:
-                where_clauses.append("sender.id = $sender")
-            if receiver:
-                where_clauses.append("receiver.id = $receiver")
-            if start_date:
-                where_clauses.append("comm.timestamp >= $start_date")
-            if end_date:
-                where_clauses.append("comm.timestamp <= $end_date")
-            where_clauses.append("sender.id <> receiver.id")  
-
-            if where_clauses:
-                cypher_parts.append("WHERE " + " AND ".join(where_clauses))
-
-            cypher_parts.append("""
-                RETURN sender.id AS source, receiver.id AS target, count(*) AS count
-            """)
-
-            query = "\n".join(cypher_parts)
-            result = session.run(query, sender=sender, receiver=receiver, start_date=start_date, end_date=end_date)
-
-            sankey_data = [
-                {
-                    "source": record["source"],
-                    "target": record["target"],
-                    "value": record["count"]
-                }
-                for record in result
+    try:
+        cube = await comm_cube_cache.get(driver)
+        positions = None
+        if topic is not None:
+            topics = await _topics_or_error(driver, topic)
+            cube, positions = topics.cube(topic), topics.position_set(topic)
+        return await graph_cache.respond(request, driver, build, variant=groups_version)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+# Communication histogram
+# Counts communications per bucket from the pre-aggregated communication cube (services/comm_cube.py)
+# for any range and bucket width, optionally for one sender, receiver, sender/receiver pair or entity
+# (sent + received), together with the busiest entities of the range.
+@router.get("/comm-histogram", response_class=JSONResponse)
+async def comm_histogram(
+    start: Optional[str] = Query(None, description="Start of the range (e.g. '2040-10-01 00:00:00'), default first message"),
+    end: Optional[str] = Query(None, description="End of the range, inclusive (a date covers the whole day), default last message"),
+    granularity: str = Query("hour", description="hour, day, week or a multiple like 6h / 2d"),
+    sender: Optional[str] = Query(None, description="Sender Entity ID or group name"),
+    receiver: Optional[str] = Query(None, description="Receiver Entity ID or group name"),
+    entity: Optional[str] = Query(None, description="Entity ID or group name, counts its sent and received communications"),
+    top_entities: int = Query(10, ge=0, description="Number of busiest entities of the range to return"),
+    grouped: bool = Query(False, description="Count the busiest entities per entity group"),
+    topic: Optional[int] = Query(None, description="Only the messages of this topic (see /topics)"),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
+    _refresh_groups()
+
+    # Sum of the histograms of several series (the members of a group)
+    def histogram(keys):
+        series = [counts.histogram(key, start_hour, end_hour, width) for key in keys]
+        return [(bucket[0][0], sum(count for _, count in bucket)) for bucket in zip(*series)]
+
+    try:
+        width = parse_granularity(granularity)
+        cube = await comm_cube_cache.get(driver)
+        if cube.first_hour is None:
+            return {"success": False, "message": "No communications loaded."}
+        # Same bounds as /filter-by-range: a date-only end covers the whole day
+        start_epoch, end_epoch = range_bounds(start, end)
+        start_hour = cube.first_hour if start_epoch is None else start_epoch // HOUR_SECONDS
+        end_hour = cube.last_hour if end_epoch is None else (end_epoch - 1) // HOUR_SECONDS
+        # Day buckets start at midnight, hour buckets at multiples of their width
+        start_hour -= start_hour % (24 if width % 24 == 0 else width)
+        # The range defaults to all messages, the counts may come from the cube of one topic
+        counts = cube
+        if topic is not None:
+            counts = (await _topics_or_error(driver, topic)).cube(topic)
+
+        if entity:
+            sent = histogram([("sender", member) for member in _group_members(entity)])
+            received = histogram([("receiver", member) for member in _group_members(entity)])
+            buckets = [
+                {"start": hour_label(hour), "sent": sent_count, "received": received_count, "count": sent_count + received_count}
+                for (hour, sent_count), (_, received_count) in zip(sent, received)
             ]
+        else:
+            if sender and receiver:
+                keys = [("pair", s, r) for s in _group_members(sender) for r in _group_members(receiver)]
+            elif sender:
+                keys = [("sender", s) for s in _group_members(sender)]
+            elif receiver:
+                keys = [("receiver", r) for r in _group_members(receiver)]
+            else:
+                keys = [("all",)]
+            buckets = [{"start": hour_label(hour), "count": count} for hour, count in histogram(keys)]
+        entities = counts.entity_totals(start_hour, end_hour) if top_entities else []
+        if grouped and entities:
+            group_of = {member: name for name, members in grouped_entity_map.items() for member in members}
+            totals = {}
+            for row in entities:
+                group = group_of.get(row["id"], row["id"])
+                total = totals.setdefault(group, {"id": group, "sent": 0, "received": 0, "total": 0})
+                for field in ("sent", "received", "total"):
+                    total[field] += row[field]
+            entities = sorted(totals.values(), key=lambda entity: (-entity["total"], entity["id"]))
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+    return {
+        "success": True,
+        "start": hour_label(start_hour),
+        "end": hour_label(end_hour),
+        "granularity_hours": width,
+        "total": sum(bucket["count"] for bucket in buckets),
+        "buckets": buckets,
+        "entities": entities[:top_entities]
+    }
+
 
+# Graph analytics
+# PageRank, betweenness, degrees and Louvain communities of the entity graph (messages and
+# relationships), computed once per graph version (services/analytics.py) and served from its cache.
+ANALYTICS_METRICS = ["pagerank", "betweenness", "in_degree", "out_degree", "messages_sent", "messages_received"]
+
+
+@router.get("/analytics/summary", response_class=JSONResponse)
+async def analytics_summary(driver: AsyncDriver = Depends(get_async_driver)):
+    try:
+        analytics = await analytics_cache.get(driver)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    results = analytics.results
+    return {
+        "success": True,
+        "version": results["version"],
+        "nodes": results["nodes"],
+        "edges": results["edges"],
+        "communities": len(results["communities"]),
+        "modularity": results["modularity"],
+        "parallel_workers": results["parallel_workers"],
+        "seconds": results["seconds"]
+    }
+
+
+# Entities ranked by one metric, optionally only the members of one community
+@router.get("/analytics/centrality", response_class=JSONResponse)
+async def analytics_centrality(
+    request: Request,
+    metric: str = Query("pagerank", description="pagerank, betweenness, in_degree, out_degree, messages_sent or messages_received"),
+    top: int = Query(50, ge=1, description="Number of entities to return"),
+    community: Optional[int] = Query(None, description="Community ID"),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
+    if metric not in ANALYTICS_METRICS:
+        return {"success": False, "error": f"Unknown metric '{metric}', use one of {', '.join(ANALYTICS_METRICS)}"}
+    try:
+        analytics = await analytics_cache.get(driver)
+
+        def build(snapshot):
+            entities = [entity for entity in analytics.results["entities"]
+                        if community is None or entity["community"] == community]
+            entities = sorted(entities, key=lambda entity: (-entity[metric], entity["id"]))[:top]
+            return {"success": True, "metric": metric, "entities": entities}
+
+        return await graph_cache.respond(request, driver, build)
     except Exception as e:
         return {"success": False, "error": str(e)}
-    finally:
-        driver.close()
 
-    if not sankey_data:
-        return {"success": False, "message": "No communication flows found for the given parameters."}
 
-    return {"success": True, "links": sankey_data}
+# Louvain communities, largest first
+@router.get("/analytics/communities", response_class=JSONResponse)
+async def analytics_communities(
+    request: Request,
+    min_size: int = Query(1, ge=1, description="Smallest community to return"),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
+    try:
+        analytics = await analytics_cache.get(driver)
+
+        def build(snapshot):
+            communities = [c for c in analytics.results["communities"] if c["size"] >= min_size]
+            return {"success": True, "modularity": analytics.results["modularity"], "communities": communities}
+
+        return await graph_cache.respond(request, driver, build)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+# Degree (distinct communication partners) and messages per entity in time windows,
+# with the most connected entities of every window, or the series of one entity
+@router.get("/analytics/degree", response_class=JSONResponse)
+async def analytics_degree(
+    request: Request,
+    start: Optional[str] = Query(None, description="Start of the range (e.g. '2040-10-01 00:00:00'), default first message"),
+    end: Optional[str] = Query(None, description="End of the range, inclusive, default last message"),
+    granularity: str = Query("day", description="hour, day, week or a multiple like 6h / 2d"),
+    entity: Optional[str] = Query(None, description="Entity ID, returns only its degree per window"),
+    top: int = Query(10, ge=1, description="Number of entities per window"),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
+    try:
+        width = parse_granularity(granularity) * 3600
+        start_epoch, end_epoch = range_bounds(start, end)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    try:
+        analytics = await analytics_cache.get(driver)
+
+        def build(snapshot):
+            windows = []
+            limit = len(analytics.graph.ids) if entity else top
+            for window_start, active, entities in analytics.graph.degree_windows(width, start_epoch, end_epoch, limit):
+                rows = [{"id": e, "degree": degree, "messages": messages} for e, degree, messages in entities
+                        if entity is None or e == entity]
+                windows.append({"start": epoch_label(window_start), "active_entities": active, "entities": rows})
+            return {"success": True, "granularity_hours": width // 3600, "windows": windows}
+
+        return await graph_cache.respond(request, driver, build)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
 
 
 @router.get("/filter-by-content", response_class=JSONResponse)
-async def filter_by_content(query: str = Query(..., description="Search string for content field")):
+async def filter_by_content(
+    query: str = Query(..., description="Words (or word prefixes) that the content must all contain"),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
     """
-    Filter graph for communication events by content substring match. Returns matching communication events and their 1-hop neighbors.
+    Filter graph for communication events by content. A message matches when it contains every word of
+    the query, or a word starting with it ("fish" finds "fishing"), in any order; text inside a word does
+    not match. Returns matching communication events and their 1-hop neighbors.
     """
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
     nodes = []
     edges = []
 
     print(f"Filtering communication events by content: {query}")
 
     try:
-        with driver.session() as session:
+        # Look the matching messages up in the keyword index instead of scanning every content string
+        await asyncio.to_thread(refresh_corpus)
+        text_corpus = await asyncio.to_thread(registry.get, "text_corpus")
+        matches = text_corpus.message_text_index.search(query)
+        ids = [text_corpus.message_text_index.doc_ids[position] for position, _ in matches]
+
+        async with driver.session() as session:
             neo_query = """
             MATCH (e:Event {sub_type: 'Communication'})
-            WHERE toLower(e.content) CONTAINS toLower($query)
+            WHERE e.id IN $ids
             OPTIONAL MATCH (e)-[r]-(n)
             RETURN DISTINCT e, r, n
             """
-            result = session.run(neo_query, query=query)
+            result = await session.run(neo_query, ids=ids)
 
             node_map = {}
             edge_list = []
 
-            for record in result:
+            async for record in result:
                 e_node = record["e"]
                 n_node = record.get("n")
                 r = record.get("r")
@@ -729,40 +811,38 @@ async def filter_by_content(query: str = Query(..., description="Search string f
                         **r._properties
                     })
 
-            nodes = [dict(n._properties, id=n.id) for n in node_map.values()]
+            nodes = [dict(public_properties(n._properties), id=n.id) for n in node_map.values()]
             edges = edge_list
 
     except Exception as e:
         return {"success": False, "error": str(e)}
-    finally:
-        driver.close()
 
     return {"success": True, "nodes": nodes, "links": edges}
 
 @router.get("/massive-sequence-view", response_class=JSONResponse)
 async def massive_sequence_view(
-    event_ids: List[str] = Query(..., description="List of communication event node IDs")
+    event_ids: List[str] = Query(..., description="List of communication event node IDs"),
+    driver: AsyncDriver = Depends(get_async_driver)
 ):
     """
     Given a list of communication Event node IDs, return their sender and receiver entity IDs.
     """
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
     results = []
     # Since the ordering of the events is not correct anymore we have to re-order
     # Since we can't re-order using the Cypher, we just use the inherent ordering of the CommIDs
     
 
     try:
-        with driver.session() as session:
+        async with driver.session() as session:
             query = """
                 UNWIND $event_ids AS eid
                 MATCH (sender:Entity)-[:sent]->(comm:Event {id: eid, sub_type: 'Communication'})-[:received]->(receiver:Entity)
                 RETURN comm, sender.id AS source, receiver.id AS target
                 ORDER BY comm.timestamp
             """
-            records = session.run(query, event_ids=event_ids)
+            records = await session.run(query, event_ids=event_ids)
 
-            for record in records:
+            async for record in records:
                 comm = record["comm"]
                 results.append({
                     "event_id": comm.id,
@@ -776,18 +856,15 @@ async def massive_sequence_view(
     except Exception as e:
         print(f"Error fetching massive sequence view: {str(e)}")    
         return {"success": False, "error": str(e)}
-    finally:
-        driver.close()
     return {"success": True, "data": results}
 
 @router.post("/event-entities", response_class=JSONResponse)
-async def event_entities(event_ids: List[str]):
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+async def event_entities(event_ids: List[str], driver: AsyncDriver = Depends(get_async_driver)):
     result_map = {}
 
     try:
         print("Fetching event entities for IDs")
-        with driver.session() as session:
+        async with driver.session() as session:
             query = """
             UNWIND $event_ids AS eid
             MATCH (e:Event {id: eid})
@@ -797,8 +874,8 @@ async def event_entities(event_ids: List[str]):
                    COLLECT(DISTINCT source.id) AS sources,
                    COLLECT(DISTINCT target.id) AS targets
             """
-            records = session.run(query, event_ids=event_ids)
-            for record in records:
+            records = await session.run(query, event_ids=event_ids)
+            async for record in records:
                 event_id = record["event_id"]
                 sources = record["sources"] or []
                 targets = record["targets"] or []
@@ -811,8 +888,6 @@ async def event_entities(event_ids: List[str]):
     except Exception as e:
         print("Error in /event-entities:", str(e))
         return {"success": False, "error": str(e)}
-    finally:
-        driver.close()
 
     return {"success": True, "data": result_map}
 
@@ -820,73 +895,172 @@ async def event_entities(event_ids: List[str]):
 
 ###
 # Here the Similarity Search starts
-# First we need to embed the messages
-
-import json
-import pandas as pd
-import torch
-from sentence_transformers import SentenceTransformer, util
+# The embedding model and the embedded corpus live in services/search.py and are loaded
+# lazily through the model registry (warmed up in the background after startup)
+
+
+# Model and corpus are loaded in a worker thread so a cold start never blocks the event loop
+async def _get_search_corpus():
+    await asyncio.to_thread(refresh_corpus)
+    await asyncio.to_thread(registry.get, "embed_model")
+    return await asyncio.to_thread(registry.get, "search_corpus")
+
+
+# The search corpus without waiting for the embedding model, which it only needs on a cold cache
+async def _load_search_corpus():
+    await asyncio.to_thread(refresh_corpus)
+    return await asyncio.to_thread(registry.get, "search_corpus")
+
+
+# Query encoder statistics (LRU cache hit rate, batch sizes and encode times) of this worker
+@router.get("/encoder-stats", response_class=JSONResponse)
+async def encoder_stats():
+    return {"success": True, "stats": query_encoder.stats()}
+
+
+# Pseudonym candidates
+# Entity pairs whose messages read alike: cosine similarity of the mean message embeddings of their
+# senders (services/pseudonyms.py), with their direct messages and shared communication partners.
+# Computed once per graph version; entity returns the most similar entities of one entity instead.
+@router.get("/pseudonym-candidates", response_class=JSONResponse)
+async def pseudonym_candidates(
+    request: Request,
+    top: int = Query(50, ge=1, description="Number of pairs to return"),
+    min_similarity: float = Query(0.0, description="Lowest similarity of a pair"),
+    min_messages: int = Query(1, ge=1, description="Fewest messages both entities have to have sent"),
+    same_sub_type: bool = Query(False, description="Only pairs of the same sub_type (e.g. Person and Person)"),
+    entity: Optional[str] = Query(None, description="Entity ID, returns its most similar entities"),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
+    try:
+        results = await pseudonym_cache.get(driver, _load_search_corpus)
+
+        def build(snapshot):
+            if entity is not None:
+                if entity not in results["neighbours_of"]:
+                    return {"success": False, "error": f"Entity '{entity}' has not sent any messages"}
+                neighbours = [n for n in results["neighbours_of"][entity] if n["similarity"] >= min_similarity]
+                return {"success": True, "entity": entity, "neighbours": neighbours[:top]}
+            candidates = [
+                c for c in results["candidates"]
+                if c["similarity"] >= min_similarity and min(c["messages_a"], c["messages_b"]) >= min_messages
+                and (not same_sub_type or c["sub_type_a"] == c["sub_type_b"])
+            ]
+            return {"success": True, "entities": results["entities"], "candidates": candidates[:top]}
 
-# Load the embedding model
-embed_model = SentenceTransformer("BAAI/bge-small-en-v1.5", device="cpu")
+        return await graph_cache.respond(request, driver, build)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
 
-# Load the graph data from the JSON file to dataframe
-with open("MC3_graph.json", "r", encoding="utf-8") as f:
-        data = json.load(f)
-nodes_df = pd.DataFrame(data['nodes'])
 
-# Filter for communication events
-communication_events = nodes_df[nodes_df['sub_type'] == 'Communication'].copy()
-communication_events['content'] = communication_events['content'].fillna("")
+# Topics
+# Clusters of the message embeddings with their keywords (services/topics.py), built by the load job
+# for every graph version; a delta load only assigns its new and changed messages to the topics.
+# /comm-histogram and /sankey-communication-flows take a topic to count only its messages.
+async def _topics_or_error(driver, topic):
+    topics = await topic_cache.get(driver, _load_search_corpus)
+    if topic not in topics.positions:
+        raise ValueError(f"Unknown topic {topic}")
+    return topics
 
-# Encode the communication events to get their embeddings
-print("Encoding communication event content...")
-message_texts = [
-    "Represent this sentence for searching relevant passages: " + msg
-    for msg in communication_events["content"]
-]
-message_embs = embed_model.encode(message_texts, convert_to_tensor=True)
-print("Embeddings loaded.")
 
+@router.get("/topics", response_class=JSONResponse)
+async def list_topics(driver: AsyncDriver = Depends(get_async_driver)):
+    try:
+        topics = await topic_cache.get(driver, _load_search_corpus)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    meta = topics.meta
+    return {
+        "success": True,
+        "mode": meta["mode"],
+        "messages": meta["messages"],
+        "assigned": meta["assigned"],
+        "seconds": meta["seconds"],
+        "topics": meta["topics"]
+    }
+
+
+# Messages of one topic in time order, or the most typical ones first (order_by=similarity)
+@router.get("/topics/{topic_id}/messages", response_class=JSONResponse)
+async def topic_messages(
+    request: Request,
+    topic_id: int,
+    order_by: str = Query("time", description="time or similarity (to the topic centroid)"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(100, ge=1, le=1000),
+    driver: AsyncDriver = Depends(get_async_driver)
+):
+    if order_by not in ("time", "similarity"):
+        return {"success": False, "error": f"Unknown order '{order_by}', use time or similarity"}
+    try:
+        topics = await _topics_or_error(driver, topic_id)
+
+        def build(snapshot):
+            positions = topics.positions[topic_id]
+            if order_by == "similarity":
+                positions = sorted(positions, key=lambda p: -topics.similarities[snapshot.nodes[p]["id"]])
+            first = (page - 1) * page_size
+            messages = []
+            for position in positions[first:first + page_size]:
+                comm = snapshot.nodes[position]
+                source, target = topics.ends[position]
+                messages.append({
+                    "event_id": comm["id"],
+                    "timestamp": comm.get("timestamp"),
+                    "source": source,
+                    "target": target,
+                    "content": comm.get("content"),
+                    "similarity": round(topics.similarities[comm["id"]], 4),
+                    "sub_type": "Communication"
+                })
+            return {
+                "success": True,
+                "topic": topics.meta["topics"][topic_id],
+                "total": len(topics.positions[topic_id]),
+                "page": page,
+                "page_size": page_size,
+                "data": messages
+            }
+
+        return await graph_cache.respond(request, driver, build)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
 
-# Similarity matrix - could be used for adjacency matrix
-def calculate_similarity_between_all_messages():
-    similarity_matrix = util.cos_sim(message_embs, message_embs)
-    similarity_matrix = similarity_matrix.numpy().tolist()
 
 @router.get("/similarity-search", response_class=JSONResponse)
 async def similarity_search(
     query: str = Query(..., description="Text query for semantic message similarity"),
-    top_k: int = Query(50, description="Number of top similar messages to return"),
+    top_k: int = Query(50, ge=1, description="Number of top similar messages to return"),
     score_threshold: float = Query(0.7, description="Minimum similarity score to consider a match"),
-    order_by_time: bool = Query(False)
+    order_by_time: bool = Query(False),
+    driver: AsyncDriver = Depends(get_async_driver)
 ):
+    """
+    Messages similar to the query: the semantic matches above score_threshold and the BM25 keyword
+    matches, fused into one ranking with reciprocal rank fusion and cut to top_k. Keyword matches are
+    always part of the ranking (they used to only fill up fewer than top_k semantic matches), so a
+    message found by both ranks first and a strong keyword match can outrank weak semantic ones.
+    """
     if not query.strip():
         return {"success": False, "error": "Empty query"}
 
     try:
-        encoded_query = embed_model.encode(
-            "Represent those Keywords for searching relevant passages: " + query,
-            convert_to_tensor=True
-        )
-        scores = util.cos_sim(encoded_query, message_embs)[0]
-        top_indices = torch.topk(scores, k=top_k).indices.cpu().numpy()
+        corpus = await _get_search_corpus()
+        communication_events = corpus.communication_events
 
-        filtered_indices = [i for i in top_indices if scores[i].item() >= score_threshold]
+        encoded_query = await query_encoder.encode(MESSAGE_QUERY_PREFIX, query)
+        positions, _ = await asyncio.to_thread(
+            corpus.message_index.search, encoded_query, k=top_k, threshold=score_threshold
+        )
 
-        # Fallback content match if fewer than 10
-        if len(filtered_indices) < top_k:
-            content_matches = communication_events[
-                communication_events["content"].str.contains(query, case=False, na=False)
-            ]
-            additional_needed = top_k - len(filtered_indices)
-            additional_matches = content_matches[~content_matches.index.isin(filtered_indices)].head(additional_needed)
-            filtered_df = pd.concat([
-                communication_events.iloc[filtered_indices],
-                additional_matches
-            ]).drop_duplicates(subset=["id"])
-        else:
-            filtered_df = communication_events.iloc[filtered_indices]
+        # Keyword matches come from the inverted index instead of a full content scan,
+        # semantic and keyword rankings are fused into one list
+        keyword_matches = corpus.text.message_text_index.search(query, k=top_k)
+        fused = reciprocal_rank_fusion(
+            [positions.tolist(), [position for position, _ in keyword_matches]], limit=top_k
+        )
+        filtered_df = communication_events.iloc[fused]
 
         if filtered_df.empty:
             return {"success": True, "data": []}
@@ -894,42 +1068,38 @@ async def similarity_search(
         event_ids = filtered_df["id"].tolist()
 
         # Query Neo4j for communication metadata
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
         result = []
-        try:
-            with driver.session() as session:
-                cypher_query = """
-                UNWIND $ids AS eid
-                MATCH (source:Entity)-[:sent]->(comm:Event {id: eid})-[:received]->(target:Entity)
-                RETURN comm.id AS event_id, comm.timestamp AS timestamp, comm.content AS content,
-                       source.id AS source, target.id AS target
-                ORDER BY comm.timestamp
-                """
-                records = session.run(cypher_query, ids=event_ids)
-                if order_by_time:
-                    for row in records:
-                        result.append({
-                            "event_id": row["event_id"],
-                            "timestamp": row["timestamp"],
-                            "source": row["source"],
-                            "target": row["target"],
-                            "content": row["content"],
-                            "sub_type": "Communication"
-                        })
-                else:
-                    result_map = {r["event_id"]: r for r in records}
-                    for _, row in filtered_df.iterrows():
-                        record = result_map.get(row["id"], {})
-                        result.append({
-                            "event_id": row["id"],
-                            "timestamp": record.get("timestamp", ""),
-                            "source": record.get("source", ""),
-                            "target": record.get("target", ""),
-                            "content": record.get("content", row["content"]),
-                            "sub_type": row.get("sub_type", "Communication")
-                        })
-        finally:
-            driver.close()
+        async with driver.session() as session:
+            cypher_query = """
+            UNWIND $ids AS eid
+            MATCH (source:Entity)-[:sent]->(comm:Event {id: eid})-[:received]->(target:Entity)
+            RETURN comm.id AS event_id, comm.timestamp AS timestamp, comm.content AS content,
+                   source.id AS source, target.id AS target
+            ORDER BY comm.timestamp
+            """
+            records = await session.run(cypher_query, ids=event_ids)
+            if order_by_time:
+                async for row in records:
+                    result.append({
+                        "event_id": row["event_id"],
+                        "timestamp": row["timestamp"],
+                        "source": row["source"],
+                        "target": row["target"],
+                        "content": row["content"],
+                        "sub_type": "Communication"
+                    })
+            else:
+                result_map = {r["event_id"]: r async for r in records}
+                for _, row in filtered_df.iterrows():
+                    record = result_map.get(row["id"], {})
+                    result.append({
+                        "event_id": row["id"],
+                        "timestamp": record.get("timestamp", ""),
+                        "source": record.get("source", ""),
+                        "target": record.get("target", ""),
+                        "content": record.get("content", row["content"]),
+                        "sub_type": row.get("sub_type", "Communication")
+                    })
 
         return {"success": True, "data": result}
 
@@ -938,51 +1108,30 @@ async def similarity_search(
         return {"success": False, "error": str(e)}
 
 
-###  
-# Load all events for similarity search using contentFilter
-Events = nodes_df[nodes_df['type'] == 'Event'].copy()
-Events["full_text"] = Events[["content", "findings", "results", "destination", "outcome", "reference"]].fillna("").agg(" ".join, axis=1)
-# Embed the full text of events for similarity search
-event_texts = ["Represent this passage for retrieval: " + text for text in Events["full_text"]]
-event_embeddings = embed_model.encode(event_texts, convert_to_tensor=True)
-
 @router.get("/similarity-search-events", response_class=JSONResponse)
 async def similarity_search_events(
     query: str = Query(...),
-    score_threshold: float = Query(0.5, description="Minimum similarity score to consider a match")
+    score_threshold: float = Query(0.5, description="Minimum similarity score to consider a match"),
+    keyword_top_k: int = Query(20, ge=0, description="Number of keyword matches fused into the semantic matches")
 ):
+    """
+    IDs of the events similar to the query: all semantic matches above score_threshold and the
+    keyword_top_k best BM25 keyword matches over the full event text, fused with reciprocal rank fusion.
+    """
     print(f"Starting similarity search for events with query: {query} and threshold: {score_threshold}")
     try:
-        # Encode the query for semantic search
-        encoded_query = embed_model.encode(
-            "Represent this question for retrieving supporting passages: " + query,
-            convert_to_tensor=True
-        )
-
-        # Perform semantic similarity search
-        scores = util.cos_sim(encoded_query, event_embeddings)[0]
-        top_indices = (scores > score_threshold).nonzero().flatten().cpu().numpy()
-        matched_df = Events.iloc[top_indices].copy()
-        matched_ids = matched_df["id"].tolist()
+        corpus = await _get_search_corpus()
 
-        # Count how many of the matched results are communication events
-        comm_matches = matched_df[matched_df["sub_type"] == "Communication"]
-        num_comm_matches = len(comm_matches)
-
-        # Fallback: if fewer than 10 communication events, add direct text matches from communication_events
-        if num_comm_matches < 10:
-            print(f"Found only {num_comm_matches} communication events in similarity search. Adding direct matches.")
-            additional_needed = 20 - num_comm_matches
+        # Encode the query for semantic search
+        encoded_query = await query_encoder.encode(EVENT_QUERY_PREFIX, query)
 
-            direct_matches = communication_events[
-                communication_events["content"].str.contains(query, case=False, na=False)
-            ]
-            additional_matches = direct_matches[
-                ~direct_matches["id"].isin(matched_ids)
-            ].head(additional_needed)
+        # Perform semantic similarity search (best match first)
+        positions, _ = await asyncio.to_thread(corpus.event_index.search, encoded_query, threshold=score_threshold)
 
-            additional_ids = additional_matches["id"].tolist()
-            matched_ids = list(dict.fromkeys(matched_ids + additional_ids))  # preserve order and remove duplicates
+        # Keyword matches over the full event text, fused with the semantic matches
+        keyword_matches = corpus.text.event_text_index.search(query, k=keyword_top_k)
+        fused = reciprocal_rank_fusion([positions.tolist(), [position for position, _ in keyword_matches]])
+        matched_ids = corpus.events.iloc[fused]["id"].tolist()
 
         print(f"Returning {len(matched_ids)} matched event IDs")
         return {"success": True, "event_ids": matched_ids}
@@ -0,0 +1,292 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from services.artifacts import VersionCache, versioned_artifact
+from services.comm_cube import communications_from_graph
+from services.embeddings import CACHE_DIR
+from services.graph_cache import graph_cache, graph_version
+from services.timestamps import DAY_SECONDS, to_epoch
+
+# Graph analytics of the entities: PageRank, betweenness, degrees and Louvain communities.
+# The entity graph has a directed edge sender -> receiver weighted by the number of messages,
+# plus RELATIONSHIP_WEIGHT per collapsed relationship (both directions for undirected ones).
+# It is kept as flat edge arrays sorted by source; PageRank is a numpy power iteration over them,
+# betweenness (Brandes) and Louvain run on networkx graphs built from the same arrays.
+# On larger graphs betweenness is split by source nodes over a process pool and Louvain runs in
+# the pool at the same time. Results are computed once per graph version (by the load job right
+# before it publishes the version, or by the first request) and saved under ANALYTICS_DIR, so
+# every worker reads the same file. Degree per time window is computed on request from the
+# communication arrays, it depends on the requested window.
+
+ANALYTICS_DIR = os.path.join(CACHE_DIR, "analytics")
+ANALYTICS_WORKERS = int(os.environ.get("ANALYTICS_WORKERS", min(4, os.cpu_count() or 1)))
+# Below this many entities the process pool costs more than it saves
+ANALYTICS_PARALLEL_MIN_NODES = int(os.environ.get("ANALYTICS_PARALLEL_MIN_NODES", 1000))
+ANALYTICS_SEED = int(os.environ.get("ANALYTICS_SEED", 42))
+RELATIONSHIP_WEIGHT = 1.0
+
+PAGERANK_ALPHA = 0.85
+
+
+class AnalyticsGraph:
+    def __init__(self, entities, communications, relationships):
+        """
+        entities: entity ids
+        communications: (sender id, receiver id, epoch seconds or None)
+        relationships: (source id, target id, directed) of the collapsed relationship edges
+        """
+        self.ids = sorted(set(entities))
+        self.index = {entity_id: position for position, entity_id in enumerate(self.ids)}
+
+        comms = [(self.index[s], self.index[r], epoch) for s, r, epoch in communications
+                 if s in self.index and r in self.index]
+        self.comm_sender = np.array([c[0] for c in comms], dtype=np.int64)
+        self.comm_receiver = np.array([c[1] for c in comms], dtype=np.int64)
+        self.comm_epoch = np.array([c[2] if c[2] is not None else np.nan for c in comms], dtype=np.float64)
+
+        weights = Counter()
+        for sender, receiver, _ in comms:
+            weights[(sender, receiver)] += 1
+        for source, target, directed in relationships:
+            if source in self.index and target in self.index:
+                weights[(self.index[source], self.index[target])] += RELATIONSHIP_WEIGHT
+                if not directed:
+                    weights[(self.index[target], self.index[source])] += RELATIONSHIP_WEIGHT
+        pairs = sorted(weights)
+        self.src = np.array([p[0] for p in pairs], dtype=np.int64)
+        self.dst = np.array([p[1] for p in pairs], dtype=np.int64)
+        self.weight = np.array([weights[p] for p in pairs], dtype=np.float64)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        entities = [node["id"] for node, labels in zip(snapshot.nodes, snapshot.labels) if "Entity" in labels]
+        communications = [(sender, receiver, snapshot.epochs[position])
+                          for sender, position, receiver in snapshot.communications]
+        relationships = [(edge["source"], edge["target"], bool(edge.get("directed", True)))
+                         for edge, (source_is_entity, target_is_entity) in zip(snapshot.edges, snapshot.edge_meta)
+                         if source_is_entity and target_is_entity]
+        return cls(entities, communications, relationships)
+
+    @classmethod
+    def from_graph(cls, nodes, edges, relationship_edges):
+        """
+        From the loader's prepared nodes, edges and collapsed relationship rows.
+        Rows of the same (type, source, target) are one edge in Neo4j (MERGE ... SET +=), so they are
+        counted once with the last directed value, like from_snapshot sees them.
+        """
+        entities = [node["id"] for node in nodes if node.get("type") == "Entity"]
+        communications = [(s, r, to_epoch(timestamp)) for s, r, timestamp in communications_from_graph(nodes, edges)]
+        directed = {}
+        for row in relationship_edges:
+            key = (row["type"], row["source"], row["target"])
+            directed[key] = row["props"].get("directed", directed.get(key, True))
+        relationships = [(source, target, bool(value)) for (_, source, target), value in directed.items()]
+        return cls(entities, communications, relationships)
+
+    def pagerank(self, alpha=PAGERANK_ALPHA, tol=1e-10, max_iter=200):
+        n = len(self.ids)
+        if n == 0:
+            return np.zeros(0)
+        out_weight = np.bincount(self.src, weights=self.weight, minlength=n)
+        dangling = out_weight == 0
+        share = self.weight / out_weight[self.src] if len(self.src) else self.weight
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            spread = np.bincount(self.dst, weights=rank[self.src] * share, minlength=n)
+            new_rank = alpha * (spread + rank[dangling].sum() / n) + (1 - alpha) / n
+            converged = np.abs(new_rank - rank).sum() < n * tol
+            rank = new_rank
+            if converged:
+                break
+        return rank
+
+    def degrees(self):
+        n = len(self.ids)
+        return {
+            "in_degree": np.bincount(self.dst, minlength=n),
+            "out_degree": np.bincount(self.src, minlength=n),
+            "messages_sent": np.bincount(self.comm_sender, minlength=n),
+            "messages_received": np.bincount(self.comm_receiver, minlength=n),
+        }
+
+    def degree_windows(self, width, start=None, end=None, top=10):
+        """
+        Distinct counterparts (degree) and messages per entity in windows of width seconds,
+        from start to end (epoch seconds, end exclusive).
+        Returns [(window start, active entities, top [(entity, degree, messages)])].
+        """
+        known = ~np.isnan(self.comm_epoch)
+        epochs = self.comm_epoch[known].astype(np.int64)
+        senders = self.comm_sender[known]
+        receivers = self.comm_receiver[known]
+        if start is None:
+            start = int(epochs.min()) if len(epochs) else 0
+        if end is None:
+            end = int(epochs.max()) + 1 if len(epochs) else start
+        # Windows of whole days start at midnight
+        start -= start % (DAY_SECONDS if width % DAY_SECONDS == 0 else width)
+        selected = (epochs >= start) & (epochs < end)
+        buckets = (epochs[selected] - start) // width
+
+        # One row per (window, entity, counterpart) for both sides of every message
+        rows = np.stack([
+            np.concatenate([buckets, buckets]),
+            np.concatenate([senders[selected], receivers[selected]]),
+            np.concatenate([receivers[selected], senders[selected]]),
+        ], axis=1)
+        per_window = {}
+        if len(rows):
+            entity_rows, messages = np.unique(rows[:, :2], axis=0, return_counts=True)
+            distinct = np.unique(rows, axis=0)
+            degree_keys, degrees = np.unique(distinct[:, :2], axis=0, return_counts=True)
+            message_counts = {tuple(key): count for key, count in zip(entity_rows.tolist(), messages.tolist())}
+            for (bucket, entity), degree in zip(degree_keys.tolist(), degrees.tolist()):
+                per_window.setdefault(bucket, []).append((self.ids[entity], degree, message_counts[(bucket, entity)]))
+        windows = []
+        for bucket in range(max(0, -(-(end - start) // width))):
+            entities = sorted(per_window.get(bucket, []), key=lambda e: (-e[1], -e[2], e[0]))
+            windows.append((start + bucket * width, len(entities), entities[:top]))
+        return windows
+
+
+def _nx_graph(n, edges, directed):
+    import networkx as nx
+    graph = nx.DiGraph() if directed else nx.Graph()
+    graph.add_nodes_from(range(n))
+    if directed:
+        graph.add_edges_from(edges)
+    else:
+        for source, target, weight in edges:
+            previous = graph.get_edge_data(source, target, {}).get("weight", 0)
+            graph.add_edge(source, target, weight=previous + weight)
+    return graph
+
+
+# Unnormalised betweenness of all nodes, counting the shortest paths that start in sources.
+# Summing the parts over a partition of the nodes gives the full betweenness.
+def _betweenness_part(n, edges, sources):
+    import networkx as nx
+    start = time.perf_counter()
+    graph = _nx_graph(n, edges, directed=True)
+    part = nx.betweenness_centrality_subset(graph, sources, list(range(n)), normalized=False)
+    return [part[i] for i in range(n)], time.perf_counter() - start
+
+
+def _louvain(n, weighted_edges, seed):
+    import networkx as nx
+    start = time.perf_counter()
+    graph = _nx_graph(n, weighted_edges, directed=False)
+    communities = nx.community.louvain_communities(graph, weight="weight", seed=seed)
+    modularity = nx.community.modularity(graph, communities, weight="weight") if graph.number_of_edges() else 0.0
+    return [sorted(c) for c in communities], modularity, time.perf_counter() - start
+
+
+def compute_analytics(graph, version=None, workers=ANALYTICS_WORKERS):
+    """
+    PageRank, betweenness, degrees and communities of an AnalyticsGraph, as a JSON-ready dict.
+    """
+    start = time.perf_counter()
+    n = len(graph.ids)
+    edges = list(zip(graph.src.tolist(), graph.dst.tolist()))
+    weighted_edges = list(zip(graph.src.tolist(), graph.dst.tolist(), graph.weight.tolist()))
+    seconds = {}
+
+    parallel = workers > 1 and n >= ANALYTICS_PARALLEL_MIN_NODES
+    if parallel:
+        # spawn: the serving worker runs threads and an event loop, which must not be forked
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            louvain = pool.submit(_louvain, n, weighted_edges, ANALYTICS_SEED)
+            parts = [pool.submit(_betweenness_part, n, edges, list(range(i, n, workers))) for i in range(workers)]
+            pagerank_start = time.perf_counter()
+            pagerank = graph.pagerank()
+            seconds["pagerank"] = time.perf_counter() - pagerank_start
+            betweenness_start = time.perf_counter()
+            parts = [part.result() for part in parts]
+            seconds["betweenness"] = time.perf_counter() - betweenness_start
+            communities, modularity, seconds["louvain"] = louvain.result()
+    else:
+        pagerank_start = time.perf_counter()
+        pagerank = graph.pagerank()
+        seconds["pagerank"] = time.perf_counter() - pagerank_start
+        parts = [_betweenness_part(n, edges, list(range(n)))]
+        seconds["betweenness"] = parts[0][1]
+        communities, modularity, seconds["louvain"] = _louvain(n, weighted_edges, ANALYTICS_SEED)
+
+    betweenness = np.sum([part for part, _ in parts], axis=0) if n else np.zeros(0)
+    if n > 2:
+        betweenness = betweenness / ((n - 1) * (n - 2))
+
+    communities = sorted(communities, key=lambda members: (-len(members), members))
+    community_of = {}
+    community_rows = []
+    for community_id, members in enumerate(communities):
+        member_set = set(members)
+        for member in members:
+            community_of[member] = community_id
+        internal = sum(w for s, t, w in weighted_edges if s in member_set and t in member_set)
+        community_rows.append({
+            "id": community_id,
+            "size": len(members),
+            "members": [graph.ids[member] for member in members],
+            "internal_weight": internal
+        })
+
+    degrees = graph.degrees()
+    entities = []
+    for position, entity_id in enumerate(graph.ids):
+        entities.append({
+            "id": entity_id,
+            "pagerank": float(pagerank[position]),
+            "betweenness": float(betweenness[position]),
+            **{name: int(values[position]) for name, values in degrees.items()},
+            "community": community_of.get(position)
+        })
+    seconds["total"] = time.perf_counter() - start
+    print(f"Computed graph analytics of {n} entities in {seconds['total']:.2f}s"
+          f"{f' with {workers} processes' if parallel else ''}")
+    return {
+        "version": version,
+        "nodes": n,
+        "edges": len(edges),
+        "parallel_workers": workers if parallel else 1,
+        "seconds": {name: round(value, 3) for name, value in seconds.items()},
+        "modularity": modularity,
+        "entities": entities,
+        "communities": community_rows
+    }
+
+
+def analytics_path(version):
+    return os.path.join(ANALYTICS_DIR, f"{version}.json")
+
+
+def load_or_compute(graph, version):
+    """
+    Analytics of the version from ANALYTICS_DIR, computed and saved first if missing (services/artifacts.py).
+    """
+    return versioned_artifact(analytics_path(version), lambda: compute_analytics(graph, version))
+
+
+class Analytics:
+    def __init__(self, graph, results):
+        self.graph = graph
+        self.results = results
+        self.version = results["version"]
+        self.entities = {entity["id"]: entity for entity in results["entities"]}
+
+
+async def _build(version, driver):
+    snapshot = await graph_cache.get_snapshot(driver, version)
+    graph = await asyncio.to_thread(AnalyticsGraph.from_snapshot, snapshot)
+    results = await asyncio.to_thread(load_or_compute, graph, version)
+    return Analytics(graph, results)
+
+
+# analytics_cache.get(driver) -> Analytics of the current graph version
+analytics_cache = VersionCache(graph_version, _build)
@@ -0,0 +1,106 @@
+import asyncio
+import fcntl
+import json
+import os
+
+# Artifacts derived from the graph (analytics, communication cube, pseudonym candidates, topic
+# models, corpus embeddings), shared by all uvicorn workers and the load job through files under
+# CACHE_DIR. versioned_artifact() loads the file of a version, or computes and saves it while
+# holding a flock next to it, so concurrent workers wait for the first one and load its result.
+# Files are written under a temporary name and renamed, a reader never sees a partial file.
+# Once a version is saved, the older files of the same kind in its directory are removed.
+# VersionCache keeps the artifact of the current graph version in the memory of one worker.
+
+
+def write_atomic(path, write, mode="wb"):
+    """
+    Write a file through write(f) on a temporary file that replaces path when it is complete.
+    """
+    tmp_path = path + f".{os.getpid()}.tmp"
+    with open(tmp_path, mode, encoding=None if "b" in mode else "utf-8") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_json(path, value):
+    write_atomic(path, lambda f: json.dump(value, f), mode="w")
+
+
+def remove_older_versions(path, prefix=""):
+    """
+    Remove the files next to path that start with prefix and end with its extension, except the
+    files of path's own version (same name up to the first dot) and files newer than path.
+    """
+    directory, name = os.path.split(path)
+    version = name.split(".", 1)[0]
+    extension = os.path.splitext(name)[1]
+    saved_at = os.path.getmtime(path)
+    for file_name in os.listdir(directory):
+        if not file_name.startswith(prefix) or not file_name.endswith(extension):
+            continue
+        if file_name.split(".", 1)[0] == version:
+            continue
+        file_path = os.path.join(directory, file_name)
+        try:
+            # A slow worker finishing an old version must not remove the newer one
+            if os.path.getmtime(file_path) <= saved_at:
+                os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+
+def versioned_artifact(path, compute, load=load_json, save=save_json, prefix="", reload=False):
+    """
+    The artifact saved at path, computed with compute() and saved with save(path, artifact) first
+    if load(path) returns None. With reload the saved file is loaded again instead of returning
+    the computed artifact (e.g. to memory-map it). prefix is passed to remove_older_versions.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    artifact = load(path)
+    if artifact is not None:
+        return artifact
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Another worker may have saved it while we were waiting
+            artifact = load(path)
+            if artifact is None:
+                artifact = compute()
+                save(path, artifact)
+                if reload:
+                    artifact = load(path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    remove_older_versions(path, prefix)
+    return artifact
+
+
+class VersionCache:
+    def __init__(self, current_version, build):
+        """
+        current_version() -> the current graph version; build(version, *args) -> its artifact,
+        awaited once per version while concurrent requests wait for it.
+        """
+        self.current_version = current_version
+        self.build = build
+        self.version = None
+        self.value = None
+        self._lock = asyncio.Lock()
+
+    async def get(self, *args):
+        version = self.current_version()
+        if self.version == version:
+            return self.value
+        async with self._lock:
+            if self.version != version:
+                self.value = await self.build(version, *args)
+                self.version = version
+        return self.value
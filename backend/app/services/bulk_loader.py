@@ -0,0 +1,263 @@
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from services.read_gate import switching
+
+# Bulk ingest engine for the graph loader.
+# Nodes are grouped by label and edges by relationship type (and endpoint labels),
+# then written as large UNWIND $rows batches instead of one transaction per row.
+# A loader with a namespace writes the labels with that prefix (StagingEntity, ...), which the
+# read queries never match, and promote() swaps them in as the live graph in one transaction.
+# That transaction holds every live and staged node, so it is limited to PROMOTE_TX_MAX_NODES;
+# larger graphs are swapped in batches behind the read gate (services/read_gate.py), which holds
+# off every reader of the database until the switch is complete.
+
+NODE_LABELS = ["Entity", "Event", "Relationship"]
+STAGING_NAMESPACE = "Staging"
+
+# Rows sent with a single UNWIND statement
+LOAD_BATCH_SIZE = int(os.environ.get("LOAD_BATCH_SIZE", 5000))
+# Rows committed in a single transaction (a multiple of the batch size works best)
+LOAD_TX_SIZE = int(os.environ.get("LOAD_TX_SIZE", 20000))
+# Live + staged nodes swapped by promote() in a single transaction
+PROMOTE_TX_MAX_NODES = int(os.environ.get("PROMOTE_TX_MAX_NODES", 200000))
+
+
+def _chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+# {"type", "source", "target", "props"} rows of raw graph edges
+def edge_rows(edges, default_type="RELATED_TO"):
+    return [
+        {
+            "type": edge.get("type", default_type),
+            "source": edge.get("source"),
+            "target": edge.get("target"),
+            "props": {k: v for k, v in edge.items() if k not in ["source", "target"]}
+        }
+        for edge in edges
+    ]
+
+
+class BulkLoader:
+    def __init__(self, driver, batch_size=LOAD_BATCH_SIZE, tx_size=LOAD_TX_SIZE, namespace="", status=None):
+        self.driver = driver
+        self.batch_size = max(1, batch_size)
+        self.tx_size = max(self.batch_size, tx_size)
+        self.namespace = namespace
+        self.status = status  # services/load_status.LoadStatus of the running load, if any
+        self.node_labels = {}  # node id -> label, used to label the edge MATCHes
+        self.stats = {}
+        self._tx = None
+
+    # Label of a node type in this loader's namespace
+    def label(self, label):
+        return f"{self.namespace}{label}"
+
+    def _labels(self):
+        return "|".join(f"`{self.label(label)}`" for label in NODE_LABELS)
+
+    # Delete the graph of this namespace in small transactions so a large graph does not
+    # have to fit into a single transaction state.
+    def clear(self):
+        start = time.perf_counter()
+        self._start("clear", 0)
+        with self.driver.session() as session:
+            session.run(
+                f"MATCH (n:{self._labels()}) CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF $size ROWS",
+                size=self.tx_size
+            ).consume()
+        self._record("clear", 0, start)
+
+    # Replace the live graph with the graph of this namespace in a single transaction,
+    # so readers see either the complete old graph or the complete new one.
+    # Above max_tx_nodes live + staged nodes the transaction state would not fit into memory:
+    # the live graph is then deleted and the staged one relabelled in transactions of tx_size nodes,
+    # with the read gate closed, so readers still only see the complete old or new graph.
+    def promote(self, max_tx_nodes=PROMOTE_TX_MAX_NODES):
+        start = time.perf_counter()
+        self._start("switch", 0)
+
+        def swap(tx):
+            tx.run(f"MATCH (n:{'|'.join(NODE_LABELS)}) DETACH DELETE n").consume()
+            for label in NODE_LABELS:
+                tx.run(f"MATCH (n:`{self.label(label)}`) REMOVE n:`{self.label(label)}` SET n:`{label}`").consume()
+
+        with self.driver.session() as session:
+            nodes = sum(
+                session.run(f"MATCH (n:`{label}`) RETURN count(n) AS count").single()["count"]
+                for label in NODE_LABELS + [self.label(label) for label in NODE_LABELS]
+            )
+            if nodes <= max_tx_nodes:
+                session.execute_write(swap)
+            else:
+                print(f"Switching {nodes} nodes in batches of {self.tx_size}, readers wait until it ends")
+                with switching():
+                    session.run(
+                        f"MATCH (n:{'|'.join(NODE_LABELS)}) CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF $size ROWS",
+                        size=self.tx_size
+                    ).consume()
+                    for label in NODE_LABELS:
+                        session.run(
+                            f"MATCH (n:`{self.label(label)}`) "
+                            f"CALL {{ WITH n REMOVE n:`{self.label(label)}` SET n:`{label}` }} IN TRANSACTIONS OF $size ROWS",
+                            size=self.tx_size
+                        ).consume()
+        return self._record("switch", 0, start)
+
+    # Run all writes until the block ends in one transaction (e.g. the few rows of a delta load),
+    # instead of committing every tx_size rows
+    @contextmanager
+    def transaction(self):
+        with self.driver.session() as session:
+            with session.begin_transaction() as tx:
+                self._tx = tx
+                try:
+                    yield
+                    tx.commit()
+                finally:
+                    self._tx = None
+
+    # Group nodes by label and MERGE them on id with all their properties.
+    # Nodes with an unknown type are skipped, as in the old per-node loader.
+    # replace=True overwrites all properties of an existing node instead of adding to them.
+    def load_nodes(self, nodes, replace=False, phase="nodes"):
+        start = time.perf_counter()
+        groups = defaultdict(list)
+        for node in nodes:
+            label = node.get("type")
+            if label not in NODE_LABELS or node.get("id") is None:
+                continue
+            self.node_labels[node["id"]] = label
+            groups[label].append({"id": node["id"], "props": dict(node)})
+
+        self._start(phase, sum(len(rows) for rows in groups.values()))
+        total = 0
+        for label, rows in groups.items():
+            query = f"""
+                UNWIND $rows AS row
+                MERGE (n:`{self.label(label)}` {{id: row.id}})
+                SET n {"=" if replace else "+="} row.props
+            """
+            total += self._write_rows(query, rows, phase)
+        return self._record(phase, total, start)
+
+    # Remember the labels of nodes that are already in the database,
+    # so edges to them can be loaded without loading the nodes again
+    def register_nodes(self, nodes):
+        for node in nodes:
+            if node.get("type") in NODE_LABELS and node.get("id") is not None:
+                self.node_labels[node["id"]] = node["type"]
+
+    # Group edges by (type, source label, target label) so both endpoints are
+    # matched through their label instead of scanning every node.
+    # load_nodes has to run first so the endpoint labels are known.
+    def load_edges(self, edges, default_type="RELATED_TO"):
+        return self.load_edge_rows(edge_rows(edges, default_type), phase="edges")
+
+    # Same as load_edges for rows that already carry their type and properties
+    # ({"type", "source", "target", "props"}), e.g. the collapsed Relationship edges.
+    def load_edge_rows(self, rows, phase="edges", replace=False):
+        start = time.perf_counter()
+        groups = self._edge_groups(rows)
+        self._start(phase, sum(len(group_rows) for group_rows in groups.values()))
+        total = 0
+        for (rel_type, source_label, target_label), group_rows in groups.items():
+            query = f"""
+                UNWIND $rows AS row
+                MATCH (a:`{source_label}` {{id: row.source}})
+                MATCH (b:`{target_label}` {{id: row.target}})
+                MERGE (a)-[r:`{rel_type}`]->(b)
+                SET r {"=" if replace else "+="} row.props
+            """
+            total += self._write_rows(query, [
+                {"source": row["source"], "target": row["target"], "props": row["props"]}
+                for row in group_rows
+            ], phase)
+        return self._record(phase, total, start)
+
+    # DETACH DELETE nodes by id, grouped by label ({"id", "type"} dicts)
+    def delete_nodes(self, nodes, phase="deleted nodes"):
+        start = time.perf_counter()
+        groups = defaultdict(list)
+        for node in nodes:
+            if node.get("type") in NODE_LABELS:
+                groups[node["type"]].append(node["id"])
+        self._start(phase, sum(len(ids) for ids in groups.values()))
+        total = 0
+        for label, ids in groups.items():
+            query = f"""
+                UNWIND $rows AS id
+                MATCH (n:`{self.label(label)}` {{id: id}})
+                DETACH DELETE n
+            """
+            total += self._write_rows(query, ids, phase)
+        return self._record(phase, total, start)
+
+    # DELETE the relationships of {"type", "source", "target"} rows
+    def delete_edge_rows(self, rows, phase="deleted edges"):
+        start = time.perf_counter()
+        groups = self._edge_groups(rows)
+        self._start(phase, sum(len(group_rows) for group_rows in groups.values()))
+        total = 0
+        for (rel_type, source_label, target_label), group_rows in groups.items():
+            query = f"""
+                UNWIND $rows AS row
+                MATCH (a:`{source_label}` {{id: row.source}})-[r:`{rel_type}`]->(b:`{target_label}` {{id: row.target}})
+                DELETE r
+            """
+            total += self._write_rows(query, [{"source": row["source"], "target": row["target"]} for row in group_rows], phase)
+        return self._record(phase, total, start)
+
+    def _edge_groups(self, rows):
+        groups = defaultdict(list)
+        for row in rows:
+            source_label = self.node_labels.get(row["source"])
+            target_label = self.node_labels.get(row["target"])
+            if source_label is None or target_label is None:
+                continue  # endpoint was never loaded, MATCH would find nothing
+            groups[(row["type"], self.label(source_label), self.label(target_label))].append(row)
+        return groups
+
+    # Rows are counted once their transaction committed: execute_write runs write again
+    # when it retries a transaction, so counting inside it would count the retried batches twice.
+    def _write_rows(self, query, rows, phase):
+        def write(tx, tx_rows):
+            for batch in _chunks(tx_rows, self.batch_size):
+                tx.run(query, rows=batch).consume()
+                if self.status:
+                    self.status.check_cancelled()
+
+        if self._tx is not None:
+            write(self._tx, rows)
+            self._advance(phase, len(rows))
+            return len(rows)
+        with self.driver.session() as session:
+            for tx_rows in _chunks(rows, self.tx_size):
+                session.execute_write(write, tx_rows)
+                self._advance(phase, len(tx_rows))
+        return len(rows)
+
+    def _advance(self, phase, rows):
+        if self.status:
+            self.status.advance(phase, rows)
+
+    def _start(self, phase, rows):
+        if self.status:
+            self.status.start_phase(phase, rows)
+
+    def _record(self, phase, rows, start):
+        seconds = time.perf_counter() - start
+        rate = rows / seconds if seconds > 0 else 0.0
+        self.stats[phase] = {"rows": rows, "seconds": round(seconds, 3), "rows_per_sec": round(rate, 1)}
+        if self.status:
+            self.status.end_phase(phase)
+        if rows:
+            print(f"Loaded {rows} {phase} in {seconds:.2f}s ({rate:.0f} rows/sec)")
+        else:
+            print(f"Finished {phase} in {seconds:.2f}s")
+        return self.stats[phase]
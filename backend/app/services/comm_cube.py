@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+import re
+import time
+import numpy as np
+
+from services.artifacts import VersionCache, versioned_artifact, write_atomic
+from services.embeddings import CACHE_DIR
+from services.graph_cache import graph_cache, graph_version
+from services.timestamps import epoch_label, to_epoch
+
+# Time-bucketed pre-aggregation of communication volume.
+# Every communication (sender -> Communication event -> receiver) is counted in hourly buckets,
+# once in the "all" series, once per sender, once per receiver and once per (sender, receiver) pair.
+# A series only stores the hours that have messages and the cumulative counts, so the count of any
+# range is two binary searches and a histogram of n buckets is n + 1 lookups, whatever the number
+# of messages. The cube is built by the loader for the version it writes and saved under CACHE_DIR,
+# so every worker loads the same file. A missing cube (e.g. a database loaded before the cube
+# existed) is rebuilt from the graph snapshot and saved for the other workers.
+
+COMM_CUBE_DIR = os.path.join(CACHE_DIR, "comm_cube")
+
+HOUR_SECONDS = 60 * 60
+GRANULARITIES = {"hour": 1, "day": 24, "week": 24 * 7}
+GRANULARITY_RE = re.compile(r"^(\d+)\s*([hd])$")
+
+
+def parse_granularity(granularity):
+    """
+    Bucket width in hours: "hour", "day", "week" or a multiple like "6h" / "2d".
+    """
+    granularity = (granularity or "hour").strip().lower()
+    if granularity in GRANULARITIES:
+        return GRANULARITIES[granularity]
+    match = GRANULARITY_RE.match(granularity)
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f"Unknown granularity '{granularity}', use hour, day, week or e.g. 6h / 2d")
+    return int(match.group(1)) * (24 if match.group(2) == "d" else 1)
+
+
+# Hours since the epoch (UTC, as every timestamp filter); None for timestamps that can not be parsed
+def to_hours(timestamps):
+    hours = []
+    for timestamp in timestamps:
+        epoch = to_epoch(timestamp)
+        hours.append(epoch // HOUR_SECONDS if epoch is not None else None)
+    return hours
+
+
+def hour_label(hour):
+    return epoch_label(int(hour) * HOUR_SECONDS)
+
+
+class CommCube:
+    def __init__(self, keys, offsets, hours, cumulative, version=None):
+        self.keys = keys  # series key -> series position
+        self.offsets = offsets  # series i has hours[offsets[i]:offsets[i + 1]]
+        self.hours = hours
+        self.cumulative = cumulative  # running count per series, 0 before the first hour of each series
+        self.version = version
+        self.first_hour = int(hours.min()) if len(hours) else None
+        self.last_hour = int(hours.max()) if len(hours) else None
+        self._pairs = None
+
+    @classmethod
+    def build(cls, communications, version=None):
+        """
+        communications: iterable of (sender id, receiver id, timestamp string)
+        """
+        communications = list(communications)
+        buckets = {}
+        for (sender, receiver, _), hour in zip(communications, to_hours(c[2] for c in communications)):
+            if hour is None:
+                continue
+            for key in (("all",), ("sender", sender), ("receiver", receiver), ("pair", sender, receiver)):
+                series = buckets.setdefault(key, {})
+                series[hour] = series.get(hour, 0) + 1
+
+        keys = {}
+        offsets = [0]
+        hours = []
+        cumulative = []
+        for key, series in buckets.items():
+            keys[key] = len(keys)
+            series_hours = sorted(series)
+            hours.extend(series_hours)
+            cumulative.extend(np.cumsum([series[hour] for hour in series_hours]).tolist())
+            offsets.append(len(hours))
+        return cls(keys, np.array(offsets, dtype=np.int64), np.array(hours, dtype=np.int64),
+                   np.array(cumulative, dtype=np.int64), version)
+
+    def save(self, path):
+        write_atomic(path, lambda f: np.savez(
+            f, keys=np.array([json.dumps(list(key)) for key in self.keys]), offsets=self.offsets,
+            hours=self.hours, cumulative=self.cumulative
+        ))
+
+    @classmethod
+    def load(cls, path, version=None):
+        """
+        The cube saved at path, None if there is none.
+        """
+        try:
+            with np.load(path) as data:
+                keys = {tuple(json.loads(key)): position for position, key in enumerate(data["keys"].tolist())}
+                return cls(keys, data["offsets"], data["hours"], data["cumulative"], version)
+        except FileNotFoundError:
+            return None
+
+    def _series(self, key):
+        position = self.keys.get(key)
+        if position is None:
+            return None, None
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.hours[start:end], self.cumulative[start:end]
+
+    # Cumulative count before each boundary hour, vectorised over the boundaries
+    def _counts_before(self, key, boundaries):
+        hours, cumulative = self._series(key)
+        if hours is None or not len(hours):
+            return np.zeros(len(boundaries), dtype=np.int64)
+        positions = np.searchsorted(hours, boundaries, side="left")
+        return np.concatenate([[0], cumulative])[positions]
+
+    def count(self, key, start_hour, end_hour):
+        before = self._counts_before(key, np.array([start_hour, end_hour + 1]))
+        return int(before[1] - before[0])
+
+    def histogram(self, key, start_hour, end_hour, width):
+        """
+        Counts in buckets of width hours from start_hour up to and including end_hour.
+        Returns [(bucket start hour, count)].
+        """
+        buckets = -(-(end_hour - start_hour + 1) // width)
+        boundaries = start_hour + width * np.arange(buckets + 1, dtype=np.int64)
+        boundaries[-1] = min(boundaries[-1], end_hour + 1)
+        counts = np.diff(self._counts_before(key, boundaries))
+        return list(zip(boundaries[:-1].tolist(), counts.tolist()))
+
+    def _pair_index(self):
+        """
+        (sender, receiver) and series position of every pair series, and the hours of all series
+        as one sorted array of series position << 32 | hour, so all pairs are searched at once.
+        """
+        if self._pairs is None:
+            pairs = [(key[1:], position) for key, position in self.keys.items() if key[0] == "pair"]
+            series = np.repeat(np.arange(len(self.keys), dtype=np.int64), np.diff(self.offsets))
+            self._pairs = ([pair for pair, _ in pairs], np.array([position for _, position in pairs], dtype=np.int64),
+                           (series << 32) + self.hours)
+        return self._pairs
+
+    def pair_counts(self, start_hour, end_hour):
+        """
+        Communications per (sender, receiver) from start_hour up to and including end_hour.
+        Returns [((sender, receiver), count)] for the pairs with messages in the range.
+        """
+        pairs, positions, series_hours = self._pair_index()
+        lower = np.searchsorted(series_hours, (positions << 32) + start_hour, side="left")
+        upper = np.searchsorted(series_hours, (positions << 32) + end_hour + 1, side="left")
+        first = self.offsets[positions]
+        cumulative = np.concatenate([[0], self.cumulative])
+        counts = (np.where(upper > first, cumulative[upper], 0) - np.where(lower > first, cumulative[lower], 0))
+        return [(pairs[i], int(counts[i])) for i in np.flatnonzero(counts)]
+
+    def entity_totals(self, start_hour, end_hour):
+        """
+        Sent, received and total communications per entity in the range, busiest first.
+        """
+        totals = {}
+        for key in self.keys:
+            if key[0] not in ("sender", "receiver"):
+                continue
+            count = self.count(key, start_hour, end_hour)
+            if count:
+                entity = totals.setdefault(key[1], {"id": key[1], "sent": 0, "received": 0, "total": 0})
+                entity["sent" if key[0] == "sender" else "received"] += count
+                entity["total"] += count
+        return sorted(totals.values(), key=lambda entity: (-entity["total"], entity["id"]))
+
+
+def cube_path(version):
+    return os.path.join(COMM_CUBE_DIR, f"{version}.npz")
+
+
+def communications_from_graph(nodes, edges):
+    """
+    (sender, receiver, timestamp) of every communication in the loader's nodes and edges.
+    """
+    node_types = {node.get("id"): node.get("type") for node in nodes}
+    communications = {node["id"]: node.get("timestamp") for node in nodes
+                      if node.get("type") == "Event" and node.get("sub_type") == "Communication"}
+    senders = {}
+    receivers = {}
+    for edge in edges:
+        if edge.get("type") == "sent" and edge.get("target") in communications and node_types.get(edge.get("source")) == "Entity":
+            senders.setdefault(edge["target"], []).append(edge["source"])
+        elif edge.get("type") == "received" and edge.get("source") in communications and node_types.get(edge.get("target")) == "Entity":
+            receivers.setdefault(edge["source"], []).append(edge["target"])
+    for comm_id, timestamp in communications.items():
+        for sender in senders.get(comm_id, []):
+            for receiver in receivers.get(comm_id, []):
+                yield sender, receiver, timestamp
+
+
+def communications_from_snapshot(snapshot):
+    for sender, position, receiver in snapshot.communications:
+        yield sender, receiver, snapshot.nodes[position].get("timestamp")
+
+
+def load_or_build(version, communications):
+    """
+    Cube of the version from COMM_CUBE_DIR, built from communications() and saved first if missing
+    (services/artifacts.py).
+    """
+    def build():
+        start = time.perf_counter()
+        cube = CommCube.build(communications(), version)
+        print(f"Built communication cube ({len(cube.keys)} series, {len(cube.hours)} buckets) in {time.perf_counter() - start:.2f}s")
+        return cube
+
+    return versioned_artifact(cube_path(version), build, load=lambda path: CommCube.load(path, version),
+                              save=lambda path, cube: cube.save(path))
+
+
+def build_and_save(nodes, edges, version):
+    """
+    Called by the loader with the version it is about to publish.
+    """
+    return load_or_build(version, lambda: communications_from_graph(nodes, edges))
+
+
+async def _build(version, driver):
+    cube = await asyncio.to_thread(CommCube.load, cube_path(version), version)
+    if cube is None:
+        snapshot = await graph_cache.get_snapshot(driver, version)
+        cube = await asyncio.to_thread(load_or_build, version, lambda: communications_from_snapshot(snapshot))
+    return cube
+
+
+# comm_cube_cache.get(driver) -> CommCube of the current graph version
+comm_cube_cache = VersionCache(graph_version, _build)
@@ -0,0 +1,146 @@
+import os
+import time
+from contextlib import asynccontextmanager
+from neo4j import GraphDatabase, AsyncGraphDatabase
+
+from services.read_gate import reading
+
+# Pooled Neo4j drivers, one of each kind per worker process.
+# The async driver serves the endpoints (get_async_driver) so a running query never blocks
+# the event loop. The sync driver is used by the loader, which runs outside of the request path.
+# Both are created in the lifespan hook of main.py, so requests reuse pooled Bolt connections
+# instead of paying for a TCP/Bolt handshake and authentication each time.
+# The endpoints get the async driver wrapped in GatedAsyncDriver, whose sessions wait while a
+# load switches the graph in batches (services/read_gate.py).
+
+# Credentials
+NEO4J_URI = "bolt://" + os.environ.get('DB_HOST', 'localhost') + ":7687"
+NEO4J_USER = "neo4j"
+NEO4J_PASSWORD = os.environ.get('DB_PASSWORD')
+
+# Pool settings
+NEO4J_MAX_POOL_SIZE = int(os.environ.get("NEO4J_MAX_POOL_SIZE", 50))
+# Seconds to wait for a free connection before a request fails
+NEO4J_ACQUISITION_TIMEOUT = float(os.environ.get("NEO4J_ACQUISITION_TIMEOUT", 30))
+# Idle connections older than this (seconds) are checked with a ping before reuse
+NEO4J_LIVENESS_CHECK_TIMEOUT = float(os.environ.get("NEO4J_LIVENESS_CHECK_TIMEOUT", 30))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.environ.get("NEO4J_MAX_CONNECTION_LIFETIME", 3600))
+
+_driver = None
+_async_driver = None
+_gated_driver = None
+_created_at = {}
+
+
+def _pool_config():
+    return dict(
+        auth=(NEO4J_USER, NEO4J_PASSWORD),
+        max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+        connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+        liveness_check_timeout=NEO4J_LIVENESS_CHECK_TIMEOUT,
+        max_connection_lifetime=NEO4J_MAX_CONNECTION_LIFETIME,
+    )
+
+
+def init_driver():
+    global _driver
+    if _driver is None:
+        _driver = GraphDatabase.driver(NEO4J_URI, **_pool_config())
+        _created_at["sync"] = time.time()
+        print(f"Neo4j driver created (pool size {NEO4J_MAX_POOL_SIZE}).")
+    return _driver
+
+
+def init_async_driver():
+    global _async_driver
+    if _async_driver is None:
+        _async_driver = AsyncGraphDatabase.driver(NEO4J_URI, **_pool_config())
+        _created_at["async"] = time.time()
+        print(f"Neo4j async driver created (pool size {NEO4J_MAX_POOL_SIZE}).")
+    return _async_driver
+
+
+def close_driver():
+    global _driver
+    if _driver is not None:
+        _driver.close()
+        _driver = None
+        _created_at.pop("sync", None)
+        print("Neo4j driver closed.")
+
+
+async def close_async_driver():
+    global _async_driver
+    if _async_driver is not None:
+        await _async_driver.close()
+        _async_driver = None
+        _created_at.pop("async", None)
+        print("Neo4j async driver closed.")
+
+
+# FastAPI dependencies. Both fall back to creating the driver if the lifespan hook did not run
+# (e.g. when the router is mounted in another app or used from a script).
+def get_driver():
+    return init_driver()
+
+
+async def get_async_driver():
+    global _gated_driver
+    driver = init_async_driver()
+    if _gated_driver is None or _gated_driver.driver is not driver:
+        _gated_driver = GatedAsyncDriver(driver)
+    return _gated_driver
+
+
+class GatedAsyncDriver:
+    def __init__(self, driver):
+        self.driver = driver
+
+    # Same as AsyncDriver.session, used as "async with driver.session() as session"
+    @asynccontextmanager
+    async def session(self, **config):
+        async with reading():
+            async with self.driver.session(**config) as session:
+                yield session
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+
+# Connection pool statistics of this worker process.
+def pool_stats():
+    return {
+        "pid": os.getpid(),
+        "max_pool_size": NEO4J_MAX_POOL_SIZE,
+        "acquisition_timeout": NEO4J_ACQUISITION_TIMEOUT,
+        "liveness_check_timeout": NEO4J_LIVENESS_CHECK_TIMEOUT,
+        "max_connection_lifetime": NEO4J_MAX_CONNECTION_LIFETIME,
+        "sync": _driver_stats(_driver, "sync"),
+        "async": _driver_stats(_async_driver, "async"),
+    }
+
+
+# The driver has no public API for this, so the pool internals are read defensively.
+def _driver_stats(driver, kind):
+    stats = {"initialized": driver is not None}
+    if driver is None:
+        return stats
+    stats["uptime_seconds"] = round(time.time() - _created_at[kind], 1)
+
+    pool = getattr(driver, "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return stats
+    addresses = []
+    for address, conns in list(connections.items()):
+        in_use = pool.in_use_connection_count(address)
+        addresses.append({
+            "address": str(address),
+            "open": len(conns),
+            "in_use": in_use,
+            "idle": len(conns) - in_use
+        })
+    stats["addresses"] = addresses
+    stats["open"] = sum(a["open"] for a in addresses)
+    stats["in_use"] = sum(a["in_use"] for a in addresses)
+    return stats
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import time
+import numpy as np
+
+from services.artifacts import versioned_artifact, write_atomic
+
+# Disk cache for the corpus embeddings used by the similarity search.
+# Embeddings are computed once and stored as .npy files keyed by a hash of the data file,
+# the model name, the prompt prefix and the texts in their order. Every uvicorn worker
+# memory-maps the same file, so the corpus is only encoded again when the data or the model changes.
+# Next to every file a .keys.npy holds a digest of each encoded text (with model and prefix);
+# a file is only used when these digests are the texts asked for, row by row.
+# When the data changes (e.g. after a delta load), rows of the previous file whose digest
+# matches are copied over and only new or changed texts go through the model.
+
+CACHE_DIR = os.environ.get("CACHE_DIR", ".cache")
+EMBEDDING_DIR = os.path.join(CACHE_DIR, "embeddings")
+
+_file_hashes = {}
+
+
+def file_hash(path):
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        _file_hashes[key] = digest.hexdigest()
+    return _file_hashes[key]
+
+
+def cache_key(data_path, model_name, prefix, digests=None):
+    digest = hashlib.sha256()
+    for part in [file_hash(data_path), model_name, prefix]:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    if digests is not None:
+        digest.update(digests.tobytes())
+    return digest.hexdigest()[:24]
+
+
+def text_digests(texts, model_name, prefix):
+    return np.array([
+        hashlib.sha1(f"{model_name}\0{prefix}{text}".encode("utf-8")).digest() for text in texts
+    ], dtype="S20")
+
+
+def _keys_path(path):
+    return path[:-len(".npy")] + ".keys.npy"
+
+
+# Embeddings and digests of the newest cache file of this corpus, if any
+def _previous(name):
+    candidates = []
+    for file_name in os.listdir(EMBEDDING_DIR):
+        candidate = os.path.join(EMBEDDING_DIR, file_name)
+        if file_name.startswith(f"{name}-") and file_name.endswith(".keys.npy"):
+            candidates.append(candidate)
+    for keys_path in sorted(candidates, key=os.path.getmtime, reverse=True):
+        embeddings_path = keys_path[:-len(".keys.npy")] + ".npy"
+        if os.path.exists(embeddings_path):
+            keys = np.load(keys_path)
+            embeddings = np.load(embeddings_path, mmap_mode="r")
+            if embeddings.shape[0] == keys.shape[0]:
+                return embeddings, keys
+    return None, None
+
+
+def _encode_changed(name, texts, digests, encode, prefix):
+    previous, previous_keys = _previous(name)
+    if previous is None:
+        return np.asarray(encode([prefix + text for text in texts]), dtype=np.float32)
+
+    rows = {key: row for row, key in enumerate(previous_keys.tolist())}
+    reused = [(i, rows[key]) for i, key in enumerate(digests.tolist()) if key in rows]
+    missing = [i for i, key in enumerate(digests.tolist()) if key not in rows]
+    embeddings = np.empty((len(texts), previous.shape[1]), dtype=np.float32)
+    if reused:
+        embeddings[[i for i, _ in reused]] = previous[[row for _, row in reused]]
+    if missing:
+        embeddings[missing] = np.asarray(encode([prefix + texts[i] for i in missing]), dtype=np.float32)
+    print(f"Reused {len(reused)} {name} embeddings, encoded {len(missing)} new or changed texts")
+    return embeddings
+
+
+def load_or_encode(name, texts, encode, model_name, prefix, data_path="MC3_graph.json"):
+    """
+    Return the embeddings of prefix + text for all texts as a memory-mapped float32 array.
+    encode(list_of_strings) is only called on a cache miss, and only for the texts the previous
+    cache file does not have. Only the first of concurrent workers encodes, the others map its
+    result (services/artifacts.py).
+    """
+    digests = text_digests(texts, model_name, prefix)
+    key = cache_key(data_path, model_name, prefix, digests)
+    path = os.path.join(EMBEDDING_DIR, f"{name}-{key}.npy")
+
+    def load(path):
+        cached = _load(path, digests)
+        if cached is not None:
+            print(f"Loaded cached {name} embeddings from {path}")
+        return cached
+
+    def encode_changed():
+        start = time.perf_counter()
+        print(f"Encoding {len(texts)} {name} texts...")
+        embeddings = _encode_changed(name, texts, digests, encode, prefix)
+        print(f"Encoded {name} embeddings in {time.perf_counter() - start:.1f}s, cached at {path}")
+        return embeddings
+
+    def save(path, embeddings):
+        # Digests first, a complete .npy is what marks the cache entry as valid
+        _save(_keys_path(path), digests)
+        _save(path, embeddings)
+
+    # Older cache files of the same corpus are removed once the new one exists
+    return versioned_artifact(path, encode_changed, load=load, save=save, prefix=f"{name}-", reload=True)
+
+
+def _save(path, array):
+    write_atomic(path, lambda f: np.save(f, array))
+
+
+# Copy-on-write mapping: pages are shared between workers, but the array stays writable
+# so torch.from_numpy can wrap it without copying.
+# Any difference between the stored digests and the texts (changed, missing or reordered rows) is a miss.
+def _load(path, digests):
+    if not os.path.exists(path) or not os.path.exists(_keys_path(path)):
+        return None
+    if not np.array_equal(np.load(_keys_path(path)), digests):
+        return None
+    embeddings = np.load(path, mmap_mode="c")
+    if embeddings.shape[0] != len(digests):
+        return None
+    return embeddings
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Query encoder service for the similarity endpoints.
+# Query embeddings are kept in a bounded LRU cache keyed on (prefix, text), and cache misses
+# that arrive within a few milliseconds of each other are encoded with one batched encode call.
+
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 2048))
+# How long the first query of a batch waits for others to join (milliseconds)
+ENCODER_BATCH_WINDOW_MS = float(os.environ.get("ENCODER_BATCH_WINDOW_MS", 5))
+ENCODER_MAX_BATCH_SIZE = int(os.environ.get("ENCODER_MAX_BATCH_SIZE", 64))
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_size=QUERY_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class QueryEncoder:
+    """
+    Encode query strings for the vector indexes.
+    encode_fn(list_of_strings) -> 2D array is called in a worker thread with one batch at a time.
+    """
+
+    def __init__(self, encode_fn, window_ms=ENCODER_BATCH_WINDOW_MS, max_batch_size=ENCODER_MAX_BATCH_SIZE, cache=None):
+        self.encode_fn = encode_fn
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.cache = cache or QueryEmbeddingCache()
+        self._pending = {}  # text -> future, shared by identical concurrent queries
+        self._queue = None
+        self._worker = None
+        self.batches = 0
+        self.encoded = 0
+        self.encode_seconds = 0.0
+
+    async def encode(self, prefix, text):
+        key = (prefix, text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        full_text = prefix + text
+        future = self._pending.get(full_text)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[full_text] = future
+            self._ensure_worker()
+            await self._queue.put(full_text)
+        embedding = await future
+        self.cache.put(key, embedding)
+        return embedding
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._encode_batch(batch)
+
+    async def _encode_batch(self, batch):
+        futures = [self._pending.pop(text) for text in batch]
+        start = time.perf_counter()
+        try:
+            embeddings = await asyncio.to_thread(self.encode_fn, batch)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.encode_seconds += time.perf_counter() - start
+        self.batches += 1
+        self.encoded += len(batch)
+        for future, embedding in zip(futures, np.asarray(embeddings, dtype=np.float32)):
+            if not future.done():
+                future.set_result(embedding)
+
+    def stats(self):
+        return {
+            "cache": self.cache.stats(),
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "avg_batch_size": round(self.encoded / self.batches, 2) if self.batches else 0.0,
+            "avg_batch_ms": round(1000 * self.encode_seconds / self.batches, 2) if self.batches else 0.0,
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size
+        }
@@ -0,0 +1,270 @@
+import fcntl
+import json
+import os
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from services.embeddings import CACHE_DIR
+from services.graph_snapshot import aggregate_node, aggregate_edges, aggregated_edge
+
+# Entity groups: pseudonyms and aliases merged into one node.
+# The group definitions (group name -> member entity IDs) are a JSON file under CACHE_DIR,
+# so they survive graph loads and all workers see the same groups, whatever their working directory. Writes take a flock and give the
+# file a new version; workers re-read the file when it changed (one stat per request), and the
+# cached responses of grouped views are keyed by that version.
+# CollapsedGraph is the aggregated communication graph of one snapshot with every group collapsed
+# into a single node. When the groups change, only the sender/receiver pairs and edges of the
+# entities that moved are regrouped and only the aggregates they touch are rebuilt.
+
+ENTITY_GROUPS_PATH = os.environ.get("ENTITY_GROUPS_PATH", os.path.join(CACHE_DIR, "entity_groups.json"))
+
+
+class UnknownGroup(Exception):
+    def __init__(self, name):
+        super().__init__(f"Unknown group '{name}'")
+        self.name = name
+
+
+def _read_file(path=ENTITY_GROUPS_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None, {}
+    return data.get("version"), data.get("groups", {})
+
+
+@contextmanager
+def _locked(path=ENTITY_GROUPS_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _write_file(groups, path=ENTITY_GROUPS_PATH):
+    version = uuid.uuid4().hex[:12]
+    tmp_path = path + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "groups": groups}, f, indent=2)
+    os.replace(tmp_path, path)
+    return version
+
+
+def _validate(name, members, groups, entity_ids):
+    """
+    Clean group name and members. A group needs at least one existing entity, no entity is in two
+    groups, and the name may not be the ID of an entity outside the group.
+    """
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("A group needs a name")
+    members = list(dict.fromkeys(member.strip() for member in members if member and member.strip()))
+    if not members:
+        raise ValueError(f"Group '{name}' needs at least one member")
+    unknown = [member for member in members if member not in entity_ids]
+    if unknown:
+        raise ValueError(f"Unknown entities: {', '.join(unknown)}")
+    taken = [f"{member} ({other})" for other, other_members in groups.items() if other != name
+             for member in other_members if member in members]
+    if taken:
+        raise ValueError(f"Entities already in another group: {', '.join(taken)}")
+    if name in entity_ids and name not in members:
+        raise ValueError(f"'{name}' is the ID of an entity outside the group")
+    if name in (member for other, other_members in groups.items() if other != name for member in other_members):
+        raise ValueError(f"'{name}' is a member of another group")
+    return name, members
+
+
+def save_group(name, members, entity_ids, create=False):
+    """
+    Create (create=True) or replace the members of a group. Returns (version, groups).
+    Raises ValueError for invalid or existing groups and UnknownGroup when updating a missing one.
+    """
+    with _locked():
+        _, groups = _read_file()
+        # Names are stored stripped, so " A " is the existing group "A"
+        name = (name or "").strip()
+        if create and name in groups:
+            raise ValueError(f"Group '{name}' already exists")
+        if not create and name not in groups:
+            raise UnknownGroup(name)
+        name, members = _validate(name, members, groups, entity_ids)
+        groups[name] = members
+        return _write_file(groups), groups
+
+
+def delete_group(name):
+    name = (name or "").strip()
+    with _locked():
+        _, groups = _read_file()
+        if name not in groups:
+            raise UnknownGroup(name)
+        del groups[name]
+        return _write_file(groups), groups
+
+
+class EntityGroups:
+    def __init__(self, path=ENTITY_GROUPS_PATH):
+        self.path = path
+        self.version = None
+        self.groups = {}
+        self._stat = None
+
+    def current(self):
+        """
+        (version, groups) of the group file, re-read only when the file changed.
+        """
+        try:
+            stat = os.stat(self.path)
+            stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            stat = None
+        if stat != self._stat:
+            self.version, self.groups = _read_file(self.path)
+            self._stat = stat
+        return self.version, self.groups
+
+
+def group_node(name, members, snapshot):
+    sub_types = sorted({snapshot.nodes[snapshot.index[member]].get("sub_type") or "Unknown"
+                        for member in members if member in snapshot.index})
+    return {
+        "id": name,
+        "label": name,
+        "type": "Entity",
+        "sub_type": sub_types[0] if len(sub_types) == 1 else "Group",
+        "is_group": True,
+        "members": members,
+        "member_sub_types": sub_types,
+        "sent": 0,
+        "received": 0
+    }
+
+
+class CollapsedGraph:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.groups = {}
+        self.group_of = {}  # member entity ID -> group name
+        self.regrouped_pairs = 0
+        self.rebuilt_aggregates = 0
+        self._lock = threading.Lock()
+
+        # Communications of every (sender, receiver) pair, in time order, and the pairs of every entity
+        self._pair_events = {}
+        self._entity_pairs = defaultdict(list)
+        for sender, position, receiver in snapshot.communications:
+            self._pair_events.setdefault((sender, receiver), []).append(position)
+        for pair in self._pair_events:
+            self._entity_pairs[pair[0]].append(pair)
+            if pair[1] != pair[0]:
+                self._entity_pairs[pair[1]].append(pair)
+        # Collapsed (sender, receiver) -> the pairs in it, and its aggregate node once built
+        self._collapsed = {pair: {pair} for pair in self._pair_events}
+        self._aggregates = {}
+
+        # The other edges of the aggregated view, with the edges of every entity to re-point them
+        self._nodes = [node for position, node in enumerate(snapshot.nodes) if not snapshot.is_communication(position)]
+        self._edge_ends = []
+        self._edges = []
+        self._entity_edges = defaultdict(list)
+        for edge, rel_type, (source_is_entity, target_is_entity) in zip(snapshot.edges, snapshot.edge_types, snapshot.edge_meta):
+            if rel_type == "COMMUNICATION" and source_is_entity and target_is_entity:
+                continue
+            if source_is_entity:
+                self._entity_edges[edge["source"]].append(len(self._edges))
+            if target_is_entity and edge["target"] != edge["source"]:
+                self._entity_edges[edge["target"]].append(len(self._edges))
+            self._edge_ends.append((edge["source"], edge["target"]))
+            self._edges.append(aggregated_edge(edge))
+
+    def _label(self, entity_id, group_of=None):
+        group_of = self.group_of if group_of is None else group_of
+        return group_of.get(entity_id, entity_id)
+
+    def apply(self, groups):
+        """
+        Regroup the pairs and edges of the entities whose group changed.
+        """
+        group_of = {member: name for name, members in groups.items() for member in members}
+        changed = {entity for entity in set(group_of) | set(self.group_of) if group_of.get(entity) != self.group_of.get(entity)}
+        for entity in changed:
+            for pair in self._entity_pairs.get(entity, ()):
+                old_key = (self._label(pair[0]), self._label(pair[1]))
+                pairs = self._collapsed.get(old_key)
+                if pairs is None or pair not in pairs:
+                    continue  # both ends changed, already moved
+                new_key = (self._label(pair[0], group_of), self._label(pair[1], group_of))
+                pairs.discard(pair)
+                if not pairs:
+                    del self._collapsed[old_key]
+                self._collapsed.setdefault(new_key, set()).add(pair)
+                self._aggregates.pop(old_key, None)
+                self._aggregates.pop(new_key, None)
+                self.regrouped_pairs += 1
+            for edge_position in self._entity_edges.get(entity, ()):
+                source, target = self._edge_ends[edge_position]
+                self._edges[edge_position] = {**self._edges[edge_position],
+                                              "source": self._label(source, group_of),
+                                              "target": self._label(target, group_of)}
+        self.groups = {name: list(members) for name, members in groups.items()}
+        self.group_of = group_of
+
+    def _aggregate(self, key):
+        aggregate = self._aggregates.get(key)
+        if aggregate is None:
+            snapshot = self.snapshot
+            positions = sorted((position for pair in self._collapsed[key] for position in self._pair_events[pair]),
+                               key=lambda position: (snapshot.epochs[position] is None, snapshot.epochs[position] or 0))
+            comms = [snapshot.nodes[position] for position in positions]
+            aggregate = aggregate_node(
+                key[0], key[1],
+                [comm["content"] for comm in comms if comm.get("content") is not None],
+                [comm["id"] for comm in comms],
+                [comm["timestamp"] for comm in comms if comm.get("timestamp") is not None]
+            )
+            self._aggregates[key] = aggregate
+            self.rebuilt_aggregates += 1
+        return aggregate
+
+    def view(self, groups):
+        """
+        Aggregated view (like GraphSnapshot.aggregated_view) with the given groups collapsed.
+        Group nodes list their members and the messages they sent and received.
+        """
+        with self._lock:
+            self.apply(groups)
+            group_nodes = {name: group_node(name, members, self.snapshot) for name, members in self.groups.items()}
+            comm_nodes = []
+            comm_links = []
+            for key in self._collapsed:
+                aggregate = self._aggregate(key)
+                comm_nodes.append(aggregate)
+                comm_links.extend(aggregate_edges(aggregate))
+                if key[0] in group_nodes:
+                    group_nodes[key[0]]["sent"] += aggregate["count"]
+                if key[1] in group_nodes:
+                    group_nodes[key[1]]["received"] += aggregate["count"]
+            nodes = [node for node in self._nodes if node["id"] not in self.group_of]
+            return {"nodes": nodes + list(group_nodes.values()) + comm_nodes, "links": self._edges + comm_links}
+
+
+class CollapsedGraphCache:
+    def __init__(self):
+        self.graph = None
+
+    def get(self, snapshot):
+        graph = self.graph
+        if graph is None or graph.snapshot is not snapshot:
+            graph = self.graph = CollapsedGraph(snapshot)
+        return graph
+
+
+entity_groups = EntityGroups()
+collapsed_graph_cache = CollapsedGraphCache()
@@ -0,0 +1,83 @@
+from collections import Counter
+
+from services.comm_cube import HOUR_SECONDS
+
+# Sankey flows from the communication cube (services/comm_cube.py).
+# The whole hours of a range are summed from the hourly sender -> receiver buckets of the cube; only
+# the partial hours at the ends of a range come from the communications of the graph snapshot, which
+# are sorted by time. Flows can be rolled up by entity sub_type (Person, Vessel, ...) or by entity
+# groups (group name -> member entity IDs) and pruned to the largest links.
+
+FLOW_LEVELS = ("entity", "sub_type", "group")
+
+
+def pair_flows(cube, snapshot, start=None, end=None, positions=None):
+    """
+    Communications per (sender, receiver) in [start, end) epoch seconds, all of them without bounds.
+    With a cube of a subset of the communications (e.g. one topic), positions are the snapshot
+    positions of that subset.
+    """
+    counts = Counter()
+    if cube.first_hour is None:
+        full_hours = None
+    else:
+        first_hour = cube.first_hour if start is None else -(-start // HOUR_SECONDS)
+        last_hour = cube.last_hour if end is None else end // HOUR_SECONDS - 1
+        full_hours = (first_hour, last_hour) if first_hour <= last_hour else None
+
+    if full_hours is None:
+        communications = snapshot.communications_in_range(start, end)
+    else:
+        counts.update(dict(cube.pair_counts(*full_hours)))
+        communications = []
+        if start is not None:
+            communications += snapshot.communications_in_range(start, full_hours[0] * HOUR_SECONDS)
+        if end is not None:
+            communications += snapshot.communications_in_range((full_hours[1] + 1) * HOUR_SECONDS, end)
+        if start is None and end is None:
+            # Communications without a timestamp are not in the cube
+            communications = [c for c in snapshot.communications if snapshot.epochs[c[1]] is None]
+    for sender, position, receiver in communications:
+        if positions is None or position in positions:
+            counts[(sender, receiver)] += 1
+    return counts
+
+
+def flow_labels(snapshot, level="entity", groups=None):
+    """
+    Function mapping an entity ID to its node in the Sankey diagram at the given level.
+    Entities outside all groups keep their ID at the group level.
+    """
+    if level == "sub_type":
+        def label(entity_id):
+            position = snapshot.index.get(entity_id)
+            return (snapshot.nodes[position].get("sub_type") if position is not None else None) or "Unknown"
+        return label
+    if level == "group":
+        group_of = {member: name for name, members in (groups or {}).items() for member in members}
+        return lambda entity_id: group_of.get(entity_id, entity_id)
+    return lambda entity_id: entity_id
+
+
+def sankey_links(counts, label, sender=None, receiver=None, top=None):
+    """
+    Rolled up links {source, target, value}, largest first. sender and receiver match an entity ID
+    or its label. Flows inside one node are dropped (the diagram can not draw cycles onto a node),
+    and with top only the top largest links are kept.
+    Returns (links, total value, pruned links, pruned value).
+    """
+    rolled = Counter()
+    for (source, target), count in counts.items():
+        source_label = label(source)
+        target_label = label(target)
+        if sender and sender not in (source, source_label):
+            continue
+        if receiver and receiver not in (target, target_label):
+            continue
+        if source_label != target_label:
+            rolled[(source_label, target_label)] += count
+    links = [{"source": source, "target": target, "value": value}
+             for (source, target), value in sorted(rolled.items(), key=lambda item: (-item[1], item[0]))]
+    total = sum(link["value"] for link in links)
+    kept = links[:top] if top else links
+    return kept, total, len(links) - len(kept), total - sum(link["value"] for link in kept)
@@ -0,0 +1,151 @@
+import asyncio
+import fcntl
+import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+from services.embeddings import CACHE_DIR
+from services.graph_columnar import negotiate_format, encode_response, UnsupportedFormat
+from services.graph_snapshot import read_graph_snapshot
+
+# Versioned in-memory cache of the graph for the read endpoints.
+# The graph only changes through /load-graph-json and /clear-db, which call bump_graph_version().
+# The version lives in a file under CACHE_DIR so all uvicorn workers see the same one. Every worker
+# keeps one GraphSnapshot and the encoded responses built from it while the version matches, and
+# answers If-None-Match with 304 when the browser already has the payload of the current version.
+
+GRAPH_VERSION_PATH = os.path.join(CACHE_DIR, "graph_version")
+# Encoded responses kept per worker (one per endpoint, query string and format)
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 256))
+
+
+def _write_version(version):
+    tmp_path = GRAPH_VERSION_PATH + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, GRAPH_VERSION_PATH)
+
+
+def graph_version():
+    try:
+        with open(GRAPH_VERSION_PATH) as f:
+            version = f.read().strip()
+        if version:
+            return version
+    except FileNotFoundError:
+        pass
+    # First start without a version file: pick one under the lock so all workers agree on it
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(GRAPH_VERSION_PATH + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(GRAPH_VERSION_PATH):
+                with open(GRAPH_VERSION_PATH) as f:
+                    version = f.read().strip()
+                if version:
+                    return version
+            version = new_graph_version()
+            _write_version(version)
+            return version
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def new_graph_version():
+    return uuid.uuid4().hex[:16]
+
+
+def bump_graph_version(version=None):
+    """
+    Mark the graph as changed. Call it after every write to the graph (and at the start of
+    long writes, so nothing read half-way through is served as the old version).
+    Pass a version from new_graph_version() to prepare data for it before it is published.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    version = version or new_graph_version()
+    _write_version(version)
+    print(f"Graph version is now {version}")
+    return version
+
+
+class GraphCache:
+    def __init__(self, max_responses=RESPONSE_CACHE_SIZE):
+        self.snapshot = None
+        self.max_responses = max_responses
+        self._responses = OrderedDict()  # (version, path, query, media type, variant) -> encoded body
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.rebuilds = 0
+        self.rebuild_seconds = 0.0
+
+    async def get_snapshot(self, driver, version=None):
+        version = version or graph_version()
+        if self.snapshot is not None and self.snapshot.version == version:
+            return self.snapshot
+        # One read per version, concurrent requests wait for it
+        async with self._lock:
+            if self.snapshot is None or self.snapshot.version != version:
+                start = time.perf_counter()
+                self.snapshot = await read_graph_snapshot(driver, version)
+                self.rebuilds += 1
+                self.rebuild_seconds += time.perf_counter() - start
+                self._responses.clear()
+        return self.snapshot
+
+    async def respond(self, request: Request, driver, build, variant=None):
+        """
+        Return the response of build(snapshot) -> dict for the current graph version, as JSON or
+        in the columnar format asked for in the Accept header (services/graph_columnar.py).
+        The encoded body is cached per endpoint, query string and format, and an ETag made of the
+        graph version and the request lets the browser revalidate without downloading it again.
+        variant is the version of any other state the response depends on (e.g. the entity groups).
+        """
+        version = graph_version()
+        media_type = negotiate_format(request.headers.get("accept"))
+        key = (version, request.url.path, str(request.url.query), media_type, str(variant or ""))
+        etag = '"' + hashlib.sha1("\0".join(key).encode()).hexdigest()[:20] + '"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+
+        if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        body = self._responses.get(key)
+        if body is None:
+            self.misses += 1
+            snapshot = await self.get_snapshot(driver, version)
+            try:
+                body = await asyncio.to_thread(lambda: encode_response(build(snapshot), media_type))
+            except UnsupportedFormat as e:
+                return JSONResponse(content={"success": False, "error": str(e)}, status_code=406)
+            if snapshot.version == graph_version():
+                self._responses[key] = body
+                while len(self._responses) > self.max_responses:
+                    self._responses.popitem(last=False)
+        else:
+            self.hits += 1
+            self._responses.move_to_end(key)
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    def stats(self):
+        return {
+            "version": self.snapshot.version if self.snapshot else None,
+            "nodes": len(self.snapshot.nodes) if self.snapshot else 0,
+            "edges": len(self.snapshot.edges) if self.snapshot else 0,
+            "responses": len(self._responses),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "rebuilds": self.rebuilds,
+            "rebuild_seconds": round(self.rebuild_seconds, 2)
+        }
+
+
+graph_cache = GraphCache()
@@ -0,0 +1,183 @@
+import io
+import json
+
+# Compact columnar encoding of the graph endpoint responses.
+# Every top-level list of records ("nodes", "links", "comm_nodes", ...) becomes a table with one
+# array per property. All strings of the response (node ids, property values and list items)
+# are stored once in a shared string dictionary, and string columns hold integer indices into it.
+# Node ids come first in the dictionary, so "source"/"target" of the edges are small integers
+# instead of repeated strings like "Communication between X and Y", and message contents that
+# appear in several views are sent once. The tables are served as MessagePack or as Apache Arrow
+# IPC, selected by the Accept header; both libraries are optional and only imported when requested.
+#
+# MessagePack: {"success", ..., "strings": [...], "tables": {name: {"length": n, "columns": {
+#     column: [values] | {"strings": [index]} | {"string_lists": [[index, ...]]}}}}}
+# Arrow: consecutive IPC streams in one body, first the string dictionary (one "string" column),
+#     then one stream per table, named by the "name" schema metadata. String columns are int32 /
+#     list<int32> indices listed in the "string_columns" metadata. The other top-level fields
+#     are JSON in the "response" metadata of the first stream.
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+MEDIA_TYPES = {
+    "application/msgpack": MSGPACK_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE: MSGPACK_MEDIA_TYPE,
+    ARROW_MEDIA_TYPE: ARROW_MEDIA_TYPE,
+}
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+def negotiate_format(accept):
+    """
+    Return the media type to encode the response with: the first binary type listed
+    in the Accept header, otherwise JSON.
+    """
+    for part in (accept or "").split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in MEDIA_TYPES:
+            return MEDIA_TYPES[media_type]
+    return JSON_MEDIA_TYPE
+
+
+def _is_table(value):
+    return isinstance(value, list) and all(isinstance(item, dict) for item in value) and len(value) > 0
+
+
+class StringDictionary:
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def encode(self, value):
+        position = self.index.get(value)
+        if position is None:
+            position = len(self.strings)
+            self.index[value] = position
+            self.strings.append(value)
+        return position
+
+
+def _column_kind(values):
+    kind = None
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value_kind = "strings"
+        elif isinstance(value, list) and all(isinstance(item, str) for item in value):
+            value_kind = "string_lists"
+        else:
+            return "values"
+        if kind is not None and kind != value_kind:
+            return "values"
+        kind = value_kind
+    return kind or "values"
+
+
+def columnar_tables(content):
+    """
+    Split a response dict into (other fields, string dictionary, {table name: (length, {column: (kind, values)})}).
+    kind is "strings" or "string_lists" for columns encoded as dictionary indices, "values" otherwise.
+    """
+    fields = {}
+    dictionary = StringDictionary()
+    # Node tables first, so node ids get the low indices
+    names = sorted((key for key, value in content.items() if _is_table(value)), key=lambda key: "links" in key)
+    for key, value in content.items():
+        if key not in names:
+            fields[key] = value
+    for name in names:
+        for record in content[name]:
+            if isinstance(record.get("id"), str):
+                dictionary.encode(record["id"])
+
+    tables = {}
+    for name in names:
+        records = content[name]
+        columns = {}
+        for record in records:
+            for column in record:
+                columns.setdefault(column, None)
+        table = {}
+        for column in columns:
+            values = [record.get(column) for record in records]
+            kind = _column_kind(values)
+            if kind == "strings":
+                values = [dictionary.encode(v) if v is not None else None for v in values]
+            elif kind == "string_lists":
+                values = [[dictionary.encode(item) for item in v] if v is not None else None for v in values]
+            table[column] = (kind, values)
+        tables[name] = (len(records), table)
+    return fields, dictionary.strings, tables
+
+
+def encode_msgpack(content):
+    try:
+        import msgpack
+    except ImportError:
+        raise UnsupportedFormat("MessagePack is not available, install msgpack")
+    fields, strings, tables = columnar_tables(content)
+    encoded_tables = {}
+    for name, (length, table) in tables.items():
+        encoded_tables[name] = {
+            "length": length,
+            "columns": {column: values if kind == "values" else {kind: values} for column, (kind, values) in table.items()}
+        }
+    return msgpack.packb({**fields, "strings": strings, "tables": encoded_tables}, default=str)
+
+
+def _arrow_array(pa, kind, values):
+    if kind == "strings":
+        return pa.array(values, type=pa.int32()), False
+    if kind == "string_lists":
+        return pa.array(values, type=pa.list_(pa.int32())), False
+    try:
+        return pa.array(values), False
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        # Mixed types in one property: keep the values as JSON strings
+        return pa.array([json.dumps(v, default=str) if v is not None else None for v in values]), True
+
+
+def _write_stream(pa, sink, batch, metadata):
+    batch = batch.replace_schema_metadata(metadata)
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+
+
+def encode_arrow(content):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise UnsupportedFormat("Arrow is not available, install pyarrow")
+    fields, strings, tables = columnar_tables(content)
+    sink = io.BytesIO()
+    string_batch = pa.record_batch([pa.array(strings, type=pa.string())], names=["string"])
+    _write_stream(pa, sink, string_batch, {"name": "strings", "response": json.dumps(fields, default=str)})
+    for name, (length, table) in tables.items():
+        arrays = []
+        json_columns = []
+        for column, (kind, values) in table.items():
+            array, is_json = _arrow_array(pa, kind, values)
+            arrays.append(array)
+            if is_json:
+                json_columns.append(column)
+        batch = pa.record_batch(arrays, names=list(table))
+        _write_stream(pa, sink, batch, {
+            "name": name,
+            "string_columns": json.dumps([column for column, (kind, _) in table.items() if kind != "values"]),
+            "json_columns": json.dumps(json_columns)
+        })
+    return sink.getvalue()
+
+
+def encode_response(content, media_type):
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return encode_msgpack(content)
+    if media_type == ARROW_MEDIA_TYPE:
+        return encode_arrow(content)
+    return json.dumps(content, default=str).encode("utf-8")
@@ -0,0 +1,332 @@
+import json
+import os
+
+from services.analytics import AnalyticsGraph, load_or_compute
+from services.bulk_loader import BulkLoader, NODE_LABELS, STAGING_NAMESPACE, edge_rows
+from services.comm_cube import build_and_save as build_comm_cube
+from services.embeddings import CACHE_DIR
+from services.graph_cache import bump_graph_version, new_graph_version
+from services.load_status import LoadStatus, LoadCancelled
+from services.relationship_collapse import collapse_relationships
+from services.schema import ensure_schema
+from services.timestamps import TIMESTAMP_DT, add_timestamp_properties
+from services.topics import build_for_graph as build_topics
+
+# Full and incremental (delta) loads of the graph JSON into Neo4j.
+# A full load writes the new graph under the staging labels (StagingEntity, ...) while the live
+# graph keeps serving, then swaps it in with a single transaction (in batches behind the read gate
+# above PROMOTE_TX_MAX_NODES, services/bulk_loader.py). The graph version is only bumped after that,
+# so readers go straight from the complete old graph to the complete new one.
+# Progress and phase timings are written to the load status file (services/load_status.py).
+# Both modes prepare the complete graph the same way (evidence counts, timestamps, collapsed
+# Relationship edges) and the source document of the last load is kept at LOADED_GRAPH_PATH.
+# A delta load then reads what is in the database, diffs it against the prepared graph and only
+# writes what differs: new and changed nodes / edges are MERGEd with their full property set,
+# nodes and edges that are gone are deleted. Derived properties (count of events,
+# evidence_count / evidence_contents of the collapsed relationships) are part of the diff,
+# so only the events and relationships touched by the change are rewritten.
+#
+# A delta is either a complete new graph file (mode=delta&path=...) or a delta document
+# applied on top of the loaded graph (mode=delta&delta=...):
+#   {"nodes": [upserted nodes], "edges": [upserted edges],
+#    "removed_nodes": [node ids], "removed_edges": [{"source", "target", "type"}]}
+# Nodes are matched by id and edges by (source, target, type); removing a node removes its edges.
+
+DATA_PATH = "MC3_graph.json"
+LOADED_GRAPH_PATH = os.path.join(CACHE_DIR, "loaded_graph.json")
+# Build the topic model of the messages in the load job (needs the embedding model if the
+# embedding cache does not have the messages yet); otherwise the first /topics request builds it
+TOPICS_AT_LOAD = os.environ.get("TOPICS_AT_LOAD", "true").lower() != "false"
+
+NODES_STATE_QUERY = "MATCH (n:Entity|Event|Relationship) RETURN labels(n) AS labels, properties(n) AS props"
+EDGES_STATE_QUERY = """
+    MATCH (a:Entity|Event|Relationship)-[r]->(b)
+    RETURN type(r) AS type, a.id AS source, b.id AS target, properties(r) AS props
+"""
+
+
+def loaded_graph_path():
+    """
+    Source document of the graph in the database: the last loaded graph, or the bundled data file.
+    """
+    return LOADED_GRAPH_PATH if os.path.exists(LOADED_GRAPH_PATH) else DATA_PATH
+
+
+def data_file(path):
+    """
+    Resolve a data file given to the load endpoint. Only files below the working directory are accepted.
+    """
+    root = os.path.realpath(os.getcwd())
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root or not os.path.isfile(resolved):
+        raise ValueError(f"'{path}' is not a data file of the backend")
+    return resolved
+
+
+def forget_loaded_graph():
+    if os.path.exists(LOADED_GRAPH_PATH):
+        os.remove(LOADED_GRAPH_PATH)
+
+
+def read_graph_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_loaded_graph(data):
+    os.makedirs(os.path.dirname(LOADED_GRAPH_PATH), exist_ok=True)
+    tmp_path = LOADED_GRAPH_PATH + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, LOADED_GRAPH_PATH)
+
+
+def _edge_key(edge):
+    return edge.get("source"), edge.get("target"), edge.get("type", "RELATED_TO")
+
+
+def apply_delta(data, delta):
+    """
+    The graph document that results from applying a delta document to data.
+    """
+    removed_nodes = set(delta.get("removed_nodes", []))
+    removed_edges = {_edge_key(edge) for edge in delta.get("removed_edges", [])}
+
+    nodes = {node.get("id"): node for node in data.get("nodes", []) if node.get("id") not in removed_nodes}
+    for node in delta.get("nodes", []):
+        nodes[node.get("id")] = node
+
+    edges = {}
+    for edge in data.get("edges", []) + delta.get("edges", []):
+        key = _edge_key(edge)
+        if key in removed_edges or key[0] in removed_nodes or key[1] in removed_nodes:
+            continue
+        edges[key] = edge
+    return {**data, "nodes": list(nodes.values()), "edges": list(edges.values())}
+
+
+def prepare_graph(data):
+    """
+    (nodes, edges, relationship_edges) as written to Neo4j. The nodes of data are copied, not modified.
+    """
+    nodes = [dict(node) for node in data.get("nodes", [])]
+    edges = data.get("edges", [])
+
+    evidence_counts = {}
+    for edge in edges:
+        if edge.get("type") == "evidence_for":
+            target_id = edge.get("target")
+            evidence_counts[target_id] = evidence_counts.get(target_id, 0) + 1
+
+    # Apply counts to the nodes data
+    for node in nodes:
+        if node.get("type") == "Event" and node.get("sub_type") != "Communication":
+            # Ensure all non-comm events have a count property
+            node["count"] = evidence_counts.get(node.get("id"), 0)
+
+    # Native datetime and epoch seconds next to the timestamp strings, for the range indexes
+    add_timestamp_properties(nodes)
+
+    # Collapse Relationship nodes into Entity-Entity edges before ingest
+    return collapse_relationships(nodes, edges)
+
+
+# Properties as they are compared: the DateTime copy of the timestamp is derived from it,
+# and null properties are never stored by SET
+def _comparable(props):
+    return {key: value for key, value in props.items() if key != TIMESTAMP_DT and value is not None}
+
+
+def _node_label(labels):
+    return next((label for label in labels if label in NODE_LABELS), None)
+
+
+def read_loaded_graph(driver):
+    """
+    ({node id: (label, props)}, {(type, source, target): props}) of the graph in the database.
+    """
+    with driver.session() as session:
+        nodes = {}
+        for record in session.run(NODES_STATE_QUERY):
+            props = record["props"]
+            nodes[props.get("id")] = (_node_label(record["labels"]), _comparable(props))
+        edges = {}
+        for record in session.run(EDGES_STATE_QUERY):
+            edges[(record["type"], record["source"], record["target"])] = _comparable(record["props"])
+    return nodes, edges
+
+
+def diff_graph(loaded_nodes, loaded_edges, nodes, rows):
+    """
+    Compare the prepared graph (nodes and {"type", "source", "target", "props"} edge rows) with the
+    state from read_loaded_graph. Returns a dict of node / edge rows to upsert and to delete.
+    Duplicate nodes and edges are merged in order, the same way repeated MERGE ... SET += would.
+    """
+    new_nodes = {}
+    for node in nodes:
+        if node.get("type") in NODE_LABELS and node.get("id") is not None:
+            new_nodes.setdefault(node["id"], {}).update(node)
+    new_edges = {}
+    for row in rows:
+        if row["source"] in new_nodes and row["target"] in new_nodes:
+            new_edges.setdefault((row["type"], row["source"], row["target"]), {}).update(row["props"])
+
+    added_nodes, changed_nodes, removed_nodes = [], [], []
+    for node_id, node in new_nodes.items():
+        loaded = loaded_nodes.get(node_id)
+        if loaded is None:
+            added_nodes.append(node)
+        elif loaded[0] != node["type"]:
+            # A new label is a new node, its edges are written again below
+            removed_nodes.append({"id": node_id, "type": loaded[0]})
+            added_nodes.append(node)
+        elif loaded[1] != _comparable(node):
+            changed_nodes.append(node)
+    for node_id, (label, _) in loaded_nodes.items():
+        if node_id not in new_nodes:
+            removed_nodes.append({"id": node_id, "type": label})
+
+    relabelled = {node["id"] for node in removed_nodes if node["id"] in new_nodes}
+    upserted_edges, removed_edges = [], []
+    for key, props in new_edges.items():
+        loaded = loaded_edges.get(key)
+        if loaded is None or loaded != _comparable(props) or key[1] in relabelled or key[2] in relabelled:
+            upserted_edges.append({"type": key[0], "source": key[1], "target": key[2], "props": props})
+    for key in loaded_edges:
+        if key not in new_edges and key[1] not in relabelled and key[2] not in relabelled:
+            removed_edges.append({"type": key[0], "source": key[1], "target": key[2]})
+
+    return {
+        "added_nodes": added_nodes, "changed_nodes": changed_nodes, "removed_nodes": removed_nodes,
+        "upserted_edges": upserted_edges, "removed_edges": removed_edges
+    }
+
+
+def diff_summary(diff):
+    return {name: len(rows) for name, rows in diff.items()}
+
+
+def full_load(driver, data, status=None):
+    status = status or LoadStatus("full")
+    with status.phase("prepare"):
+        nodes, edges, relationship_edges = prepare_graph(data)
+        edges = [e for e in edges if "source" in e and "target" in e]
+
+    # Constraints and indexes have to exist before the MERGEs run
+    with status.phase("schema"):
+        ensure_schema(driver)
+    status.plan({
+        "clear": 0, "nodes": len(nodes), "edges": len(edges), "relationships": len(relationship_edges),
+        "switch": 0, "publish": 0
+    })
+
+    # The new graph is built next to the live one, which keeps serving until promote().
+    # A staged graph left over by a failed load is dropped first.
+    loader = BulkLoader(driver, namespace=STAGING_NAMESPACE, status=status)
+    try:
+        loader.clear()
+        loader.load_nodes(nodes)
+        print("Nodes staged successfully.")
+        loader.load_edges(edges)
+        print("Edges staged successfully.")
+        loader.load_edge_rows(relationship_edges, phase="relationships")
+        print("Relationships staged successfully.")
+        # Last chance to cancel, promote() starts the switch that can not be undone
+        status.check_cancelled()
+    except LoadCancelled:
+        # The live graph was not touched, only the staged one has to go
+        BulkLoader(driver, namespace=STAGING_NAMESPACE).clear()
+        raise
+    # The rest of the load can not be cancelled any more
+    status.cancel_path = None
+    loader.promote()
+    print("Staged graph is live.")
+    with status.phase("publish"):
+        _publish(data, nodes, edges, relationship_edges, status)
+    return {"success": True, "message": "All nodes and edges loaded.", "stats": loader.stats}
+
+
+def delta_load(driver, data, status=None):
+    status = status or LoadStatus("delta")
+    with status.phase("prepare"):
+        nodes, edges, relationship_edges = prepare_graph(data)
+        rows = edge_rows([e for e in edges if "source" in e and "target" in e]) + relationship_edges
+
+    with status.phase("schema"):
+        ensure_schema(driver)
+
+    loader = BulkLoader(driver, status=status)
+    with status.phase("diff"):
+        loaded_nodes, loaded_edges = read_loaded_graph(driver)
+        diff = diff_graph(loaded_nodes, loaded_edges, nodes, rows)
+    loader.stats["diff"] = {"seconds": status.state["phases"]["diff"]["seconds"], **diff_summary(diff)}
+    print(f"Graph delta: {diff_summary(diff)}")
+
+    if not any(diff.values()):
+        save_loaded_graph(data)
+        return {"success": True, "message": "Graph is up to date.", "stats": loader.stats}
+
+    status.plan({
+        "deleted edges": len(diff["removed_edges"]), "deleted nodes": len(diff["removed_nodes"]),
+        "nodes": len(diff["added_nodes"]) + len(diff["changed_nodes"]), "edges": len(diff["upserted_edges"]),
+        "publish": 0
+    })
+    # Edges are matched through the labels of their endpoints, including the deleted ones
+    loader.register_nodes({"id": node_id, "type": label} for node_id, (label, _) in loaded_nodes.items())
+    # A delta is small, so it is applied in one transaction and readers never see half of it
+    with loader.transaction():
+        loader.delete_edge_rows(diff["removed_edges"])
+        loader.delete_nodes(diff["removed_nodes"])
+        loader.register_nodes(nodes)
+        loader.load_nodes(diff["added_nodes"] + diff["changed_nodes"], replace=True)
+        loader.load_edge_rows(diff["upserted_edges"], replace=True)
+    status.cancel_path = None
+    with status.phase("publish"):
+        _publish(data, nodes, edges, relationship_edges, status)
+    return {"success": True, "message": "Graph delta applied.", "stats": loader.stats}
+
+
+# Derived data of the new graph, then the version readers switch to
+def _publish(data, nodes, edges, relationship_edges, status):
+    save_loaded_graph(data)
+    version = new_graph_version()
+    build_comm_cube(nodes, edges, version)
+    # Precomputed here so no request has to wait for them; the first request computes them otherwise
+    with status.phase("analytics"):
+        try:
+            load_or_compute(AnalyticsGraph.from_graph(nodes, edges, relationship_edges), version)
+        except Exception as e:
+            print(f"Precomputing graph analytics failed: {e}")
+    if TOPICS_AT_LOAD:
+        with status.phase("topics"):
+            try:
+                build_topics(data, version)
+            except Exception as e:
+                print(f"Building the topic model failed: {e}")
+    bump_graph_version(version)
+    print("Graph loaded successfully.")
+
+
+def load_graph(driver, mode="full", path=None, delta=None, status=None):
+    """
+    Load a graph file (default MC3_graph.json) completely or as a delta against the database.
+    With a delta document, the delta is applied to the last loaded graph.
+    """
+    status = status or LoadStatus(mode)
+    try:
+        if mode not in ("full", "delta"):
+            raise ValueError(f"Unknown load mode '{mode}', use full or delta")
+        with status.phase("read"):
+            if delta is not None:
+                if mode != "delta":
+                    raise ValueError("A delta file can only be loaded with mode=delta")
+                data = apply_delta(read_graph_file(loaded_graph_path()), read_graph_file(data_file(delta)))
+            else:
+                data = read_graph_file(data_file(path or DATA_PATH))
+        print(f"Loading graph data from JSON ({mode})...")
+        result = (delta_load if mode == "delta" else full_load)(driver, data, status)
+    except Exception as e:
+        status.fail(e)
+        raise
+    status.finish(result)
+    return result
@@ -0,0 +1,332 @@
+import asyncio
+import bisect
+import os
+import time
+from collections import OrderedDict
+
+from services.timestamps import TIMESTAMP_DT, TIMESTAMP_EPOCH, to_epoch, day_range
+
+# Single-pass graph snapshot.
+# Nodes and edges are read once, as property maps projected to the properties the views use
+# (no Node/Relationship objects).
+# The snapshot keeps them as property tables (lists of dicts, addressed by position) plus a
+# compact adjacency (edge positions per node) and a table of sender -> communication -> receiver
+# triples, and every read endpoint view is derived from those without going back to Neo4j.
+# Events and communications are also kept sorted by timestamp_epoch, so time range filters are
+# a binary search, like the range index seek they replace.
+# Only the live labels are read, the staged graph of a running load is invisible (services/graph_loader.py).
+
+# Properties read from the database: the ones the views and the frontend use. The stored
+# timestamp_dt (a driver DateTime per node) and the loader's is_inferred flag are left out.
+DETAIL_PROPERTIES = [
+    "name", "content", "start_date", "end_date", "date", "time", "submission_date", "destination", "participants",
+    "findings", "results", "outcome", "reference", "coordination_type", "monitoring_type", "permission_type",
+    "movement_type", "assessment_type", "report_type", "enforcement_type", "activity_type", "jurisdiction_type",
+    "authority_level", "friendship_type", "operational_role"
+]
+NODE_PROPERTIES = ["id", "type", "label", "sub_type", "timestamp", TIMESTAMP_EPOCH] + DETAIL_PROPERTIES
+# Collapsed relationship edges also carry the properties of their Relationship node
+EDGE_PROPERTIES = (["id", "type", "label", "sub_type", "timestamp", "evidence_count", "evidence_contents", "CommIDs",
+                    "directed", "number"] + DETAIL_PROPERTIES)
+
+
+def projection(variable, properties):
+    return variable + " {" + ", ".join(f".{name}" for name in properties) + "}"
+
+
+# A map projection returns null for the properties an element does not have
+def stored(props):
+    return {key: value for key, value in props.items() if value is not None}
+
+
+NODES_QUERY = f"""
+    MATCH (n:Entity|Event|Relationship)
+    RETURN labels(n) AS labels, {projection("n", NODE_PROPERTIES)} AS props
+"""
+
+EDGES_QUERY = f"""
+    MATCH (a:Entity|Event|Relationship)-[r]->(b)
+    RETURN a.id AS source, b.id AS target, type(r) AS rel_type, a:Entity AS source_is_entity,
+           b:Entity AS target_is_entity, {projection("r", EDGE_PROPERTIES)} AS props
+"""
+
+NODE_LABELS = ["Entity", "Event", "Relationship"]
+
+EGO_NETWORK_CACHE_SIZE = int(os.environ.get("EGO_NETWORK_CACHE_SIZE", 64))
+
+
+def node_type(labels):
+    return next((label for label in NODE_LABELS if label in labels), "Unknown")
+
+
+# Node of the /read-db-graph-2 view: typed by its label
+def typed_node(props, labels):
+    return {"id": props.get("id"), "label": None, "type": node_type(labels), "sub_type": props.get("sub_type"), **props}
+
+
+# One node for all communications from sender to receiver, with the two edges that connect it
+def aggregate_node(sender, receiver, contents, event_ids, timestamps):
+    return {
+        "id": f"Communication between {sender} and {receiver}",
+        "type": "Event",
+        "source": sender,
+        "target": receiver,
+        "count": len(event_ids),
+        "contents": contents,
+        "event_ids": event_ids,
+        "timestamps": timestamps,
+        "sub_type": "Communication"
+    }
+
+
+def aggregate_edges(agg_node):
+    return [
+        {"source": agg_node["source"], "target": agg_node["id"], "type": "Event", "sub_type": "Communication", "is_edge": "Y"},
+        {"source": agg_node["id"], "target": agg_node["target"], "type": "Event", "sub_type": "Communication", "is_edge": "Y"}
+    ]
+
+
+# Edge of the aggregated view: typed by its "type" property
+def aggregated_edge(props):
+    return {**props, "id": props.get("id"), "type": props.get("type") or "Event edges"}
+
+
+class GraphSnapshot:
+    def __init__(self, node_records, edge_records, version=None):
+        self.version = version
+
+        # Node table
+        self.nodes = []
+        self.labels = []
+        self.epochs = []  # timestamp_epoch per node, None without timestamp
+        self.index = {}  # node id -> position
+        for record in node_records:
+            node_data = stored(record["props"])
+            node_data["id"] = node_data.get("id")
+            node_data.pop(TIMESTAMP_DT, None)
+            epoch = node_data.pop(TIMESTAMP_EPOCH, None)
+            self.index[node_data["id"]] = len(self.nodes)
+            self.nodes.append(node_data)
+            self.labels.append(record["labels"])
+            self.epochs.append(epoch if epoch is not None else to_epoch(node_data.get("timestamp")))
+
+        # Events with a timestamp, in time order
+        self.event_times = sorted(
+            (epoch, position) for position, epoch in enumerate(self.epochs)
+            if epoch is not None and "Event" in self.labels[position]
+        )
+        self._event_epochs = [epoch for epoch, _ in self.event_times]
+
+        # Edge table and adjacency
+        self.edges = []
+        self.edge_types = []
+        self.edge_meta = []  # (source is Entity, target is Entity) per edge
+        self.out_edges = [[] for _ in self.nodes]
+        self.in_edges = [[] for _ in self.nodes]
+        for record in edge_records:
+            edge_data = stored(record["props"])
+            edge_data["source"] = record["source"]
+            edge_data["target"] = record["target"]
+            position = len(self.edges)
+            self.edges.append(edge_data)
+            self.edge_types.append(record["rel_type"])
+            self.edge_meta.append((record["source_is_entity"], record["target_is_entity"]))
+            source = self.index.get(record["source"])
+            target = self.index.get(record["target"])
+            if source is not None:
+                self.out_edges[source].append(position)
+            if target is not None:
+                self.in_edges[target].append(position)
+
+        # Communications in time order, the ones without timestamp last
+        self.communications = sorted(
+            self._communication_triples(),
+            key=lambda triple: (self.epochs[triple[1]] is None, self.epochs[triple[1]] or 0)
+        )
+        self._communication_epochs = [self.epochs[position] for _, position, _ in self.communications
+                                      if self.epochs[position] is not None]
+
+        # Traversals of /ego-network, so the pages of one request do not traverse again
+        self._ego_networks = OrderedDict()
+
+    def is_communication(self, position):
+        return self.nodes[position].get("sub_type") == "Communication" and "Event" in self.labels[position]
+
+    # (sender id, communication position, receiver id) for every
+    # (sender:Entity)-[:sent]->(comm:Event {sub_type: 'Communication'})-[:received]->(receiver:Entity) path
+    def _communication_triples(self):
+        triples = []
+        for position in range(len(self.nodes)):
+            if not self.is_communication(position):
+                continue
+            senders = [self.edges[e]["source"] for e in self.in_edges[position]
+                       if self.edge_types[e] == "sent" and self.edge_meta[e][0]]
+            receivers = [self.edges[e]["target"] for e in self.out_edges[position]
+                         if self.edge_types[e] == "received" and self.edge_meta[e][1]]
+            for sender in senders:
+                for receiver in receivers:
+                    triples.append((sender, position, receiver))
+        return triples
+
+    def raw_view(self):
+        return {"nodes": self.nodes, "links": self.edges}
+
+    # Nodes typed by their label and edges typed by their relationship type (/read-db-graph-2)
+    def typed_view(self):
+        nodes = [typed_node(node, labels) for node, labels in zip(self.nodes, self.labels)]
+        links = [
+            {"source": edge["source"], "target": edge["target"], "type": rel_type}
+            for edge, rel_type in zip(self.edges, self.edge_types)
+        ]
+        return {"nodes": nodes, "links": links}
+
+    def aggregated_view(self):
+        """
+        Communication events collapsed into one node per (sender, receiver) pair,
+        the same shape the old aggregated Cypher read returned as comm_nodes/comm_links.
+        """
+        nodes = [node for position, node in enumerate(self.nodes) if not self.is_communication(position)]
+
+        edges = []
+        for edge, rel_type, (source_is_entity, target_is_entity) in zip(self.edges, self.edge_types, self.edge_meta):
+            if rel_type == "COMMUNICATION" and source_is_entity and target_is_entity:
+                continue
+            edges.append(aggregated_edge(edge))
+
+        groups = {}
+        for sender, position, receiver in self.communications:
+            comm = self.nodes[position]
+            group = groups.setdefault((sender, receiver), {"contents": [], "event_ids": [], "timestamps": []})
+            if comm.get("content") is not None:
+                group["contents"].append(comm["content"])
+            group["event_ids"].append(comm["id"])
+            if comm.get("timestamp") is not None:
+                group["timestamps"].append(comm["timestamp"])
+
+        comm_agg_nodes = []
+        comm_agg_edges = []
+        for (sender, receiver), group in groups.items():
+            agg_node = aggregate_node(sender, receiver, group["contents"], group["event_ids"], group["timestamps"])
+            comm_agg_nodes.append(agg_node)
+            comm_agg_edges.extend(aggregate_edges(agg_node))
+
+        return {"nodes": nodes + comm_agg_nodes, "links": edges + comm_agg_edges}
+
+    # Positions of the events with start <= timestamp_epoch < end (open bounds for None), in time order
+    def events_in_range(self, start=None, end=None):
+        first = bisect.bisect_left(self._event_epochs, start) if start is not None else 0
+        last = bisect.bisect_left(self._event_epochs, end) if end is not None else len(self._event_epochs)
+        return [position for _, position in self.event_times[first:last]]
+
+    # The given nodes and their 1-hop neighbours, with every edge between them
+    def neighbourhood(self, positions):
+        node_positions = {}
+        links = []
+        for position in positions:
+            node = self.nodes[position]
+            node_positions.setdefault(position, None)
+            for edge_position in self.out_edges[position] + self.in_edges[position]:
+                edge = self.edges[edge_position]
+                neighbour = self.index.get(edge["target"] if edge["source"] == node["id"] else edge["source"])
+                if neighbour is not None:
+                    node_positions.setdefault(neighbour, None)
+                links.append({
+                    "source": edge["source"],
+                    "target": edge["target"],
+                    "type": self.edge_types[edge_position],
+                    **edge
+                })
+        return {"nodes": [self.nodes[position] for position in node_positions], "links": links}
+
+    def ego_network(self, position, hops=2, start=None, end=None, edge_types=None, direction="both",
+                    max_fanout=None, max_nodes=None):
+        """
+        Breadth-first k-hop neighbourhood of the node at position over the adjacency lists.
+        Only edges of edge_types are followed (all for None) in direction "out", "in" or "both".
+        Nodes with a timestamp outside [start, end) are not entered; nodes without one always are.
+        From every node at most max_fanout new neighbours are taken, the most connected first,
+        and the traversal stops at max_nodes nodes.
+        Returns (node positions in visiting order, {position: hops}, edge positions between them,
+        positions whose neighbours were cut by a limit).
+        """
+        key = (position, hops, start, end, tuple(sorted(edge_types)) if edge_types else None,
+               direction, max_fanout, max_nodes)
+        if key in self._ego_networks:
+            self._ego_networks.move_to_end(key)
+            return self._ego_networks[key]
+
+        edge_types = set(edge_types) if edge_types else None
+        distances = {position: 0}
+        order = [position]
+        truncated = []
+        frontier = [position]
+        for hop in range(1, hops + 1):
+            next_frontier = []
+            for current in frontier:
+                current_id = self.nodes[current]["id"]
+                candidates = set()
+                adjacent = ((self.out_edges[current] if direction in ("out", "both") else []) +
+                            (self.in_edges[current] if direction in ("in", "both") else []))
+                for edge_position in adjacent:
+                    if edge_types is not None and self.edge_types[edge_position] not in edge_types:
+                        continue
+                    edge = self.edges[edge_position]
+                    neighbour = self.index.get(edge["target"] if edge["source"] == current_id else edge["source"])
+                    if neighbour is None or neighbour in distances:
+                        continue
+                    epoch = self.epochs[neighbour]
+                    if epoch is not None and ((start is not None and epoch < start) or (end is not None and epoch >= end)):
+                        continue
+                    candidates.add(neighbour)
+                candidates = sorted(candidates, key=lambda n: (-(len(self.out_edges[n]) + len(self.in_edges[n])), self.nodes[n]["id"]))
+                if max_fanout is not None and len(candidates) > max_fanout:
+                    candidates = candidates[:max_fanout]
+                    truncated.append(current)
+                for neighbour in candidates:
+                    if max_nodes is not None and len(order) >= max_nodes:
+                        truncated.append(current)
+                        break
+                    distances[neighbour] = hop
+                    order.append(neighbour)
+                    next_frontier.append(neighbour)
+            frontier = next_frontier
+
+        edge_positions = []
+        for current in order:
+            for edge_position in self.out_edges[current]:
+                if edge_types is not None and self.edge_types[edge_position] not in edge_types:
+                    continue
+                if self.index.get(self.edges[edge_position]["target"]) in distances:
+                    edge_positions.append(edge_position)
+
+        result = (order, distances, edge_positions, list(dict.fromkeys(truncated)))
+        self._ego_networks[key] = result
+        if len(self._ego_networks) > EGO_NETWORK_CACHE_SIZE:
+            self._ego_networks.popitem(last=False)
+        return result
+
+    # Events on date (YYYY-MM-DD) and their 1-hop neighbours
+    def events_on_date(self, date):
+        return self.neighbourhood(self.events_in_range(*day_range(date)))
+
+    # (sender, position, receiver) of the communications in [start, end), all of them without bounds
+    def communications_in_range(self, start=None, end=None):
+        if start is None and end is None:
+            return self.communications
+        first = bisect.bisect_left(self._communication_epochs, start) if start is not None else 0
+        last = bisect.bisect_left(self._communication_epochs, end) if end is not None else len(self._communication_epochs)
+        return self.communications[first:last]
+
+
+async def _read(driver, query):
+    async with driver.session() as session:
+        result = await session.run(query)
+        return [record async for record in result]
+
+
+async def read_graph_snapshot(driver, version=None):
+    start = time.perf_counter()
+    node_records, edge_records = await asyncio.gather(_read(driver, NODES_QUERY), _read(driver, EDGES_QUERY))
+    snapshot = GraphSnapshot(node_records, edge_records, version)
+    print(f"Read graph snapshot ({len(snapshot.nodes)} nodes, {len(snapshot.edges)} edges) in {time.perf_counter() - start:.2f}s")
+    return snapshot
@@ -0,0 +1,87 @@
+from services.graph_snapshot import (
+    NODES_QUERY, EDGES_QUERY, NODE_PROPERTIES, EDGE_PROPERTIES, projection, stored, typed_node, aggregate_node,
+    aggregate_edges, aggregated_edge
+)
+from services.timestamps import public_properties
+
+# Record sources for the streaming mode of the graph endpoints (see services/streaming.py).
+# Every generator keeps one Neo4j result cursor open and yields the records as the driver
+# fetches them, so nothing is materialised besides the current fetch batch. Sections are
+# consumed one after the other, so a stream holds at most one session at a time.
+
+NON_COMMUNICATION_NODES_QUERY = f"""
+    MATCH (n:Entity|Event|Relationship)
+    WHERE NOT (n:Event AND n.sub_type = 'Communication')
+    RETURN {projection("n", NODE_PROPERTIES)} AS props
+"""
+
+AGGREGATED_COMMUNICATIONS_QUERY = """
+    MATCH (sender:Entity)-[:sent]->(comm:Event {sub_type: 'Communication'})-[:received]->(receiver:Entity)
+    RETURN sender.id AS source, receiver.id AS target, collect(comm.content) AS contents,
+           collect(comm.id) AS event_ids, collect(comm.timestamp) AS timestamps
+"""
+
+AGGREGATED_EDGES_QUERY = f"""
+    MATCH (a:Entity|Event|Relationship)-[r]->(b)
+    WHERE NOT (type(r) = 'COMMUNICATION' AND a:Entity AND b:Entity)
+    RETURN a.id AS source, b.id AS target, {projection("r", EDGE_PROPERTIES)} AS props
+"""
+
+
+async def _records(driver, query):
+    async with driver.session() as session:
+        result = await session.run(query)
+        async for record in result:
+            yield record
+
+
+async def stream_nodes(driver):
+    async for record in _records(driver, NODES_QUERY):
+        node_data = public_properties(stored(record["props"]))
+        node_data["id"] = node_data.get("id")
+        yield node_data
+
+
+async def stream_edges(driver):
+    async for record in _records(driver, EDGES_QUERY):
+        yield {**stored(record["props"]), "source": record["source"], "target": record["target"]}
+
+
+async def stream_typed_nodes(driver):
+    async for record in _records(driver, NODES_QUERY):
+        yield typed_node(public_properties(stored(record["props"])), record["labels"])
+
+
+async def stream_typed_edges(driver):
+    async for record in _records(driver, EDGES_QUERY):
+        yield {"source": record["source"], "target": record["target"], "type": record["rel_type"]}
+
+
+class AggregatedStream:
+    """
+    comm_nodes and comm_links of /read-db-graph. The aggregation query runs once:
+    its nodes are streamed with comm_nodes and only the (sender, receiver) pairs are
+    kept to emit the matching edges at the end of comm_links.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.aggregates = []
+
+    async def nodes(self):
+        async for record in _records(self.driver, NON_COMMUNICATION_NODES_QUERY):
+            node_data = public_properties(stored(record["props"]))
+            node_data["id"] = node_data.get("id")
+            yield node_data
+        async for record in _records(self.driver, AGGREGATED_COMMUNICATIONS_QUERY):
+            agg_node = aggregate_node(record["source"], record["target"], record["contents"],
+                                      record["event_ids"], record["timestamps"])
+            self.aggregates.append({"id": agg_node["id"], "source": agg_node["source"], "target": agg_node["target"]})
+            yield agg_node
+
+    async def links(self):
+        async for record in _records(self.driver, AGGREGATED_EDGES_QUERY):
+            yield aggregated_edge({**stored(record["props"]), "source": record["source"], "target": record["target"]})
+        for agg_node in self.aggregates:
+            for edge in aggregate_edges(agg_node):
+                yield edge
@@ -0,0 +1,215 @@
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from services.embeddings import CACHE_DIR
+
+# Background jobs for graph loads.
+# A load runs in its own process (python -m services.jobs <job id>), so its parsing, diffing and
+# driver work never competes with the requests of the serving workers for the event loop or the GIL.
+# Only one load runs at a time across all workers: starting a job takes an exclusive flock on
+# LOAD_LOCK_PATH without waiting, and the open lock file is handed to the job process, which holds
+# the lock until it exits (or crashes). Other writers of the whole graph (/clear-db) hold the same
+# lock through load_lock(). Job records are JSON files under JOBS_DIR with the
+# progress of services/load_status.py; cancelling a job creates its cancel file, which the loader
+# checks at every phase and batch. Polling a job never touches the lock: an unfinished job whose
+# process (pid file next to the record) is gone has died. The worker that started a job reaps
+# its process in a waiter thread, so finished jobs leave no zombies behind.
+
+JOBS_DIR = os.path.join(CACHE_DIR, "jobs")
+LOAD_LOCK_PATH = os.path.join(JOBS_DIR, "load.lock")
+LAST_JOB_PATH = os.path.join(JOBS_DIR, "last")
+# Job records kept on disk
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", 50))
+
+# Seconds a job may stay without a process id while its process is being started
+JOB_START_TIMEOUT = int(os.environ.get("JOB_START_TIMEOUT", 60))
+
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+
+class JobBusy(Exception):
+    def __init__(self, job_id):
+        # No job id: the lock is held by a request changing the database (/clear-db)
+        message = f"Load job {job_id} is still running" if job_id else "The database is being cleared"
+        super().__init__(message)
+        self.job_id = job_id
+
+
+def job_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def cancel_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.cancel")
+
+
+def pid_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.pid")
+
+
+def _write_job(job):
+    tmp_path = job_path(job["id"]) + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(job, f, default=str)
+    os.replace(tmp_path, job_path(job["id"]))
+
+
+def _read_job(job_id):
+    try:
+        with open(job_path(job_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def last_job_id():
+    try:
+        with open(LAST_JOB_PATH, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _job_alive(job):
+    pid = job.get("pid")
+    if pid is None:
+        try:
+            with open(pid_path(job["id"]), "r", encoding="utf-8") as f:
+                pid = int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            # Not started yet, unless the worker starting it died
+            return time.time() - job.get("created_at", 0) < JOB_START_TIMEOUT
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _prune_jobs():
+    records = sorted(
+        (name for name in os.listdir(JOBS_DIR) if name.endswith(".json")),
+        key=lambda name: os.path.getmtime(os.path.join(JOBS_DIR, name)), reverse=True
+    )
+    for name in records[JOB_HISTORY:]:
+        job_id = name[:-len(".json")]
+        for path in (os.path.join(JOBS_DIR, name), cancel_path(job_id), pid_path(job_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+@contextmanager
+def load_lock():
+    """
+    Hold the load lock while the block runs, e.g. to change the database outside of a load job.
+    Yields the locked file descriptor; raises JobBusy if a load is running in any worker.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    fd = os.open(LOAD_LOCK_PATH, os.O_RDWR | os.O_CREAT)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            job_id = last_job_id()
+            job = _read_job(job_id) if job_id else None
+            raise JobBusy(job_id if job is not None and job.get("state") not in FINISHED_STATES else None)
+        yield fd
+    finally:
+        os.close(fd)
+
+
+def start_load_job(mode="full", path=None, delta=None):
+    """
+    Start a load in a job process and return its job record.
+    Raises JobBusy if another load is running in any worker.
+    """
+    with load_lock() as fd:
+        job = {
+            "id": uuid.uuid4().hex[:16],
+            "kind": "load",
+            "params": {"mode": mode, "path": path, "delta": delta},
+            "state": "queued",
+            "created_at": time.time()
+        }
+        _write_job(job)
+        with open(LAST_JOB_PATH, "w", encoding="utf-8") as f:
+            f.write(job["id"])
+        _prune_jobs()
+
+        # The job process inherits the locked file and keeps the lock after we close our copy
+        process = subprocess.Popen([sys.executable, "-m", "services.jobs", job["id"]],
+                                   pass_fds=[fd], cwd=os.getcwd())
+        job["pid"] = process.pid
+        with open(pid_path(job["id"]), "w", encoding="utf-8") as f:
+            f.write(str(process.pid))
+        threading.Thread(target=process.wait, name=f"load-job-{job['id']}", daemon=True).start()
+        print(f"Started load job {job['id']} (pid {process.pid})")
+        return job
+
+
+def get_job(job_id):
+    """
+    Job record with its progress, None for unknown jobs. A job that is not finished while
+    its process is gone has died and is reported as failed.
+    """
+    job = _read_job(job_id)
+    if job is None or job.get("state") in FINISHED_STATES:
+        return job
+    if not _job_alive(job):
+        # The record may have been finished right before the process exited, or pruned since
+        job = _read_job(job_id)
+        if job is not None and job.get("state") not in FINISHED_STATES:
+            job["state"] = "failed"
+            job["error"] = "Job process exited"
+            _write_job(job)
+    return job
+
+
+def cancel_job(job_id):
+    job = get_job(job_id)
+    if job is not None and job.get("state") not in FINISHED_STATES:
+        open(cancel_path(job_id), "w").close()
+        job["cancel_requested"] = True
+    return job
+
+
+def list_jobs():
+    if not os.path.isdir(JOBS_DIR):
+        return []
+    ids = [name[:-len(".json")] for name in os.listdir(JOBS_DIR) if name.endswith(".json")]
+    jobs = [job for job in (get_job(job_id) for job_id in ids) if job is not None]
+    return sorted(jobs, key=lambda job: job.get("created_at", 0), reverse=True)
+
+
+def run_job(job_id):
+    from services.database import init_driver, close_driver
+    from services.graph_loader import load_graph
+    from services.load_status import LoadStatus
+
+    job = _read_job(job_id)
+    params = job["params"]
+    fields = {key: job[key] for key in ("id", "kind", "params", "created_at")}
+    fields["pid"] = os.getpid()
+    status = LoadStatus(params["mode"], path=job_path(job_id), cancel_path=cancel_path(job_id), fields=fields)
+    driver = init_driver()
+    try:
+        load_graph(driver, params["mode"], params["path"], params["delta"], status=status)
+    except Exception as e:
+        print(f"Load job {job_id} ended: {e}")
+        return 1
+    finally:
+        close_driver()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_job(sys.argv[1]))
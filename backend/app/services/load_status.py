@@ -0,0 +1,130 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from services.embeddings import CACHE_DIR
+
+# Progress of the running (or last) graph load.
+# The load runs in a job process (services/jobs.py), /load-status and /jobs/{id} can be answered
+# by any worker, so the status is a small JSON file under CACHE_DIR that the loader rewrites as it
+# goes (at most every STATUS_INTERVAL seconds while rows are written, and at every phase change).
+# Every phase reports its rows, seconds and rows per second, so slow phases stand out.
+# The loader also checks for a cancel request at every phase and batch.
+
+LOAD_STATUS_PATH = os.path.join(CACHE_DIR, "load_status.json")
+STATUS_INTERVAL = float(os.environ.get("LOAD_STATUS_INTERVAL", 0.5))
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class LoadStatus:
+    def __init__(self, mode, path=LOAD_STATUS_PATH, cancel_path=None, fields=None):
+        self.path = path
+        self.cancel_path = cancel_path  # the load stops once this file exists
+        self._start = time.perf_counter()
+        self._phase_starts = {}
+        self._written_at = 0.0
+        self.state = {
+            **(fields or {}),
+            "state": "running",
+            "mode": mode,
+            "started_at": time.time(),
+            "finished_at": None,
+            "seconds": 0.0,
+            "phase": None,
+            "rows_total": 0,
+            "rows_done": 0,
+            "progress": 0.0,
+            "rows_per_sec": 0.0,
+            "phases": {},
+            "result": None,
+            "error": None
+        }
+        self._write()
+
+    # Rows every write phase is going to write, known once the graph is prepared
+    def plan(self, phases):
+        for phase, rows in phases.items():
+            self.state["phases"][phase] = {"state": "pending", "rows": rows, "done": 0, "seconds": None, "rows_per_sec": None}
+        self.state["rows_total"] = sum(phases.values())
+        self._write()
+
+    def start_phase(self, phase, rows=0):
+        self.check_cancelled()
+        self._phase_starts[phase] = time.perf_counter()
+        entry = self.state["phases"].setdefault(phase, {"state": "pending", "rows": rows, "done": 0, "seconds": None, "rows_per_sec": None})
+        entry["state"] = "running"
+        entry["rows"] = rows or entry["rows"]
+        self.state["phase"] = phase
+        self._write()
+
+    def advance(self, phase, rows):
+        entry = self.state["phases"][phase]
+        entry["done"] += rows
+        entry["seconds"] = round(time.perf_counter() - self._phase_starts[phase], 3)
+        entry["rows_per_sec"] = round(entry["done"] / entry["seconds"], 1) if entry["seconds"] > 0 else None
+        self.state["rows_done"] += rows
+        self._write(force=False)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.cancel_path and os.path.exists(self.cancel_path):
+            raise LoadCancelled("Load cancelled")
+
+    def end_phase(self, phase):
+        entry = self.state["phases"][phase]
+        entry["state"] = "done"
+        entry["seconds"] = round(time.perf_counter() - self._phase_starts[phase], 3)
+        entry["rows_per_sec"] = round(entry["done"] / entry["seconds"], 1) if entry["done"] and entry["seconds"] > 0 else None
+        self._write()
+
+    @contextmanager
+    def phase(self, phase):
+        self.start_phase(phase)
+        yield
+        self.end_phase(phase)
+
+    def finish(self, result):
+        self.state["result"] = result
+        self._end("done")
+
+    def fail(self, error):
+        self.state["error"] = str(error)
+        state = "cancelled" if isinstance(error, LoadCancelled) else "failed"
+        if self.state["phase"] in self.state["phases"]:
+            self.state["phases"][self.state["phase"]]["state"] = state
+        self._end(state)
+
+    def _end(self, state):
+        self.state["state"] = state
+        self.state["finished_at"] = time.time()
+        self._write()
+
+    def _write(self, force=True):
+        now = time.perf_counter()
+        if not force and now - self._written_at < STATUS_INTERVAL:
+            return
+        self._written_at = now
+        state = self.state
+        state["seconds"] = round(now - self._start, 3)
+        write_seconds = sum(entry["seconds"] or 0 for entry in state["phases"].values() if entry["done"])
+        state["rows_per_sec"] = round(state["rows_done"] / write_seconds, 1) if write_seconds > 0 else 0.0
+        state["progress"] = round(state["rows_done"] / state["rows_total"], 4) if state["rows_total"] else 0.0
+        if state["state"] == "done":
+            state["progress"] = 1.0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + f".{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, default=str)
+        os.replace(tmp_path, self.path)
+
+
+def read_load_status(path=LOAD_STATUS_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"state": "idle"}
@@ -0,0 +1,80 @@
+import threading
+import time
+
+# Lazy model registry.
+# Heavy ML objects (and the torch / sentence_transformers imports behind them) are only
+# created on first use. main.py starts a background warm-up after startup, so the graph
+# endpoints serve immediately while /ready reports when the models are available.
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._errors = {}
+        self._locks = {}
+        self.load_seconds = {}
+        self.startup_seconds = None
+        self.warmup_seconds = None
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+
+    # Load the model on first use. Blocking, call it from a worker thread in async code.
+    def get(self, name):
+        if name in self._models:
+            return self._models[name]
+        with self._locks[name]:
+            if name not in self._models:
+                start = time.perf_counter()
+                print(f"Loading model '{name}'...")
+                try:
+                    self._models[name] = self._loaders[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                self._errors.pop(name, None)
+                self.load_seconds[name] = round(time.perf_counter() - start, 2)
+                print(f"Model '{name}' loaded in {self.load_seconds[name]}s")
+        return self._models[name]
+
+    # Drop loaded models, the next get() loads them again
+    def invalidate(self, *names):
+        for name in names:
+            with self._locks[name]:
+                self._models.pop(name, None)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def ready(self):
+        return all(name in self._models for name in self._loaders)
+
+    def warm_up(self):
+        start = time.perf_counter()
+        for name in self._loaders:
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Warm-up of '{name}' failed: {e}")
+        self.warmup_seconds = round(time.perf_counter() - start, 2)
+        print(f"Model warm-up finished in {self.warmup_seconds}s")
+
+    def status(self):
+        return {
+            "ready": self.ready(),
+            "startup_seconds": self.startup_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "models": {
+                name: {
+                    "loaded": name in self._models,
+                    "load_seconds": self.load_seconds.get(name),
+                    "error": self._errors.get(name)
+                }
+                for name in self._loaders
+            }
+        }
+
+
+registry = ModelRegistry()
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from services.artifacts import VersionCache, load_json, versioned_artifact
+from services.embeddings import CACHE_DIR
+from services.graph_cache import graph_cache, graph_version
+
+# Pseudonym candidates: entities that write alike.
+# The style vector of an entity is the mean of the (unit length) embeddings of the messages it sent.
+# Message embeddings are read in chunks of CHUNK_ROWS rows in sender order and summed per sender,
+# so only one chunk of the (memory-mapped) embedding matrix is in memory at a time. The nearest
+# entities of every entity are found block by block: a block of BLOCK_SIZE style vectors against
+# all of them, top-k per row with argpartition, so no entity x entity (let alone message x message)
+# matrix is ever built. Pairs are ranked by similarity, together with their direct messages and
+# shared communication partners (pseudonyms of one person rarely write to each other but share
+# contacts). Results are computed once per graph version and saved under PSEUDONYM_DIR.
+
+PSEUDONYM_DIR = os.path.join(CACHE_DIR, "pseudonyms")
+# Nearest entities kept per entity
+PSEUDONYM_NEIGHBOURS = int(os.environ.get("PSEUDONYM_NEIGHBOURS", 10))
+PSEUDONYM_BLOCK_SIZE = int(os.environ.get("PSEUDONYM_BLOCK_SIZE", 1024))
+PSEUDONYM_CHUNK_ROWS = int(os.environ.get("PSEUDONYM_CHUNK_ROWS", 16384))
+
+
+def style_vectors(message_embs, message_ids, senders, chunk_rows=PSEUDONYM_CHUNK_ROWS):
+    """
+    Mean unit embedding of the messages sent by every entity.
+    message_embs: (messages x dim) array, row i is message_ids[i]; senders: message ID -> sender IDs.
+    Returns (entity IDs, unit style vectors, messages per entity).
+    """
+    entity_index = {}
+    rows = []
+    columns = []
+    for row, message_id in enumerate(message_ids):
+        for sender in senders.get(message_id, ()):
+            rows.append(row)
+            columns.append(entity_index.setdefault(sender, len(entity_index)))
+    rows = np.array(rows, dtype=np.int64)
+    columns = np.array(columns, dtype=np.int64)
+    order = np.argsort(columns, kind="stable")
+    rows, columns = rows[order], columns[order]
+
+    sums = np.zeros((len(entity_index), message_embs.shape[1]), dtype=np.float64)
+    for start in range(0, len(rows), chunk_rows):
+        chunk = np.asarray(message_embs[rows[start:start + chunk_rows]], dtype=np.float64)
+        chunk /= np.maximum(np.linalg.norm(chunk, axis=1, keepdims=True), 1e-12)
+        entities, first = np.unique(columns[start:start + chunk_rows], return_index=True)
+        sums[entities] += np.add.reduceat(chunk, first, axis=0)
+
+    counts = np.bincount(columns, minlength=len(entity_index))
+    vectors = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return list(entity_index), vectors.astype(np.float32), counts
+
+
+def nearest_neighbours(vectors, k, block_size=PSEUDONYM_BLOCK_SIZE):
+    """
+    The k most similar other rows of every row (cosine of unit vectors), most similar first.
+    Returns (indices, similarities), both (rows x k).
+    """
+    n = len(vectors)
+    k = min(k, n - 1)
+    indices = np.zeros((n, max(k, 0)), dtype=np.int64)
+    similarities = np.zeros((n, max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return indices, similarities
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        block = vectors[start:end] @ vectors.T
+        block[np.arange(end - start), np.arange(start, end)] = -np.inf
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_similarities = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_similarities, axis=1, kind="stable")
+        indices[start:end] = np.take_along_axis(top, order, axis=1)
+        similarities[start:end] = np.take_along_axis(top_similarities, order, axis=1)
+    return indices, similarities
+
+
+def compute_candidates(message_embs, message_ids, communications, sub_types, version, k=PSEUDONYM_NEIGHBOURS):
+    """
+    communications: (sender, message ID, receiver); sub_types: entity ID -> sub_type.
+    """
+    start = time.perf_counter()
+    senders = defaultdict(list)
+    partners = defaultdict(set)
+    direct = defaultdict(int)
+    for sender, message_id, receiver in communications:
+        if sender not in senders[message_id]:
+            senders[message_id].append(sender)
+        partners[sender].add(receiver)
+        partners[receiver].add(sender)
+        direct[tuple(sorted((sender, receiver)))] += 1
+
+    entities, vectors, counts = style_vectors(message_embs, message_ids, senders)
+    indices, similarities = nearest_neighbours(vectors, k)
+
+    neighbours = {}
+    pairs = {}
+    for i, entity in enumerate(entities):
+        neighbours[entity] = [{"id": entities[j], "similarity": round(float(s), 4)} for j, s in zip(indices[i], similarities[i])]
+        for j, similarity in zip(indices[i], similarities[i]):
+            pair = tuple(sorted((i, int(j))))
+            pairs[pair] = float(similarity)
+
+    candidates = []
+    for (i, j), similarity in sorted(pairs.items(), key=lambda item: (-item[1], item[0])):
+        a, b = entities[i], entities[j]
+        candidates.append({
+            "a": a,
+            "b": b,
+            "similarity": round(similarity, 4),
+            "sub_type_a": sub_types.get(a),
+            "sub_type_b": sub_types.get(b),
+            "messages_a": int(counts[i]),
+            "messages_b": int(counts[j]),
+            "direct_messages": direct.get(tuple(sorted((a, b))), 0),
+            "shared_partners": len((partners[a] & partners[b]) - {a, b})
+        })
+    results = {
+        "version": version,
+        "entities": len(entities),
+        "messages": len(message_ids),
+        "neighbours": k,
+        "seconds": round(time.perf_counter() - start, 3),
+        "candidates": candidates,
+        "neighbours_of": neighbours
+    }
+    print(f"Computed pseudonym candidates of {len(entities)} entities in {results['seconds']}s")
+    return results
+
+
+def candidates_path(version):
+    return os.path.join(PSEUDONYM_DIR, f"{version}.json")
+
+
+def load_or_compute(snapshot, corpus, version):
+    """
+    Candidates of the version from PSEUDONYM_DIR, computed from the search corpus and saved first
+    if missing (services/artifacts.py).
+    """
+    def compute():
+        communications = [(sender, snapshot.nodes[position]["id"], receiver)
+                          for sender, position, receiver in snapshot.communications]
+        sub_types = {node["id"]: node.get("sub_type") for node, labels in zip(snapshot.nodes, snapshot.labels)
+                     if "Entity" in labels}
+        return compute_candidates(corpus.message_embs, corpus.communication_events["id"].tolist(),
+                                  communications, sub_types, version)
+
+    return versioned_artifact(candidates_path(version), compute)
+
+
+async def _build(version, driver, load_corpus):
+    """
+    load_corpus() -> search corpus is only awaited when no worker has computed the candidates yet.
+    """
+    results = await asyncio.to_thread(load_json, candidates_path(version))
+    if results is None:
+        snapshot = await graph_cache.get_snapshot(driver, version)
+        corpus = await load_corpus()
+        results = await asyncio.to_thread(load_or_compute, snapshot, corpus, version)
+    return results
+
+
+# pseudonym_cache.get(driver, load_corpus) -> candidates of the current graph version
+pseudonym_cache = VersionCache(graph_version, _build)
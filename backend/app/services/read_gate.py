@@ -0,0 +1,61 @@
+import asyncio
+import fcntl
+import os
+from contextlib import asynccontextmanager, contextmanager
+
+from services.embeddings import CACHE_DIR
+
+# Read gate for graph switches that do not fit into one transaction.
+# Every Neo4j session of the endpoints (services/database.py) holds a shared flock on
+# READERS_LOCK_PATH. A load that switches the graph in batches (BulkLoader.promote) first closes
+# the gate (exclusive flock on GATE_LOCK_PATH, which new sessions pass with a short shared lock),
+# then waits for the open sessions to end and switches while holding READERS_LOCK_PATH exclusively.
+# Readers wait for the switch instead of reading a half-deleted graph; responses cached for the
+# previous graph version are served without a session and are not held up.
+
+GATE_LOCK_PATH = os.path.join(CACHE_DIR, "read_gate.lock")
+READERS_LOCK_PATH = os.path.join(CACHE_DIR, "readers.lock")
+
+
+def _open(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return os.open(path, os.O_RDWR | os.O_CREAT)
+
+
+async def _flock(fd, operation):
+    try:
+        fcntl.flock(fd, operation | fcntl.LOCK_NB)
+    except BlockingIOError:
+        # A switch is running, wait for it off the event loop
+        await asyncio.to_thread(fcntl.flock, fd, operation)
+
+
+@asynccontextmanager
+async def reading():
+    fd = _open(READERS_LOCK_PATH)
+    try:
+        gate = _open(GATE_LOCK_PATH)
+        try:
+            await _flock(gate, fcntl.LOCK_SH)
+            await _flock(fd, fcntl.LOCK_SH)
+        finally:
+            os.close(gate)
+        yield
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def switching():
+    """
+    Hold off all readers until the block ends. Blocking, for the load job process.
+    """
+    gate = _open(GATE_LOCK_PATH)
+    fd = _open(READERS_LOCK_PATH)
+    try:
+        fcntl.flock(gate, fcntl.LOCK_EX)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+        os.close(gate)
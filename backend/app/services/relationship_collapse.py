@@ -0,0 +1,101 @@
+from collections import defaultdict
+
+# In-memory version of the Relationship collapse step.
+# Every Relationship node is turned into direct Entity-Entity edges (one per entity pair)
+# before anything is written to Neo4j, so the Relationship nodes and the edges touching
+# them never have to be loaded and deleted again.
+# Runs in a single pass over nodes and edges, i.e. linear in the size of the graph.
+
+
+def collapse_relationships(nodes, edges):
+    """
+    Split the raw graph into the part that is loaded as-is and the collapsed relationship edges.
+    Returns (nodes, edges, relationship_edges) where relationship_edges are rows of the form
+    {"type", "source", "target", "props"} with the same properties the old per-relationship
+    Cypher loop produced (evidence_count, evidence_contents, CommIDs, source/target, directed, number).
+    """
+    node_by_id = {}
+    for node in nodes:
+        if node.get("type") in ["Entity", "Event", "Relationship"]:
+            node_by_id[node.get("id")] = node
+
+    def node_type(node_id):
+        node = node_by_id.get(node_id)
+        return node.get("type") if node else None
+
+    relationships = [n for n in node_by_id.values() if n.get("type") == "Relationship"]
+    relationship_ids = {r["id"] for r in relationships}
+
+    # Edges are MERGEd on (source, type, target) by the loader, so duplicates collapse to one
+    entities = defaultdict(list)
+    sources = defaultdict(list)
+    targets = defaultdict(list)
+    evidence = defaultdict(list)
+    seen = set()
+    for edge in edges:
+        source_id = edge.get("source")
+        target_id = edge.get("target")
+        if source_id is None or target_id is None:
+            continue
+        if source_id not in relationship_ids and target_id not in relationship_ids:
+            continue
+        key = (source_id, edge.get("type", "RELATED_TO"), target_id)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        if target_id in relationship_ids:
+            if node_type(source_id) == "Entity":
+                entities[target_id].append(source_id)
+                sources[target_id].append(source_id)
+            elif edge.get("type") == "evidence_for":
+                comm = node_by_id.get(source_id)
+                if comm and comm.get("type") == "Event" and comm.get("sub_type") == "Communication":
+                    evidence[target_id].append(comm)
+        if source_id in relationship_ids and node_type(target_id) == "Entity":
+            entities[source_id].append(target_id)
+            targets[source_id].append(target_id)
+
+    # Track edge counts between each entity pair to assign a unique "number"
+    edge_counter = {}
+    relationship_edges = []
+    for r in relationships:
+        r_id = r["id"]
+        base_props = dict(r)
+
+        comms = evidence[r_id]
+        base_props["evidence_count"] = len(comms)
+        base_props["evidence_contents"] = [c["content"] for c in comms if c.get("content") is not None]
+        base_props["CommIDs"] = [c["id"] for c in comms]
+
+        source_entities = list(dict.fromkeys(sources[r_id]))
+        target_entities = list(dict.fromkeys(targets[r_id]))
+        base_props["source"] = source_entities
+        base_props["target"] = target_entities
+        base_props["directed"] = len(source_entities) == 1 and len(target_entities) == 1
+
+        entity_ids = entities[r_id]
+        rel_type = r.get("sub_type") or "RELATIONSHIP"
+        for i in range(len(entity_ids)):
+            for j in range(i + 1, len(entity_ids)):
+                source = entity_ids[i]
+                target = entity_ids[j]
+                key = tuple(sorted((source, target)))
+                edge_counter[key] = edge_counter.get(key, 0) + 1
+
+                props = base_props.copy()
+                props["number"] = edge_counter[key]
+                relationship_edges.append({
+                    "type": rel_type,
+                    "source": source,
+                    "target": target,
+                    "props": props
+                })
+
+    # Relationship nodes are deleted after the collapse, together with all their edges
+    kept_nodes = [n for n in nodes if n.get("id") not in relationship_ids]
+    kept_edges = [
+        e for e in edges
+        if e.get("source") not in relationship_ids and e.get("target") not in relationship_ids
+    ]
+    return kept_nodes, kept_edges, relationship_edges
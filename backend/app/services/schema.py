@@ -0,0 +1,193 @@
+import os
+import time
+
+from services.timestamps import parse_timestamp
+
+# Neo4j schema management: uniqueness constraints and indexes.
+# Migrations are versioned and only use IF NOT EXISTS statements, so ensure_schema can run
+# on every startup and before every load. The applied version is derived from the index and
+# constraint names that exist in the database, so no marker node ends up in the graph.
+
+SCHEMA_VERSIONS = [
+    (1, [
+        ("entity_id", "CREATE CONSTRAINT entity_id IF NOT EXISTS FOR (n:Entity) REQUIRE n.id IS UNIQUE"),
+        ("event_id", "CREATE CONSTRAINT event_id IF NOT EXISTS FOR (n:Event) REQUIRE n.id IS UNIQUE"),
+        ("relationship_id", "CREATE CONSTRAINT relationship_id IF NOT EXISTS FOR (n:Relationship) REQUIRE n.id IS UNIQUE"),
+        ("event_sub_type", "CREATE INDEX event_sub_type IF NOT EXISTS FOR (n:Event) ON (n.sub_type)"),
+        ("event_timestamp", "CREATE INDEX event_timestamp IF NOT EXISTS FOR (n:Event) ON (n.timestamp)"),
+        ("event_content", "CREATE FULLTEXT INDEX event_content IF NOT EXISTS FOR (n:Event) ON EACH [n.content]"),
+    ]),
+    (2, [
+        ("event_timestamp_epoch", "CREATE RANGE INDEX event_timestamp_epoch IF NOT EXISTS FOR (n:Event) ON (n.timestamp_epoch)"),
+        ("event_timestamp_dt", "CREATE RANGE INDEX event_timestamp_dt IF NOT EXISTS FOR (n:Event) ON (n.timestamp_dt)"),
+    ]),
+    # Staged graph of a running load (services/bulk_loader.py), MERGEd on id like the live one
+    (3, [
+        ("staging_entity_id", "CREATE CONSTRAINT staging_entity_id IF NOT EXISTS FOR (n:StagingEntity) REQUIRE n.id IS UNIQUE"),
+        ("staging_event_id", "CREATE CONSTRAINT staging_event_id IF NOT EXISTS FOR (n:StagingEvent) REQUIRE n.id IS UNIQUE"),
+        ("staging_relationship_id", "CREATE CONSTRAINT staging_relationship_id IF NOT EXISTS FOR (n:StagingRelationship) REQUIRE n.id IS UNIQUE"),
+    ]),
+]
+
+BACKFILL_BATCH_SIZE = int(os.environ.get("BACKFILL_BATCH_SIZE", 10000))
+
+
+def _backfill_timestamps(session):
+    """
+    timestamp_dt and timestamp_epoch of the events of a graph loaded before schema version 2.
+    The timestamps are parsed in Python like the loader does (services/timestamps.py), so one
+    malformed timestamp only leaves its own event without them instead of failing the backfill.
+    """
+    records = session.run("""
+        MATCH (n:Event)
+        WHERE n.timestamp IS NOT NULL AND n.timestamp_epoch IS NULL
+        RETURN elementId(n) AS element_id, n.timestamp AS timestamp
+    """).data()
+    rows = []
+    for record in records:
+        parsed = parse_timestamp(record["timestamp"])
+        if parsed is not None:
+            rows.append({"element_id": record["element_id"], "dt": parsed, "epoch": int(parsed.timestamp())})
+    for start in range(0, len(rows), BACKFILL_BATCH_SIZE):
+        session.run("""
+            UNWIND $rows AS row
+            MATCH (n:Event) WHERE elementId(n) = row.element_id
+            SET n.timestamp_dt = row.dt, n.timestamp_epoch = row.epoch
+        """, rows=rows[start:start + BACKFILL_BATCH_SIZE]).consume()
+    print(f"Backfilled the timestamps of {len(rows)} events, {len(records) - len(rows)} could not be parsed")
+
+
+# Data migrations that run right after the index with the same name was created,
+# so a graph loaded before that schema version gets the indexed properties as well
+BACKFILLS = {
+    "event_timestamp_epoch": _backfill_timestamps,
+}
+
+SCHEMA_VERSION = SCHEMA_VERSIONS[-1][0]
+
+# Queries of the hot endpoints, checked with EXPLAIN by explain_hot_queries
+HOT_QUERIES = {
+    "evidence-for-event": ("""
+        MATCH (sender:Entity)-[:sent]->(comm:Event {sub_type: 'Communication'})-[:received]->(receiver:Entity),
+              (comm)-[:evidence_for]->(e:Event {id: $event_id})
+        RETURN comm, sender.id AS source, receiver.id AS target
+    """, {"event_id": "Event_Monitoring_0"}),
+    "massive-sequence-view": ("""
+        UNWIND $event_ids AS eid
+        MATCH (sender:Entity)-[:sent]->(comm:Event {id: eid, sub_type: 'Communication'})-[:received]->(receiver:Entity)
+        RETURN comm, sender.id AS source, receiver.id AS target
+    """, {"event_ids": ["Event_Communication_1"]}),
+    "event-entities": ("""
+        UNWIND $event_ids AS eid
+        MATCH (e:Event {id: eid})
+        OPTIONAL MATCH (source:Entity)-[]->(e)
+        RETURN eid, collect(DISTINCT source.id)
+    """, {"event_ids": ["Event_Monitoring_0"]}),
+    "get-events-by-date": ("""
+        MATCH (e:Event)
+        WHERE e.timestamp_epoch >= $start AND e.timestamp_epoch < $end
+        RETURN e
+    """, {"start": 2232835200, "end": 2232921600}),
+    "filter-by-content": ("""
+        MATCH (e:Event {sub_type: 'Communication'})
+        WHERE e.id IN $ids
+        RETURN e
+    """, {"ids": ["Event_Communication_1"]}),
+}
+
+# Plan operators that read through an index or a constraint
+INDEX_OPERATORS = ("NodeIndexSeek", "NodeUniqueIndexSeek", "NodeIndexScan", "NodeIndexSeekByRange",
+                   "NodeIndexContainsScan", "NodeIndexEndsWithScan", "MultiNodeIndexSeek",
+                   "DirectedRelationshipIndexSeek", "UndirectedRelationshipIndexSeek")
+SCAN_OPERATORS = ("AllNodesScan", "NodeByLabelScan")
+
+
+def _existing_names(session):
+    names = {record["name"] for record in session.run("SHOW INDEXES YIELD name")}
+    names |= {record["name"] for record in session.run("SHOW CONSTRAINTS YIELD name")}
+    return names
+
+
+def _applied_version(names):
+    applied = 0
+    for version, statements in SCHEMA_VERSIONS:
+        if not all(name in names for name, _ in statements):
+            break
+        applied = version
+    return applied
+
+
+def ensure_schema(driver):
+    """
+    Apply all missing schema migrations with the sync driver.
+    Returns a report with the version before and after, and the statements that failed
+    (e.g. a uniqueness constraint on data that already has duplicate ids).
+    """
+    start = time.perf_counter()
+    report = {"target_version": SCHEMA_VERSION, "created": [], "errors": {}}
+    with driver.session() as session:
+        names = _existing_names(session)
+        report["version_before"] = _applied_version(names)
+        for version, statements in SCHEMA_VERSIONS:
+            for name, statement in statements:
+                if name in names:
+                    continue
+                try:
+                    session.run(statement).consume()
+                    report["created"].append(name)
+                    if name in BACKFILLS:
+                        BACKFILLS[name](session)
+                except Exception as e:
+                    report["errors"][name] = str(e)
+        if report["created"]:
+            # Indexes are populated in the background, wait so the first queries can use them
+            session.run("CALL db.awaitIndexes(300)").consume()
+        report["version"] = _applied_version(_existing_names(session))
+    report["seconds"] = round(time.perf_counter() - start, 2)
+    print(f"Schema at version {report['version']} (created: {report['created'] or 'nothing'})")
+    for name, error in report["errors"].items():
+        print(f"Schema statement '{name}' failed: {error}")
+    return report
+
+
+def _walk_plan(plan, operators):
+    operator = plan.get("operatorType", "").split("@")[0]
+    details = (plan.get("args") or plan.get("arguments") or {}).get("Details")
+    operators.append({"operator": operator, "details": details})
+    for child in plan.get("children", []):
+        _walk_plan(child, operators)
+
+
+async def schema_status(driver):
+    async with driver.session() as session:
+        indexes = await (await session.run(
+            "SHOW INDEXES YIELD name, type, entityType, labelsOrTypes, properties, state, populationPercent"
+        )).data()
+        constraints = await (await session.run("SHOW CONSTRAINTS YIELD name, type, labelsOrTypes, properties")).data()
+    names = {i["name"] for i in indexes} | {c["name"] for c in constraints}
+    return {
+        "version": _applied_version(names),
+        "target_version": SCHEMA_VERSION,
+        "indexes": indexes,
+        "constraints": constraints
+    }
+
+
+async def explain_hot_queries(driver):
+    """
+    EXPLAIN every hot endpoint query and report which indexes its plan uses and
+    whether it still falls back to label or full node scans.
+    """
+    report = {}
+    async with driver.session() as session:
+        for endpoint, (query, params) in HOT_QUERIES.items():
+            result = await session.run("EXPLAIN " + query, **params)
+            summary = await result.consume()
+            operators = []
+            _walk_plan(summary.plan or {}, operators)
+            report[endpoint] = {
+                "index_reads": [o for o in operators if o["operator"].startswith(INDEX_OPERATORS)],
+                "scans": [o for o in operators if o["operator"].startswith(SCAN_OPERATORS)],
+                "operators": [o["operator"] for o in operators]
+            }
+    return report
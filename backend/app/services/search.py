@@ -0,0 +1,189 @@
+import hashlib
+import json
+import threading
+import numpy as np
+import pandas as pd
+
+from services.embeddings import load_or_encode, file_hash
+from services.graph_loader import loaded_graph_path
+from services.encoder import QueryEncoder
+from services.models import registry
+from services.text_index import InvertedIndex
+from services.vector_index import build_index
+
+# Data behind the similarity search endpoints.
+# Both the embedding model and the corpus are registered with the lazy model registry,
+# so torch and sentence_transformers are only imported when search is first needed
+# (or when the background warm-up gets to them). Queries go through the vector indexes
+# (services/vector_index.py) and the keyword indexes (services/text_index.py) of the corpus.
+# The corpus is read from the source document of the loaded graph. Once a (delta) load replaced that
+# document, refresh_corpus() appends the new communications to the loaded corpus and its indexes. When
+# events changed or vanished it drops the corpus instead, so it is rebuilt with the changed messages
+# only going through the model (services/embeddings.py).
+
+EMBED_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+
+MESSAGE_PREFIX = "Represent this sentence for searching relevant passages: "
+EVENT_PREFIX = "Represent this passage for retrieval: "
+MESSAGE_QUERY_PREFIX = "Represent those Keywords for searching relevant passages: "
+EVENT_QUERY_PREFIX = "Represent this question for retrieving supporting passages: "
+
+
+def _load_embed_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBED_MODEL_NAME, device="cpu")
+
+
+EVENT_TEXT_COLUMNS = ["content", "findings", "results", "destination", "outcome", "reference"]
+
+
+def _event_full_text(df):
+    return df.reindex(columns=EVENT_TEXT_COLUMNS).fillna("").agg(" ".join, axis=1)
+
+
+def _event_digests(nodes):
+    return {node["id"]: hashlib.sha1(json.dumps(node, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+            for node in nodes if node.get("type") == "Event"}
+
+
+# Dataframes and keyword (BM25) indexes of the corpus. Needs no ML model,
+# so keyword search and /filter-by-content work while the embedding model is still loading.
+class TextCorpus:
+    def __init__(self, data_path=None):
+        self.data_path = data_path or loaded_graph_path()
+        self.data_hash = file_hash(self.data_path)
+        self._lock = threading.Lock()
+
+        # Load the graph data from the JSON file to dataframe
+        with open(self.data_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        nodes_df = pd.DataFrame(data['nodes'])
+        self.event_digests = _event_digests(data['nodes'])
+
+        # Filter for communication events
+        self.communication_events = nodes_df[nodes_df['sub_type'] == 'Communication'].copy()
+        self.communication_events['content'] = self.communication_events['content'].fillna("")
+
+        # Load all events for similarity search using contentFilter
+        self.events = nodes_df[nodes_df['type'] == 'Event'].copy()
+        self.events["full_text"] = _event_full_text(self.events)
+
+        self.message_text_index = InvertedIndex()
+        self.message_text_index.add_many(self.communication_events["id"], self.communication_events["content"])
+        self.event_text_index = InvertedIndex()
+        self.event_text_index.add_many(self.events["id"], self.events["full_text"])
+
+    # New communication events of a changed graph document (list of node dicts), or None when
+    # events were changed or removed, or new events are not communications, and the corpus has to be rebuilt
+    def appended_messages(self, nodes):
+        digests = _event_digests(nodes)
+        if any(digests.get(node_id) != digest for node_id, digest in self.event_digests.items()):
+            return None
+        new = {node["id"]: node for node in nodes if node.get("type") == "Event" and node["id"] not in self.event_digests}
+        if any(node.get("sub_type") != "Communication" for node in new.values()):
+            return None
+        return list(new.values())
+
+    # Append new communication events (list of node dicts) and index their text.
+    # Returns the new message rows and event rows.
+    def add_messages(self, nodes):
+        # Continue the index labels of the loaded nodes so rows stay unique
+        start = max(self.communication_events.index.max(), self.events.index.max()) + 1
+        new = pd.DataFrame(nodes, index=range(start, start + len(nodes)))
+        new["content"] = new["content"].fillna("") if "content" in new else ""
+        event_rows = new.reindex(columns=self.events.columns.drop("full_text"))
+        event_rows["full_text"] = _event_full_text(event_rows)
+        with self._lock:
+            self.communication_events = pd.concat([self.communication_events, new], ignore_index=False)
+            self.events = pd.concat([self.events, event_rows], ignore_index=False)
+            self.message_text_index.add_many(new["id"], new["content"])
+            self.event_text_index.add_many(event_rows["id"], event_rows["full_text"])
+            self.event_digests.update(_event_digests(nodes))
+        return new, event_rows
+
+
+# Embeddings and vector indexes on top of the text corpus
+class SearchCorpus:
+    def __init__(self):
+        self.text = registry.get("text_corpus")
+        self._lock = threading.Lock()
+
+        # Embeddings are computed once and shared between workers through the on-disk cache,
+        # the model is only loaded here if the cache is cold
+        self.message_embs = load_or_encode(
+            "messages", self.communication_events["content"].tolist(), _encode_corpus,
+            EMBED_MODEL_NAME, MESSAGE_PREFIX, self.text.data_path
+        )
+        self.event_embeddings = load_or_encode(
+            "events", self.events["full_text"].tolist(), _encode_corpus,
+            EMBED_MODEL_NAME, EVENT_PREFIX, self.text.data_path
+        )
+        self.message_index = build_index(self.message_embs)
+        self.event_index = build_index(self.event_embeddings)
+
+    @property
+    def communication_events(self):
+        return self.text.communication_events
+
+    @property
+    def events(self):
+        return self.text.events
+
+    # Add new communication events (list of node dicts) without rebuilding the indexes.
+    # Communications are searchable both as messages and as events.
+    def add_messages(self, nodes):
+        if not nodes:
+            return
+        new, event_rows = self.text.add_messages(nodes)
+        embeddings = _encode_corpus([MESSAGE_PREFIX + text for text in new["content"]])
+        event_embeddings = _encode_corpus([EVENT_PREFIX + text for text in event_rows["full_text"]])
+        with self._lock:
+            self.message_embs = np.vstack([self.message_embs, embeddings])
+            self.event_embeddings = np.vstack([self.event_embeddings, event_embeddings])
+            self.message_index.add(embeddings)
+            self.event_index.add(event_embeddings)
+
+
+def _encode_corpus(texts):
+    return np.asarray(registry.get("embed_model").encode(texts, convert_to_numpy=True), dtype=np.float32)
+
+
+def encode_query(text):
+    return _encode_corpus([text])[0]
+
+
+# Cached, micro-batched query encoding for the request path
+query_encoder = QueryEncoder(_encode_corpus)
+
+
+_refresh_lock = threading.Lock()
+
+
+# Blocking (hashes and reads the data file when it changed), call it from a worker thread in async code
+def refresh_corpus():
+    if not registry.is_loaded("text_corpus"):
+        return
+    with _refresh_lock:
+        corpus = registry.get("text_corpus")
+        path = loaded_graph_path()
+        data_hash = file_hash(path)
+        if corpus.data_path == path and corpus.data_hash == data_hash:
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            nodes = corpus.appended_messages(json.load(f)["nodes"])
+        if nodes is None:
+            print("Loaded graph changed, rebuilding the search corpus")
+            registry.invalidate("search_corpus", "text_corpus")
+            return
+        if nodes:
+            print(f"Loaded graph changed, adding {len(nodes)} messages to the search corpus")
+            if registry.is_loaded("search_corpus"):
+                registry.get("search_corpus").add_messages(nodes)
+            else:
+                corpus.add_messages(nodes)
+        corpus.data_path, corpus.data_hash = path, data_hash
+
+
+registry.register("text_corpus", TextCorpus)
+registry.register("embed_model", _load_embed_model)
+registry.register("search_corpus", SearchCorpus)
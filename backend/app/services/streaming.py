@@ -0,0 +1,163 @@
+import json
+import os
+import zlib
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is used when brotli is not installed
+    brotli = None
+
+# Streaming responses for large payloads.
+# Records are encoded in batches as they come from their source (e.g. a Neo4j result cursor)
+# and compressed on the fly, so memory stays flat and the first bytes go out right away.
+# Two layouts are supported:
+#   - a chunked JSON document {"nodes": [...], "links": [...], "success": true}, which the
+#     existing frontend can read with response.json()
+#   - NDJSON (Accept: application/x-ndjson), one {"section": ..., "data": {...}} line per record
+#     and a final {"section": "end", ...} line, so clients can render while the rest arrives
+
+STREAM_BATCH_SIZE = int(os.environ.get("STREAM_BATCH_SIZE", 500))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def wants_ndjson(request: Request):
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Pick br, gzip or identity from an Accept-Encoding header (q=0 means not acceptable).
+    """
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    for encoding in (["br"] if brotli is not None else []) + ["gzip"]:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+class _Compressor:
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor()
+        elif encoding == "gzip":
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        else:
+            self._compressor = None
+
+    # Compress and flush, so the client can decode everything sent so far
+    def chunk(self, data):
+        if self._compressor is None:
+            return data
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self._compressor is None:
+            return b""
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def _dumps(value):
+    return json.dumps(value, default=str)
+
+
+async def _json_document(sections):
+    error = None
+    for index, (key, records) in enumerate(sections):
+        yield ("{" if index == 0 else ",") + _dumps(key) + ":["
+        batch = []
+        count = 0
+        try:
+            async for record in records:
+                batch.append(_dumps(record))
+                if len(batch) >= STREAM_BATCH_SIZE:
+                    yield ("," if count else "") + ",".join(batch)
+                    count += len(batch)
+                    batch = []
+        except Exception as e:
+            error = e
+        if batch:
+            yield ("," if count else "") + ",".join(batch)
+        yield "]"
+        if error is not None:
+            break
+    if not sections:
+        yield "{"
+    else:
+        yield ","
+    if error is None:
+        yield '"success":true}'
+    else:
+        print(f"Error while streaming: {str(error)}")
+        yield '"success":false,"error":' + _dumps(str(error)) + "}"
+
+
+async def _ndjson(sections):
+    error = None
+    counts = {}
+    for key, records in sections:
+        batch = []
+        counts[key] = 0
+        try:
+            async for record in records:
+                batch.append(_dumps({"section": key, "data": record}))
+                counts[key] += 1
+                if len(batch) >= STREAM_BATCH_SIZE:
+                    yield "\n".join(batch) + "\n"
+                    batch = []
+        except Exception as e:
+            error = e
+        if batch:
+            yield "\n".join(batch) + "\n"
+        if error is not None:
+            break
+    if error is None:
+        yield _dumps({"section": "end", "success": True, "counts": counts}) + "\n"
+    else:
+        print(f"Error while streaming: {str(error)}")
+        yield _dumps({"section": "end", "success": False, "error": str(error), "counts": counts}) + "\n"
+
+
+def stream_sections(request: Request, sections):
+    """
+    Stream [(key, async iterable of dicts)] as a chunked JSON document or as NDJSON,
+    depending on the Accept header, compressed as negotiated from Accept-Encoding.
+    The iterables are consumed one after the other.
+    """
+    ndjson = wants_ndjson(request)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    compressor = _Compressor(encoding)
+
+    async def body():
+        parts = _ndjson(sections) if ndjson else _json_document(sections)
+        async for text in parts:
+            data = compressor.chunk(text.encode("utf-8"))
+            if data:
+                yield data
+        yield compressor.finish()
+
+    headers = {"Vary": "Accept, Accept-Encoding", "Cache-Control": "no-cache"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(
+        body(),
+        media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json",
+        headers=headers
+    )
@@ -0,0 +1,128 @@
+import bisect
+import math
+import re
+import threading
+from collections import defaultdict
+
+# In-process inverted index with BM25 scoring for keyword search.
+# Replaces the pandas str.contains / Cypher CONTAINS full scans: a query only touches the
+# posting lists of its terms. A document matches when it has every query token, or a term that
+# starts with it ("fish" finds "fishing"). Unlike the old substring search, text inside a word
+# ("shing") and the order of the query words do not matter.
+# Documents are added while the corpus is refreshed after a load and searched by the requests at
+# the same time, so add and search both hold the index lock.
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)  # term -> {doc position: term frequency}
+        self.doc_ids = []
+        self.doc_lengths = []
+        self.total_length = 0
+        self._vocabulary = []  # sorted terms, for prefix expansion
+        self._vocabulary_dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    # Documents get consecutive positions in insertion order, like the rows of the corpus
+    def add(self, doc_id, text):
+        tokens = tokenize(text)
+        with self._lock:
+            position = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.doc_lengths.append(len(tokens))
+            self.total_length += len(tokens)
+            for token in tokens:
+                postings = self.postings[token]
+                if not postings:
+                    self._vocabulary_dirty = True
+                postings[position] = postings.get(position, 0) + 1
+        return position
+
+    def add_many(self, doc_ids, texts):
+        for doc_id, text in zip(doc_ids, texts):
+            self.add(doc_id, text)
+
+    def expand(self, token):
+        with self._lock:
+            return self._expand(token)
+
+    # Terms starting with token; the caller holds the lock
+    def _expand(self, token):
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(t for t, postings in self.postings.items() if postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, token)
+        terms = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(token):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, query, k=None):
+        """
+        Return [(position, score)] of the documents that contain every query token
+        (or a term starting with it), best BM25 score first.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            if not tokens or not self.doc_ids:
+                return []
+            return self._search(tokens, k)
+
+    def _search(self, tokens, k):
+        n_docs = len(self.doc_ids)
+        avg_length = self.total_length / n_docs or 1.0
+        candidates = None
+        scores = defaultdict(float)
+        # Rarest token first keeps the candidate set small
+        expanded = sorted(
+            ((token, self._expand(token)) for token in tokens),
+            key=lambda item: sum(len(self.postings[t]) for t in item[1])
+        )
+        for token, terms in expanded:
+            matched = set()
+            for term in terms:
+                matched.update(self.postings.get(term, ()))
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return []
+            for term in terms:
+                postings = self.postings[term]
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for position in candidates.intersection(postings):
+                    tf = postings[position]
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / avg_length)
+                    scores[position] += idf * tf * (self.k1 + 1) / norm
+
+        ranked = sorted(((p, scores[p]) for p in candidates), key=lambda item: (-item[1], item[0]))
+        return ranked[:k] if k is not None else ranked
+
+    def stats(self):
+        return {"documents": len(self.doc_ids), "terms": len(self.postings)}
+
+
+def reciprocal_rank_fusion(rankings, k=60, limit=None):
+    """
+    Fuse several ranked lists of document keys into one list.
+    Each key scores sum(1 / (k + rank)) over the lists it appears in.
+    """
+    scores = defaultdict(float)
+    first_seen = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] += 1.0 / (k + rank + 1)
+            first_seen.setdefault(key, len(first_seen))
+    fused = sorted(scores, key=lambda key: (-scores[key], first_seen[key]))
+    return fused[:limit] if limit is not None else fused
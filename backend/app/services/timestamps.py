@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+
+# Timestamp handling for the loader and the date / range filters.
+# Events keep their "timestamp" string for display and additionally get
+#   timestamp_dt     native Neo4j DateTime (UTC)
+#   timestamp_epoch  seconds since the epoch (int), backed by a range index
+# Range filters compare timestamp_epoch, so Neo4j can answer them with an index range seek
+# instead of parsing or slicing the timestamp string of every event.
+
+TIMESTAMP_DT = "timestamp_dt"
+TIMESTAMP_EPOCH = "timestamp_epoch"
+# Internal properties that are never sent to the frontend
+TIMESTAMP_PROPERTIES = (TIMESTAMP_DT, TIMESTAMP_EPOCH)
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def parse_timestamp(value):
+    """
+    Parse '2040-10-01 08:09:00', '2040-10-01T08:09:00' or '2040-10-01' (UTC) into an aware datetime.
+    Returns None for empty or malformed values.
+    """
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if hasattr(value, "to_native"):  # neo4j.time.DateTime
+        return parse_timestamp(value.to_native())
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace(" ", "T"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def to_epoch(value):
+    parsed = parse_timestamp(value)
+    return int(parsed.timestamp()) if parsed is not None else None
+
+
+def day_range(date):
+    """
+    [start, end) epoch seconds of a YYYY-MM-DD day.
+    """
+    start = to_epoch(date[:10] if isinstance(date, str) else date)
+    if start is None:
+        raise ValueError(f"'{date}' is not a date like 2040-10-01")
+    return start, start + DAY_SECONDS
+
+
+def range_bounds(start=None, end=None, inclusive_end=True):
+    """
+    [start, end) epoch seconds for a filter from start to end. Date-only ends cover the whole day,
+    full timestamps are inclusive when inclusive_end is set. Missing bounds are None.
+    """
+    start_epoch = to_epoch(start) if start else None
+    if start and start_epoch is None:
+        raise ValueError(f"'{start}' is not a timestamp like 2040-10-01 08:00:00")
+    end_epoch = None
+    if end:
+        end_epoch = to_epoch(end)
+        if end_epoch is None:
+            raise ValueError(f"'{end}' is not a timestamp like 2040-10-01 08:00:00")
+        if len(end.strip()) <= 10:
+            end_epoch += DAY_SECONDS
+        elif inclusive_end:
+            end_epoch += 1
+    return start_epoch, end_epoch
+
+
+def add_timestamp_properties(nodes):
+    """
+    Add timestamp_dt and timestamp_epoch to every node with a parseable timestamp (in place).
+    """
+    for node in nodes:
+        parsed = parse_timestamp(node.get("timestamp"))
+        if parsed is not None:
+            node[TIMESTAMP_DT] = parsed
+            node[TIMESTAMP_EPOCH] = int(parsed.timestamp())
+    return nodes
+
+
+def public_properties(props):
+    return {key: value for key, value in props.items() if key not in TIMESTAMP_PROPERTIES}
+
+
+def epoch_label(epoch):
+    return (datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=epoch)).strftime("%Y-%m-%d %H:%M:%S")
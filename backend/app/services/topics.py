@@ -0,0 +1,360 @@
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from services.artifacts import VersionCache, versioned_artifact, write_atomic
+from services.comm_cube import CommCube
+from services.embeddings import CACHE_DIR, text_digests
+from services.graph_cache import graph_cache, graph_version
+from services.text_index import tokenize
+
+# Topics of the communications: clusters of the message embeddings of the search corpus.
+# Messages are clustered with spherical mini-batch k-means (cosine similarity, unit centroids,
+# Sculley's per-centroid learning rates), seeded with k-means++ on a sample. TOPIC_RUNS runs with
+# different seeds go to a process pool on larger corpora (the workers map the embedding cache file
+# instead of receiving a copy) and the run with the best total similarity is kept. Every topic gets
+# the keywords that set it apart from the others (class-based TF-IDF over the message tokens).
+# Models are saved per graph version under TOPIC_DIR, built by the load job (or the first request).
+# A new version starts from the previous model: unchanged messages keep their topic and only new or
+# changed messages are assigned to the nearest centroid, which moves by their running mean. When
+# messages were removed or changed, the centroids are first recomputed from the messages that kept
+# their topic. The messages are only clustered again when most of them are new.
+
+TOPIC_DIR = os.path.join(CACHE_DIR, "topics")
+TOPIC_COUNT = int(os.environ.get("TOPIC_COUNT", 8))
+# k-means runs with different seeds, the best one is kept
+TOPIC_RUNS = int(os.environ.get("TOPIC_RUNS", 4))
+TOPIC_WORKERS = int(os.environ.get("TOPIC_WORKERS", min(4, os.cpu_count() or 1)))
+# Below this many messages the process pool costs more than it saves
+TOPIC_PARALLEL_MIN_MESSAGES = int(os.environ.get("TOPIC_PARALLEL_MIN_MESSAGES", 5000))
+TOPIC_BATCH_SIZE = int(os.environ.get("TOPIC_BATCH_SIZE", 1024))
+TOPIC_ITERATIONS = int(os.environ.get("TOPIC_ITERATIONS", 100))
+TOPIC_SEED = int(os.environ.get("TOPIC_SEED", 42))
+TOPIC_KEYWORDS = 8
+# Share of new messages above which a new version is clustered from scratch
+TOPIC_RECLUSTER_SHARE = float(os.environ.get("TOPIC_RECLUSTER_SHARE", 0.5))
+CHUNK_ROWS = 16384
+
+STOP_WORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "your", "all", "any", "can", "had", "has", "have",
+    "her", "his", "him", "was", "were", "will", "with", "this", "that", "these", "those", "from", "they",
+    "them", "their", "there", "then", "than", "what", "when", "where", "which", "who", "why", "how",
+    "our", "out", "about", "into", "over", "just", "been", "being", "would", "could", "should", "shall",
+    "may", "might", "must", "also", "some", "more", "most", "very", "its", "let", "get", "got",
+    "did", "does", "doing", "done", "one", "two", "now", "here", "yes", "okay", "please", "thanks",
+    "thank", "need", "know", "see", "make", "sure", "well", "still", "only", "other", "each", "both"
+}
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def assign(embeddings, centroids, chunk_rows=CHUNK_ROWS):
+    """
+    Nearest centroid and its cosine similarity for every row, computed chunk by chunk.
+    """
+    labels = np.empty(len(embeddings), dtype=np.int64)
+    similarities = np.empty(len(embeddings), dtype=np.float32)
+    for start in range(0, len(embeddings), chunk_rows):
+        scores = _unit(embeddings[start:start + chunk_rows]) @ centroids.T
+        labels[start:start + chunk_rows] = scores.argmax(axis=1)
+        similarities[start:start + chunk_rows] = scores.max(axis=1)
+    return labels, similarities
+
+
+def _update(centroids, counts, batch, labels):
+    """
+    Move every centroid by the running mean of the rows assigned to it (in place).
+    """
+    for topic in np.unique(labels):
+        rows = batch[labels == topic]
+        counts[topic] += len(rows)
+        centroids[topic] += (rows.sum(axis=0) - len(rows) * centroids[topic]) / counts[topic]
+    centroids[:] = _unit(centroids)
+
+
+def member_centroids(embeddings, labels, centroids, chunk_rows=CHUNK_ROWS):
+    """
+    Unit mean and count of the rows of every topic, computed chunk by chunk. Rows with label -1 are
+    skipped; a topic without rows keeps its centroid from centroids.
+    """
+    sums = np.zeros(centroids.shape, dtype=np.float64)
+    for start in range(0, len(labels), chunk_rows):
+        chunk_labels = labels[start:start + chunk_rows]
+        rows = np.flatnonzero(chunk_labels >= 0)
+        if len(rows):
+            np.add.at(sums, chunk_labels[rows], _unit(embeddings[start + rows]))
+    counts = np.bincount(labels[labels >= 0], minlength=len(centroids)).astype(np.float64)
+    means = np.where(counts[:, None] > 0, sums, centroids)
+    return _unit(means), counts
+
+
+def _kmeans_plus_plus(sample, k, rng):
+    centroids = [sample[rng.integers(len(sample))]]
+    distances = 1 - sample @ centroids[0]
+    for _ in range(1, k):
+        weights = np.maximum(distances, 0)
+        total = weights.sum()
+        choice = rng.choice(len(sample), p=weights / total) if total > 0 else rng.integers(len(sample))
+        centroids.append(sample[choice])
+        distances = np.minimum(distances, 1 - sample @ sample[choice])
+    return np.array(centroids, dtype=np.float32)
+
+
+def minibatch_kmeans(embeddings, k, seed, batch_size=TOPIC_BATCH_SIZE, iterations=TOPIC_ITERATIONS):
+    """
+    Spherical mini-batch k-means. Returns (unit centroids, rows per centroid, total similarity).
+    """
+    rng = np.random.default_rng(seed)
+    n = len(embeddings)
+    sample = _unit(embeddings[np.sort(rng.choice(n, min(n, max(batch_size, 20 * k)), replace=False))])
+    centroids = _kmeans_plus_plus(sample, k, rng)
+    counts = np.zeros(k, dtype=np.float64)
+    for _ in range(iterations):
+        batch = _unit(embeddings[np.sort(rng.choice(n, min(batch_size, n), replace=False))])
+        labels = (batch @ centroids.T).argmax(axis=1)
+        _update(centroids, counts, batch, labels)
+    labels, similarities = assign(embeddings, centroids)
+    return centroids, np.bincount(labels, minlength=k).astype(np.float64), float(similarities.sum())
+
+
+def _run(embeddings, k, seed):
+    # In a pool worker embeddings is the path of the memory-mapped cache file
+    if isinstance(embeddings, str):
+        embeddings = np.load(embeddings, mmap_mode="r")
+    return minibatch_kmeans(embeddings, k, seed)
+
+
+def cluster(embeddings, k=TOPIC_COUNT, runs=TOPIC_RUNS, workers=TOPIC_WORKERS):
+    """
+    Best of runs k-means runs, in a process pool for large corpora. Returns (centroids, counts, workers used).
+    """
+    k = min(k, len(embeddings))
+    seeds = [TOPIC_SEED + run for run in range(runs)]
+    filename = getattr(embeddings, "filename", None)
+    if workers > 1 and runs > 1 and len(embeddings) >= TOPIC_PARALLEL_MIN_MESSAGES:
+        source = filename if filename else np.asarray(embeddings)
+        workers = min(workers, runs)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(_run, [source] * runs, [k] * runs, seeds))
+    else:
+        workers = 1
+        results = [minibatch_kmeans(embeddings, k, seed) for seed in seeds]
+    centroids, counts, _ = max(results, key=lambda result: result[2])
+    return centroids, counts, workers
+
+
+def topic_keywords(texts, labels, k, top=TOPIC_KEYWORDS):
+    """
+    The top terms of every topic by class-based TF-IDF: frequent in the topic, rare in the others.
+    """
+    counts = [Counter() for _ in range(k)]
+    for text, label in zip(texts, labels):
+        counts[label].update(token for token in tokenize(text)
+                             if len(token) > 2 and not token.isdigit() and token not in STOP_WORDS)
+    totals = Counter()
+    for topic_counts in counts:
+        totals.update(topic_counts)
+    average = sum(totals.values()) / max(k, 1)
+    keywords = []
+    for topic_counts in counts:
+        size = sum(topic_counts.values()) or 1
+        scores = {term: count / size * math.log(1 + average / totals[term]) for term, count in topic_counts.items()}
+        keywords.append([term for term, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top]])
+    return keywords
+
+
+def model_path(version):
+    return os.path.join(TOPIC_DIR, f"{version}.npz")
+
+
+def _save(path, model):
+    write_atomic(path, lambda f: np.savez(
+        f, centroids=model["centroids"], counts=model["counts"], ids=np.array(model["ids"], dtype=str),
+        digests=model["digests"], labels=model["labels"], similarities=model["similarities"],
+        meta=np.array(json.dumps(model["meta"]))
+    ))
+
+
+def _load(path):
+    try:
+        with np.load(path) as data:
+            return {
+                "centroids": data["centroids"],
+                "counts": data["counts"],
+                "ids": data["ids"].tolist(),
+                "digests": data["digests"],
+                "labels": data["labels"],
+                "similarities": data["similarities"],
+                "meta": json.loads(str(data["meta"]))
+            }
+    except FileNotFoundError:
+        return None
+
+
+# Newest model of another graph version, if any
+def _previous(path):
+    candidates = [os.path.join(TOPIC_DIR, name) for name in os.listdir(TOPIC_DIR)
+                  if name.endswith(".npz") and os.path.join(TOPIC_DIR, name) != path]
+    for candidate in sorted(candidates, key=os.path.getmtime, reverse=True):
+        model = _load(candidate)
+        if model is not None:
+            return model
+    return None
+
+
+def build_model(version, message_ids, texts, embeddings, previous=None):
+    """
+    Topic model of the messages: labels, centroids and keywords. With a previous model only the
+    new and changed messages are assigned, unless most messages are new.
+    """
+    start = time.perf_counter()
+    digests = text_digests(texts, "topics", "")
+    labels = np.full(len(message_ids), -1, dtype=np.int64)
+    similarities = np.zeros(len(message_ids), dtype=np.float32)
+    if previous is not None and len(previous["centroids"]) == min(TOPIC_COUNT, len(message_ids)):
+        known = {(message_id, digest): row for row, (message_id, digest)
+                 in enumerate(zip(previous["ids"], previous["digests"].tolist()))}
+        for i, key in enumerate(zip(message_ids, digests.tolist())):
+            row = known.get(key)
+            if row is not None:
+                labels[i] = previous["labels"][row]
+                similarities[i] = previous["similarities"][row]
+    new = np.flatnonzero(labels < 0)
+
+    if not len(message_ids):
+        mode = "empty"
+        centroids = np.zeros((0, embeddings.shape[1] if np.ndim(embeddings) == 2 else 0), dtype=np.float32)
+        counts = np.zeros(0, dtype=np.float64)
+        workers = 0
+    elif previous is not None and len(new) <= TOPIC_RECLUSTER_SHARE * len(message_ids):
+        mode = "incremental"
+        centroids = previous["centroids"].copy()
+        counts = previous["counts"].copy()
+        if len(message_ids) - len(new) < len(previous["ids"]):
+            # Messages were removed or changed: their old embeddings are gone, so the centroids and
+            # counts are recomputed from the messages that kept their topic instead of decremented
+            centroids, counts = member_centroids(embeddings, labels, centroids)
+        for chunk_start in range(0, len(new), TOPIC_BATCH_SIZE):
+            rows = new[chunk_start:chunk_start + TOPIC_BATCH_SIZE]
+            batch = _unit(embeddings[rows])
+            scores = batch @ centroids.T
+            labels[rows] = scores.argmax(axis=1)
+            similarities[rows] = scores.max(axis=1)
+            _update(centroids, counts, batch, labels[rows])
+        workers = 0
+    else:
+        mode = "clustered"
+        new = np.arange(len(message_ids))
+        centroids, counts, workers = cluster(embeddings)
+        labels, similarities = assign(embeddings, centroids)
+
+    k = len(centroids)
+    keywords = topic_keywords(texts, labels, k)
+    sizes = np.bincount(labels, minlength=k)
+    meta = {
+        "version": version,
+        "mode": mode,
+        "messages": len(message_ids),
+        "assigned": int(len(new)),
+        "parallel_workers": workers,
+        "seconds": round(time.perf_counter() - start, 3),
+        "topics": [{"id": topic, "size": int(sizes[topic]), "keywords": keywords[topic]} for topic in range(k)]
+    }
+    print(f"Topic model ({mode}, {k} topics, {len(new)} of {len(message_ids)} messages assigned) in {meta['seconds']}s")
+    return {"centroids": centroids, "counts": counts, "ids": list(message_ids), "digests": digests,
+            "labels": labels, "similarities": similarities, "meta": meta}
+
+
+def load_or_build(version, message_ids, texts, embeddings):
+    """
+    Topic model of the version from TOPIC_DIR, built (from the previous version's model if there
+    is one) and saved first if missing (services/artifacts.py). Only the newest model is kept,
+    as the start of the next version's.
+    """
+    path = model_path(version)
+    return versioned_artifact(path, lambda: build_model(version, message_ids, texts, embeddings, _previous(path)),
+                              load=_load, save=_save)
+
+
+def build_for_graph(data, version):
+    """
+    Called by the load job with the graph document it is about to publish. The message embeddings
+    come from (and warm) the embedding cache of the search corpus; only new texts are encoded.
+    """
+    from services.graph_loader import loaded_graph_path
+    from services.search import EMBED_MODEL_NAME, MESSAGE_PREFIX, _encode_corpus
+    from services.embeddings import load_or_encode
+
+    messages = [node for node in data["nodes"] if node.get("sub_type") == "Communication"]
+    texts = [node.get("content") or "" for node in messages]
+    embeddings = load_or_encode("messages", texts, _encode_corpus, EMBED_MODEL_NAME, MESSAGE_PREFIX, loaded_graph_path())
+    return load_or_build(version, [node["id"] for node in messages], texts, embeddings)
+
+
+class Topics:
+    def __init__(self, model, snapshot):
+        self.version = model["meta"]["version"]
+        self.meta = model["meta"]
+        self.labels = dict(zip(model["ids"], model["labels"].tolist()))
+        self.similarities = dict(zip(model["ids"], model["similarities"].tolist()))
+        self.snapshot = snapshot
+        # Positions of the communications of every topic in the snapshot, in time order,
+        # and the (first) sender and receiver of every communication
+        self.positions = {topic["id"]: [] for topic in self.meta["topics"]}
+        self.ends = {}
+        for sender, position, receiver in snapshot.communications:
+            if position in self.ends:
+                continue
+            self.ends[position] = (sender, receiver)
+            topic = self.labels.get(snapshot.nodes[position]["id"])
+            if topic is not None:
+                self.positions[topic].append(position)
+        self._position_sets = {}
+        self._cubes = {}
+
+    def position_set(self, topic):
+        if topic not in self._position_sets:
+            self._position_sets[topic] = set(self.positions[topic])
+        return self._position_sets[topic]
+
+    def cube(self, topic):
+        """
+        Communication cube (services/comm_cube.py) of the messages of one topic, built on first use.
+        """
+        if topic not in self._cubes:
+            positions = self.position_set(topic)
+            snapshot = self.snapshot
+            self._cubes[topic] = CommCube.build(
+                ((sender, receiver, snapshot.nodes[position].get("timestamp"))
+                 for sender, position, receiver in snapshot.communications if position in positions),
+                self.version
+            )
+        return self._cubes[topic]
+
+
+async def _build(version, driver, load_corpus):
+    """
+    load_corpus() -> search corpus is only awaited when no model of the version was built yet.
+    """
+    snapshot = await graph_cache.get_snapshot(driver, version)
+    model = await asyncio.to_thread(_load, model_path(version))
+    if model is None:
+        corpus = await load_corpus()
+        messages = corpus.communication_events
+        model = await asyncio.to_thread(load_or_build, version, messages["id"].tolist(),
+                                        messages["content"].tolist(), corpus.message_embs)
+    return await asyncio.to_thread(Topics, model, snapshot)
+
+
+# topic_cache.get(driver, load_corpus) -> Topics of the current graph version
+topic_cache = VersionCache(graph_version, _build)
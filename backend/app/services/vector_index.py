@@ -0,0 +1,143 @@
+import os
+import threading
+import numpy as np
+
+# Vector indexes behind the similarity search endpoints.
+# ExactIndex does a brute-force cosine search with one matrix-vector product and is the
+# right choice for small corpora (a few thousand messages). HnswIndex wraps hnswlib
+# (optional dependency) for large corpora. Both support adding documents incrementally;
+# positions returned by search() are the insertion order of the vectors.
+
+# "auto", "exact" or "hnsw"
+VECTOR_INDEX = os.environ.get("VECTOR_INDEX", "auto")
+# With VECTOR_INDEX=auto, corpora of at least this many vectors use HNSW (if hnswlib is installed)
+VECTOR_INDEX_HNSW_THRESHOLD = int(os.environ.get("VECTOR_INDEX_HNSW_THRESHOLD", 50000))
+# HNSW graph degree and build/search beam width: higher means better recall and slower queries
+HNSW_M = int(os.environ.get("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", 128))
+# Upper bound on results of threshold-only queries against an HNSW index
+HNSW_MAX_RESULTS = int(os.environ.get("HNSW_MAX_RESULTS", 1000))
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class ExactIndex:
+    kind = "exact"
+
+    def __init__(self, vectors=None, dim=None):
+        self.vectors = None
+        self.norms = None
+        self.dim = dim
+        self._lock = threading.Lock()
+        if vectors is not None and len(vectors):
+            self.add(vectors)
+
+    def __len__(self):
+        return 0 if self.vectors is None else self.vectors.shape[0]
+
+    # The vectors are kept as they are (e.g. a memory-mapped cache file) and only their
+    # norms are stored, so the index does not duplicate the embedding matrix.
+    def add(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        norms = np.linalg.norm(vectors, axis=1)
+        norms[norms == 0] = 1.0
+        with self._lock:
+            if self.vectors is None:
+                self.vectors, self.norms, self.dim = vectors, norms, vectors.shape[1]
+            else:
+                self.vectors = np.vstack([self.vectors, vectors])
+                self.norms = np.concatenate([self.norms, norms])
+
+    def scores(self, query):
+        query = _normalize(query)[0]
+        return (self.vectors @ query) / self.norms
+
+    def search(self, query, k=None, threshold=None):
+        """
+        Return (positions, scores) ordered by descending cosine similarity.
+        k limits the number of results, threshold drops results below the given score.
+        """
+        if not len(self):
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        scores = self.scores(query)
+        if k is not None and k < len(scores):
+            positions = np.argpartition(-scores, k - 1)[:k]
+        else:
+            positions = np.arange(len(scores))
+        if threshold is not None:
+            positions = positions[scores[positions] >= threshold]
+        positions = positions[np.argsort(-scores[positions], kind="stable")]
+        return positions, scores[positions]
+
+    def info(self):
+        return {"kind": self.kind, "size": len(self), "dim": self.dim}
+
+
+class HnswIndex:
+    kind = "hnsw"
+
+    def __init__(self, vectors=None, dim=None, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, ef_search=HNSW_EF_SEARCH):
+        import hnswlib
+
+        if dim is None:
+            dim = np.asarray(vectors).shape[1]
+        self.dim = dim
+        self.ef_search = ef_search
+        self.index = hnswlib.Index(space="cosine", dim=dim)
+        self.index.init_index(max_elements=max(1024, len(vectors) if vectors is not None else 0), M=m, ef_construction=ef_construction)
+        self.index.set_ef(ef_search)
+        self._lock = threading.Lock()
+        if vectors is not None and len(vectors):
+            self.add(vectors)
+
+    def __len__(self):
+        return self.index.get_current_count()
+
+    def add(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        with self._lock:
+            start = len(self)
+            needed = start + len(vectors)
+            if needed > self.index.get_max_elements():
+                self.index.resize_index(max(needed, 2 * self.index.get_max_elements()))
+            self.index.add_items(vectors, np.arange(start, needed))
+
+    def search(self, query, k=None, threshold=None):
+        if not len(self):
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        k = min(k or HNSW_MAX_RESULTS, len(self))
+        # ef has to be at least k for hnswlib to return k results
+        self.index.set_ef(max(self.ef_search, k))
+        labels, distances = self.index.knn_query(np.asarray(query, dtype=np.float32).reshape(1, -1), k=k)
+        positions = labels[0].astype(np.int64)
+        scores = 1.0 - distances[0]
+        if threshold is not None:
+            keep = scores >= threshold
+            positions, scores = positions[keep], scores[keep]
+        return positions, scores
+
+    def info(self):
+        return {"kind": self.kind, "size": len(self), "dim": self.dim, "ef_search": self.ef_search}
+
+
+def build_index(vectors, kind=VECTOR_INDEX):
+    if kind == "auto":
+        kind = "hnsw" if len(vectors) >= VECTOR_INDEX_HNSW_THRESHOLD else "exact"
+    if kind == "hnsw":
+        try:
+            return HnswIndex(vectors)
+        except ImportError:
+            print("hnswlib is not installed, falling back to exact vector search.")
+    return ExactIndex(vectors)
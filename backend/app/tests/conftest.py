@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The services are imported as top-level packages (from services.x import ...), as in main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,74 @@
+import asyncio
+import os
+
+from services.artifacts import VersionCache, load_json, versioned_artifact
+
+
+def test_artifact_is_computed_once(tmp_path):
+    path = str(tmp_path / "v1.json")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"version": "v1"}
+
+    assert versioned_artifact(path, compute) == {"version": "v1"}
+    assert versioned_artifact(path, compute) == {"version": "v1"}
+    assert len(calls) == 1
+    assert load_json(path) == {"version": "v1"}
+
+
+def test_older_versions_are_removed(tmp_path):
+    old = tmp_path / "v1.json"
+    old.write_text("{}")
+    other_kind = tmp_path / "v1.npz"
+    other_kind.write_text("")
+    versioned_artifact(str(tmp_path / "v2.json"), lambda: {})
+    assert sorted(os.listdir(tmp_path)) == ["v1.npz", "v2.json", "v2.json.lock"]
+
+
+def test_newer_versions_are_kept(tmp_path):
+    newer = tmp_path / "v3.json"
+    newer.write_text("{}")
+
+    def save_late(path, value):
+        # Saved by a slow worker after v3 was published, with the mtime of when it started
+        open(path, "w").write("{}")
+        os.utime(path, (0, 0))
+
+    versioned_artifact(str(tmp_path / "v2.json"), lambda: {}, save=save_late)
+    assert newer.exists()
+
+
+def test_prefix_limits_the_removal(tmp_path):
+    (tmp_path / "messages-old.npy").write_text("")
+    (tmp_path / "entities-old.npy").write_text("")
+    versioned_artifact(str(tmp_path / "messages-new.npy"), lambda: "new", load=lambda p: p if os.path.exists(p) else None,
+                       save=lambda p, value: open(p, "w").close(), prefix="messages-")
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".npy")) == ["entities-old.npy", "messages-new.npy"]
+
+
+def test_reload_returns_the_saved_file(tmp_path):
+    path = str(tmp_path / "v1.json")
+    assert versioned_artifact(path, lambda: {"a": 1}, save=lambda p, value: open(p, "w").write('{"a": 2}'),
+                              reload=True) == {"a": 2}
+
+
+def test_version_cache_builds_once_per_version():
+    version = ["v1"]
+    builds = []
+
+    async def build(current, suffix):
+        builds.append(current)
+        await asyncio.sleep(0)
+        return current + suffix
+
+    async def run():
+        cache = VersionCache(lambda: version[0], build)
+        first = await asyncio.gather(*[cache.get("!") for _ in range(5)])
+        version[0] = "v2"
+        return first, await cache.get("!")
+
+    first, second = asyncio.run(run())
+    assert first == ["v1!"] * 5 and second == "v2!"
+    assert builds == ["v1", "v2"]
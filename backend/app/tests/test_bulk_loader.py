@@ -0,0 +1,53 @@
+from services.bulk_loader import BulkLoader
+from services.load_status import LoadStatus
+
+
+class Result:
+    def consume(self):
+        pass
+
+
+class FlakyTx:
+    """
+    Transaction that fails at its second statement, like a transient error (e.g. a deadlock).
+    """
+    def __init__(self, fail):
+        self.fail = fail
+        self.statements = 0
+
+    def run(self, query, **params):
+        self.statements += 1
+        if self.fail and self.statements == 2:
+            raise ConnectionError("transient")
+        return Result()
+
+
+class RetryingSession:
+    """
+    Session whose execute_write retries every transaction once, as the driver does on transient errors.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_write(self, work, *args):
+        try:
+            return work(FlakyTx(fail=True), *args)
+        except ConnectionError:
+            return work(FlakyTx(fail=False), *args)
+
+
+class Driver:
+    def session(self):
+        return RetryingSession()
+
+
+def test_retried_transactions_are_counted_once(tmp_path):
+    status = LoadStatus("full", path=str(tmp_path / "status.json"))
+    nodes = [{"id": f"n{i}", "type": "Entity"} for i in range(10)]
+    loader = BulkLoader(Driver(), batch_size=2, tx_size=4, status=status)
+    loader.load_nodes(nodes)
+    assert status.state["phases"]["nodes"]["done"] == 10
+    assert status.state["rows_done"] == 10
@@ -0,0 +1,60 @@
+from services.comm_cube import HOUR_SECONDS, CommCube, hour_label, to_hours
+from services.timestamps import range_bounds, to_epoch
+
+OCT_1 = to_epoch("2040-10-01") // HOUR_SECONDS
+
+COMMUNICATIONS = [
+    ("Alice", "Bob", "2040-10-01 08:15:00"),
+    ("Alice", "Bob", "2040-10-01 08:45:00"),
+    ("Bob", "Alice", "2040-10-01 09:00:00"),
+    ("Alice", "Carol", "2040-10-01 23:59:59"),
+    ("Carol", "Bob", "2040-10-02 00:00:00"),
+    ("Bob", "Carol", "not a timestamp"),
+]
+
+
+def _cube():
+    return CommCube.build(COMMUNICATIONS, "v1")
+
+
+def test_to_hours_agrees_with_the_range_filters():
+    assert to_hours(["2040-10-01 08:59:59", "2040-10-01T09:00:00", "2040-10-01T11:00:00+02:00", None, "junk"]) == [
+        OCT_1 + 8, OCT_1 + 9, OCT_1 + 9, None, None
+    ]
+    assert hour_label(OCT_1 + 8) == "2040-10-01 08:00:00"
+
+
+def test_histogram_counts_every_bucket():
+    cube = _cube()
+    assert cube.histogram(("all",), OCT_1 + 8, OCT_1 + 10, 1) == [(OCT_1 + 8, 2), (OCT_1 + 9, 1), (OCT_1 + 10, 0)]
+    # Buckets of several hours, the last one cut at the end hour
+    assert cube.histogram(("sender", "Alice"), OCT_1, OCT_1 + 23, 12) == [(OCT_1, 2), (OCT_1 + 12, 1)]
+    assert cube.histogram(("sender", "Nobody"), OCT_1, OCT_1 + 1, 1) == [(OCT_1, 0), (OCT_1 + 1, 0)]
+
+
+def test_end_of_day_boundary():
+    cube = _cube()
+    # A date-only end covers the whole day: the message at 23:59:59 is in, the one at midnight is not
+    start_epoch, end_epoch = range_bounds("2040-10-01", "2040-10-01")
+    start_hour, end_hour = start_epoch // HOUR_SECONDS, (end_epoch - 1) // HOUR_SECONDS
+    assert end_hour == OCT_1 + 23
+    assert cube.histogram(("all",), start_hour, end_hour, 24) == [(OCT_1, 4)]
+    assert cube.count(("all",), end_hour + 1, end_hour + 1) == 1
+    assert dict(cube.pair_counts(start_hour, end_hour)) == {("Alice", "Bob"): 2, ("Bob", "Alice"): 1, ("Alice", "Carol"): 1}
+
+
+def test_pair_counts_in_a_range():
+    cube = _cube()
+    assert dict(cube.pair_counts(OCT_1 + 9, OCT_1 + 24)) == {("Bob", "Alice"): 1, ("Alice", "Carol"): 1, ("Carol", "Bob"): 1}
+    assert cube.pair_counts(OCT_1 + 10, OCT_1 + 22) == []
+
+
+def test_entity_totals_busiest_first():
+    cube = _cube()
+    assert cube.entity_totals(OCT_1, OCT_1 + 47) == [
+        {"id": "Alice", "sent": 3, "received": 1, "total": 4},
+        {"id": "Bob", "sent": 1, "received": 3, "total": 4},
+        {"id": "Carol", "sent": 1, "received": 1, "total": 2},
+    ]
+    # The unparseable timestamp is in no series
+    assert cube.count(("pair", "Bob", "Carol"), OCT_1 - 1000, OCT_1 + 1000) == 0
@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from services import embeddings
+
+
+class CountingEncoder:
+    """
+    Deterministic stand-in for the embedding model: one row per text, derived from the text.
+    """
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[len(text), sum(map(ord, text)) % 97, 1.0] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "EMBEDDING_DIR", str(tmp_path / "embeddings"))
+    data_path = tmp_path / "graph.json"
+    data_path.write_text("{}")
+    return str(data_path)
+
+
+def _load(texts, encode, data_path):
+    return embeddings.load_or_encode("messages", texts, encode, "model", "prefix: ", data_path)
+
+
+def test_cached_embeddings_are_reused(cache):
+    encode = CountingEncoder()
+    first = np.array(_load(["a", "bb", "ccc"], encode, cache))
+    assert len(encode.encoded) == 3
+    second = _load(["a", "bb", "ccc"], encode, cache)
+    assert len(encode.encoded) == 3
+    np.testing.assert_array_equal(first, second)
+
+
+def test_reordered_texts_get_their_own_rows(cache):
+    texts = ["a", "bb", "ccc"]
+    encode = CountingEncoder()
+    expected = dict(zip(texts, np.array(_load(texts, encode, cache))))
+    reordered = ["ccc", "a", "bb"]
+    result = _load(reordered, encode, cache)
+    # Same data file and row count, but the rows follow the texts, copied instead of encoded again
+    for text, row in zip(reordered, result):
+        np.testing.assert_array_equal(row, expected[text])
+    assert len(encode.encoded) == 3
+
+
+def test_only_changed_texts_are_encoded(cache):
+    encode = CountingEncoder()
+    _load(["a", "bb", "ccc"], encode, cache)
+    result = _load(["a", "changed", "ccc"], encode, cache)
+    assert encode.encoded[3:] == ["prefix: changed"]
+    np.testing.assert_array_equal(result[1], encode(["prefix: changed"])[0])
+
+
+def test_digest_mismatch_is_a_miss(cache):
+    texts = ["a", "bb", "ccc"]
+    encode = CountingEncoder()
+    _load(texts, encode, cache)
+    path = next(p for p in os.listdir(embeddings.EMBEDDING_DIR) if p.endswith(".keys.npy"))
+    keys_path = os.path.join(embeddings.EMBEDDING_DIR, path)
+    # Rows written for another order under the same name
+    np.save(keys_path, embeddings.text_digests(["bb", "a", "ccc"], "model", "prefix: "))
+    assert embeddings._load(keys_path[:-len(".keys.npy")] + ".npy",
+                            embeddings.text_digests(texts, "model", "prefix: ")) is None
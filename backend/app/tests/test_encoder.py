@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from services.encoder import QueryEmbeddingCache, QueryEncoder
+
+
+class StubEncoder:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model failed")
+        return np.array([[len(text), sum(map(ord, text))] for text in texts], dtype=np.float32)
+
+
+def test_cache_evicts_the_least_recently_used():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "max_size": 2, "hits": 3, "misses": 1, "hit_rate": 0.75}
+
+
+def test_cache_put_refreshes_an_existing_key():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 10)
+    cache.put("c", 3)
+    assert cache.get("a") == 10 and cache.get("b") is None
+
+
+def test_concurrent_queries_are_encoded_in_one_batch():
+    stub = StubEncoder()
+    encoder = QueryEncoder(stub, window_ms=50, max_batch_size=64)
+
+    async def run():
+        return await asyncio.gather(*[encoder.encode("query: ", text) for text in ["a", "bb", "a", "ccc"]])
+
+    results = asyncio.run(run())
+    # Identical concurrent queries share one row of the batch
+    assert stub.batches == [["query: a", "query: bb", "query: ccc"]]
+    np.testing.assert_array_equal(results[0], results[2])
+    np.testing.assert_array_equal(results[1], [len("query: bb"), sum(map(ord, "query: bb"))])
+    assert encoder.stats()["batches"] == 1 and encoder.stats()["encoded"] == 3
+
+
+def test_batches_are_split_at_the_max_size():
+    stub = StubEncoder()
+    encoder = QueryEncoder(stub, window_ms=50, max_batch_size=2)
+
+    async def run():
+        await asyncio.gather(*[encoder.encode("", text) for text in ["a", "b", "c", "d", "e"]])
+
+    asyncio.run(run())
+    assert [len(batch) for batch in stub.batches] == [2, 2, 1]
+
+
+def test_cached_queries_are_not_encoded_again():
+    stub = StubEncoder()
+    encoder = QueryEncoder(stub, window_ms=1)
+
+    async def run():
+        await encoder.encode("query: ", "reef")
+        await encoder.encode("query: ", "reef")
+        # Another prefix is another embedding
+        await encoder.encode("passage: ", "reef")
+
+    asyncio.run(run())
+    assert stub.batches == [["query: reef"], ["passage: reef"]]
+    assert encoder.cache.stats()["hits"] == 1
+
+
+def test_encode_errors_reach_every_waiting_query():
+    encoder = QueryEncoder(StubEncoder(fail=True), window_ms=20)
+
+    async def run():
+        return await asyncio.gather(encoder.encode("", "a"), encoder.encode("", "b"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert encoder.cache.stats()["size"] == 0
+    with pytest.raises(RuntimeError):
+        asyncio.run(encoder.encode("", "a"))
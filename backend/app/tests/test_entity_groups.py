@@ -0,0 +1,73 @@
+from services.entity_groups import CollapsedGraph
+from services.graph_snapshot import GraphSnapshot
+
+
+def _node(node_id, node_type, **props):
+    return {"labels": [node_type], "props": {"id": node_id, "type": node_type, **props}}
+
+
+def _edge(source, target, rel_type, source_is_entity, target_is_entity, **props):
+    return {"source": source, "target": target, "rel_type": rel_type, "source_is_entity": source_is_entity,
+            "target_is_entity": target_is_entity, "props": {"type": rel_type, **props}}
+
+
+def _snapshot():
+    nodes = [_node(name, "Entity", sub_type="Person") for name in ("Alice", "Bob", "Carol", "Dave")]
+    edges = []
+    for i, (sender, receiver) in enumerate([("Alice", "Bob"), ("Carol", "Bob"), ("Bob", "Dave"), ("Alice", "Bob")]):
+        message = f"msg_{i}"
+        nodes.append(_node(message, "Event", sub_type="Communication", content=f"Message {i}",
+                           timestamp=f"2040-10-01 0{i}:00:00"))
+        edges.append(_edge(sender, message, "sent", True, False))
+        edges.append(_edge(message, receiver, "received", False, True))
+    edges.append(_edge("Alice", "Carol", "Colleagues", True, True, id="rel_1"))
+    return GraphSnapshot(nodes, edges, "v1")
+
+
+def _normalized(view):
+    return sorted(map(str, view["nodes"])), sorted(map(str, view["links"]))
+
+
+def _aggregates(view):
+    return {node["id"]: node["event_ids"] for node in view["nodes"] if "event_ids" in node}
+
+
+def test_adding_a_group_collapses_its_members():
+    graph = CollapsedGraph(_snapshot())
+    view = graph.view({"AC": ["Alice", "Carol"]})
+    ids = {node["id"] for node in view["nodes"]}
+    assert "AC" in ids and "Alice" not in ids and "Carol" not in ids
+    group = next(node for node in view["nodes"] if node["id"] == "AC")
+    assert group["members"] == ["Alice", "Carol"] and group["sent"] == 3 and group["received"] == 0
+    assert _aggregates(view) == {
+        "Communication between AC and Bob": ["msg_0", "msg_1", "msg_3"],
+        "Communication between Bob and Dave": ["msg_2"],
+    }
+    # The relationship edge between the members now loops on the group
+    assert [(link["source"], link["target"]) for link in view["links"] if link.get("type") == "Colleagues"] == [("AC", "AC")]
+
+
+def test_updating_a_group_matches_a_fresh_build():
+    snapshot = _snapshot()
+    graph = CollapsedGraph(snapshot)
+    graph.view({"AC": ["Alice", "Carol"]})
+    rebuilt = graph.rebuilt_aggregates
+    groups = {"AC": ["Alice", "Carol", "Dave"]}
+    view = graph.view(groups)
+    assert _normalized(view) == _normalized(CollapsedGraph(snapshot).view(groups))
+    assert _aggregates(view)["Communication between Bob and AC"] == ["msg_2"]
+    # Only the aggregates Dave's pairs moved between were rebuilt
+    assert graph.rebuilt_aggregates - rebuilt == 1
+
+
+def test_removing_a_group_restores_the_ungrouped_view():
+    snapshot = _snapshot()
+    graph = CollapsedGraph(snapshot)
+    ungrouped = graph.view({})
+    graph.view({"AC": ["Alice", "Carol"]})
+    assert _normalized(graph.view({})) == _normalized(ungrouped)
+    assert _aggregates(ungrouped) == {
+        "Communication between Alice and Bob": ["msg_0", "msg_3"],
+        "Communication between Carol and Bob": ["msg_1"],
+        "Communication between Bob and Dave": ["msg_2"],
+    }
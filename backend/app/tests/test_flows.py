@@ -0,0 +1,74 @@
+from collections import Counter
+
+import pytest
+
+from services.comm_cube import CommCube, communications_from_snapshot
+from services.flows import pair_flows
+from services.graph_snapshot import GraphSnapshot
+from services.timestamps import to_epoch
+
+ENTITIES = ["Alice", "Bob", "Carol"]
+MESSAGES = [
+    ("Alice", "Bob", "2040-10-01 08:05:00"),
+    ("Alice", "Bob", "2040-10-01 08:40:00"),
+    ("Bob", "Carol", "2040-10-01 08:59:59"),
+    ("Carol", "Alice", "2040-10-01 09:00:00"),
+    ("Alice", "Carol", "2040-10-01 09:30:00"),
+    ("Bob", "Alice", "2040-10-01 10:10:00"),
+    ("Alice", "Bob", "2040-10-01 12:45:00"),
+    ("Carol", "Bob", "2040-10-02 00:20:00"),
+    ("Bob", "Carol", None),
+]
+
+
+def _snapshot():
+    nodes = [{"labels": ["Entity"], "props": {"id": entity, "type": "Entity"}} for entity in ENTITIES]
+    edges = []
+    for i, (sender, receiver, timestamp) in enumerate(MESSAGES):
+        props = {"id": f"msg_{i}", "type": "Event", "sub_type": "Communication"}
+        if timestamp:
+            props["timestamp"] = timestamp
+        nodes.append({"labels": ["Event"], "props": props})
+        edges.append({"source": sender, "target": f"msg_{i}", "rel_type": "sent", "source_is_entity": True,
+                      "target_is_entity": False, "props": {"type": "sent"}})
+        edges.append({"source": f"msg_{i}", "target": receiver, "rel_type": "received", "source_is_entity": False,
+                      "target_is_entity": True, "props": {"type": "received"}})
+    return GraphSnapshot(nodes, edges, "v1")
+
+
+def _brute_force(snapshot, start, end, positions=None):
+    counts = Counter()
+    for sender, position, receiver in snapshot.communications:
+        epoch = snapshot.epochs[position]
+        if start is not None or end is not None:
+            if epoch is None or (start is not None and epoch < start) or (end is not None and epoch >= end):
+                continue
+        if positions is None or position in positions:
+            counts[(sender, receiver)] += 1
+    return counts
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2040-10-01 08:20:00", "2040-10-01 12:50:00"),
+    ("2040-10-01 08:20:00", "2040-10-01 08:50:00"),
+    ("2040-10-01 08:59:00", "2040-10-01 09:31:00"),
+    ("2040-10-01 09:00:00", "2040-10-01 10:00:00"),
+    (None, "2040-10-01 09:15:00"),
+    ("2040-10-01 10:30:00", None),
+    (None, None),
+])
+def test_pair_flows_match_a_brute_force_count(start, end):
+    snapshot = _snapshot()
+    cube = CommCube.build(communications_from_snapshot(snapshot), "v1")
+    start_epoch, end_epoch = to_epoch(start) if start else None, to_epoch(end) if end else None
+    assert pair_flows(cube, snapshot, start_epoch, end_epoch) == _brute_force(snapshot, start_epoch, end_epoch)
+
+
+def test_pair_flows_of_a_subset():
+    snapshot = _snapshot()
+    positions = {position for sender, position, receiver in snapshot.communications if sender == "Alice"}
+    cube = CommCube.build(((sender, receiver, snapshot.nodes[position].get("timestamp"))
+                           for sender, position, receiver in snapshot.communications if position in positions), "v1")
+    start, end = to_epoch("2040-10-01 08:20:00"), to_epoch("2040-10-01 12:50:00")
+    assert pair_flows(cube, snapshot, start, end, positions) == _brute_force(snapshot, start, end, positions)
+    assert pair_flows(cube, snapshot, start, end, positions) == Counter({("Alice", "Bob"): 2, ("Alice", "Carol"): 1})
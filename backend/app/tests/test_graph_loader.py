@@ -0,0 +1,206 @@
+import pytest
+
+from services import graph_loader
+from services.bulk_loader import edge_rows
+from services.load_status import LoadCancelled, LoadStatus
+from services.graph_loader import TIMESTAMP_DT, _comparable, apply_delta, diff_graph, diff_summary, prepare_graph
+
+NODES = [
+    {"id": "Alice", "type": "Entity", "sub_type": "Person"},
+    {"id": "Bob", "type": "Entity", "sub_type": "Person"},
+    {"id": "msg_1", "type": "Event", "sub_type": "Communication", "content": "Hello Bob",
+     "timestamp": "2040-10-01 08:00:00"},
+    {"id": "msg_2", "type": "Event", "sub_type": "Communication", "content": "Hi Alice",
+     "timestamp": "2040-10-01 09:00:00"},
+]
+EDGES = [
+    {"source": "Alice", "target": "msg_1", "type": "sent"},
+    {"source": "msg_1", "target": "Bob", "type": "received"},
+    {"source": "Bob", "target": "msg_2", "type": "sent"},
+    {"source": "msg_2", "target": "Alice", "type": "received"},
+]
+
+
+def _loaded(nodes, rows):
+    """
+    State of the database after loading nodes and rows, as read_loaded_graph returns it.
+    """
+    return (
+        {node["id"]: (node["type"], _comparable(node)) for node in nodes},
+        {(row["type"], row["source"], row["target"]): _comparable(row["props"]) for row in rows},
+    )
+
+
+def _prepared_state(data):
+    nodes, edges, relationship_edges = prepare_graph(data)
+    return _loaded(nodes, edge_rows(edges) + relationship_edges)
+
+
+def _edge_keys(rows):
+    return sorted((row["type"], row["source"], row["target"]) for row in rows)
+
+
+def test_diff_against_an_empty_database_adds_everything():
+    diff = diff_graph({}, {}, NODES, edge_rows(EDGES))
+    assert diff_summary(diff) == {
+        "added_nodes": 4, "changed_nodes": 0, "removed_nodes": 0, "upserted_edges": 4, "removed_edges": 0
+    }
+
+
+def test_diff_of_the_loaded_graph_is_empty():
+    diff = diff_graph(*_loaded(NODES, edge_rows(EDGES)), NODES, edge_rows(EDGES))
+    assert all(not rows for rows in diff.values())
+
+
+def test_diff_ignores_native_datetimes_and_missing_values():
+    loaded_nodes, loaded_edges = _loaded(NODES, edge_rows(EDGES))
+    nodes = [dict(node, **{TIMESTAMP_DT: "2040-10-01T08:00:00Z", "extra": None}) for node in NODES]
+    assert all(not rows for rows in diff_graph(loaded_nodes, loaded_edges, nodes, edge_rows(EDGES)).values())
+
+
+def test_diff_adds_new_nodes_and_edges():
+    nodes = NODES + [{"id": "msg_3", "type": "Event", "sub_type": "Communication", "content": "Bye"}]
+    edges = EDGES + [{"source": "Alice", "target": "msg_3", "type": "sent"}]
+    diff = diff_graph(*_loaded(NODES, edge_rows(EDGES)), nodes, edge_rows(edges))
+    assert [node["id"] for node in diff["added_nodes"]] == ["msg_3"]
+    assert _edge_keys(diff["upserted_edges"]) == [("sent", "Alice", "msg_3")]
+    assert not diff["changed_nodes"] and not diff["removed_nodes"] and not diff["removed_edges"]
+
+
+def test_diff_upserts_changed_nodes_and_edges_only():
+    nodes = [dict(node, content="Hello again") if node["id"] == "msg_1" else node for node in NODES]
+    edges = [dict(edge, weight=2) if edge["target"] == "msg_2" else edge for edge in EDGES]
+    diff = diff_graph(*_loaded(NODES, edge_rows(EDGES)), nodes, edge_rows(edges))
+    assert [node["id"] for node in diff["changed_nodes"]] == ["msg_1"]
+    assert diff["changed_nodes"][0]["content"] == "Hello again"
+    assert _edge_keys(diff["upserted_edges"]) == [("sent", "Bob", "msg_2")]
+    assert diff["upserted_edges"][0]["props"]["weight"] == 2
+    assert not diff["added_nodes"] and not diff["removed_nodes"] and not diff["removed_edges"]
+
+
+def test_diff_removes_vanished_nodes_and_edges():
+    nodes = [node for node in NODES if node["id"] != "msg_2"]
+    edges = [edge for edge in EDGES if "msg_2" not in (edge["source"], edge["target"]) and edge["type"] != "received"]
+    diff = diff_graph(*_loaded(NODES, edge_rows(EDGES)), nodes, edge_rows(edges))
+    assert diff["removed_nodes"] == [{"id": "msg_2", "type": "Event"}]
+    # The edges of msg_2 are listed too, deleting them before the node does no harm
+    assert _edge_keys(diff["removed_edges"]) == [
+        ("received", "msg_1", "Bob"), ("received", "msg_2", "Alice"), ("sent", "Bob", "msg_2")
+    ]
+    assert not diff["added_nodes"] and not diff["changed_nodes"] and not diff["upserted_edges"]
+
+
+def test_diff_drops_edges_to_unknown_nodes():
+    edges = EDGES + [{"source": "Alice", "target": "nobody", "type": "sent"}]
+    diff = diff_graph(*_loaded(NODES, edge_rows(EDGES)), NODES, edge_rows(edges))
+    assert all(not rows for rows in diff.values())
+
+
+def test_relabelled_node_is_replaced_with_its_edges():
+    nodes = [dict(node, type="Event") if node["id"] == "Bob" else node for node in NODES]
+    diff = diff_graph(*_loaded(NODES, edge_rows(EDGES)), nodes, edge_rows(EDGES))
+    assert diff["removed_nodes"] == [{"id": "Bob", "type": "Entity"}]
+    assert [node["id"] for node in diff["added_nodes"]] == ["Bob"]
+    # Deleting the old node deletes its edges, so they are written again and never deleted
+    assert _edge_keys(diff["upserted_edges"]) == [("received", "msg_1", "Bob"), ("sent", "Bob", "msg_2")]
+    assert not diff["removed_edges"] and not diff["changed_nodes"]
+
+
+def test_duplicates_are_merged_in_order():
+    nodes = NODES + [
+        {"id": "Alice", "type": "Entity", "sub_type": "Organization"},
+        {"id": "Alice", "type": "Entity", "alias": "A."},
+    ]
+    edges = EDGES + [
+        {"source": "Alice", "target": "msg_1", "type": "sent", "weight": 1},
+        {"source": "Alice", "target": "msg_1", "type": "sent", "weight": 3},
+    ]
+    diff = diff_graph(*_loaded(NODES, edge_rows(EDGES)), nodes, edge_rows(edges))
+    assert diff["changed_nodes"] == [{"id": "Alice", "type": "Entity", "sub_type": "Organization", "alias": "A."}]
+    assert diff["upserted_edges"] == [
+        {"type": "sent", "source": "Alice", "target": "msg_1", "props": {"type": "sent", "weight": 3}}
+    ]
+    assert not diff["added_nodes"] and not diff["removed_nodes"] and not diff["removed_edges"]
+
+
+def test_apply_delta_upserts_and_removes():
+    data = {"nodes": NODES, "edges": EDGES, "graph": {"name": "test"}}
+    delta = {
+        "nodes": [
+            {"id": "msg_1", "type": "Event", "sub_type": "Communication", "content": "Changed"},
+            {"id": "Carol", "type": "Entity", "sub_type": "Person"},
+        ],
+        "edges": [{"source": "Carol", "target": "msg_1", "type": "received"}],
+        "removed_nodes": ["msg_2"],
+        "removed_edges": [{"source": "msg_1", "target": "Bob", "type": "received"}],
+    }
+    result = apply_delta(data, delta)
+    assert result["graph"] == {"name": "test"}
+    assert [node["id"] for node in result["nodes"]] == ["Alice", "Bob", "msg_1", "Carol"]
+    assert result["nodes"][2]["content"] == "Changed"
+    # Removing msg_2 removed its edges as well
+    assert [(edge["source"], edge["target"], edge["type"]) for edge in result["edges"]] == [
+        ("Alice", "msg_1", "sent"), ("Carol", "msg_1", "received")
+    ]
+    # The loaded document is not modified
+    assert len(data["nodes"]) == 4 and len(data["edges"]) == 4
+
+
+def test_apply_delta_later_edges_replace_earlier_ones():
+    delta = {"edges": [{"source": "Alice", "target": "msg_1", "type": "sent", "weight": 5}]}
+    result = apply_delta({"nodes": NODES, "edges": EDGES}, delta)
+    assert len(result["edges"]) == 4
+    assert result["edges"][0] == {"source": "Alice", "target": "msg_1", "type": "sent", "weight": 5}
+
+
+def test_delta_document_diffs_to_its_changes():
+    loaded_nodes, loaded_edges = _prepared_state({"nodes": NODES, "edges": EDGES})
+    delta = {
+        "nodes": [{"id": "msg_1", "type": "Event", "sub_type": "Communication", "content": "Changed",
+                   "timestamp": "2040-10-01 08:00:00"}],
+        "removed_nodes": ["msg_2"],
+    }
+    nodes, edges, relationship_edges = prepare_graph(apply_delta({"nodes": NODES, "edges": EDGES}, delta))
+    diff = diff_graph(loaded_nodes, loaded_edges, nodes, edge_rows(edges) + relationship_edges)
+    assert diff_summary(diff) == {
+        "added_nodes": 0, "changed_nodes": 1, "removed_nodes": 1, "upserted_edges": 0, "removed_edges": 2
+    }
+    assert diff["changed_nodes"][0]["id"] == "msg_1"
+
+
+class FakeLoader:
+    """
+    BulkLoader stand-in that records its calls and cancels the load while staging the relationships.
+    """
+    calls = []
+
+    def __init__(self, driver, namespace="", status=None, **kwargs):
+        self.status = status
+        self.stats = {}
+
+    def clear(self):
+        FakeLoader.calls.append("clear")
+
+    def load_nodes(self, nodes):
+        FakeLoader.calls.append("nodes")
+
+    def load_edges(self, edges):
+        FakeLoader.calls.append("edges")
+
+    def load_edge_rows(self, rows, phase="edges"):
+        FakeLoader.calls.append(phase)
+        open(self.status.cancel_path, "w").close()
+
+    def promote(self):
+        self.status.start_phase("switch")
+        FakeLoader.calls.append("promote")
+
+
+def test_cancel_after_staging_drops_the_staged_graph(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_loader, "BulkLoader", FakeLoader)
+    monkeypatch.setattr(graph_loader, "ensure_schema", lambda driver: None)
+    FakeLoader.calls = []
+    status = LoadStatus("full", path=str(tmp_path / "status.json"), cancel_path=str(tmp_path / "cancel"))
+    with pytest.raises(LoadCancelled):
+        graph_loader.full_load(None, {"nodes": NODES, "edges": EDGES}, status)
+    assert FakeLoader.calls == ["clear", "nodes", "edges", "relationships", "clear"]
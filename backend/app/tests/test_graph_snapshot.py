@@ -0,0 +1,26 @@
+from services.graph_snapshot import EDGES_QUERY, NODE_PROPERTIES, NODES_QUERY, GraphSnapshot
+
+
+def _projected(props):
+    # What the map projection of NODES_QUERY returns: every listed property, null when missing
+    return {name: props.get(name) for name in NODE_PROPERTIES}
+
+
+def test_queries_do_not_read_whole_property_maps():
+    assert "properties(" not in NODES_QUERY and "properties(" not in EDGES_QUERY
+    assert "timestamp_dt" not in NODES_QUERY and "is_inferred" not in EDGES_QUERY
+
+
+def test_missing_properties_are_dropped():
+    nodes = [
+        {"labels": ["Entity"], "props": _projected({"id": "Alice", "type": "Entity", "sub_type": "Person"})},
+        {"labels": ["Event"], "props": _projected({"id": "msg_1", "type": "Event", "sub_type": "Communication",
+                                                   "content": "Hi", "timestamp": "2040-10-01 08:00:00"})},
+    ]
+    edges = [{"source": "Alice", "target": "msg_1", "rel_type": "sent", "source_is_entity": True,
+              "target_is_entity": False, "props": {"type": "sent", "id": None, "evidence_count": None}}]
+    snapshot = GraphSnapshot(nodes, edges, "v1")
+    assert snapshot.nodes[0] == {"id": "Alice", "type": "Entity", "sub_type": "Person"}
+    assert snapshot.nodes[1]["content"] == "Hi" and "name" not in snapshot.nodes[1]
+    assert snapshot.edges[0] == {"type": "sent", "source": "Alice", "target": "msg_1"}
+    assert snapshot.communications == []
@@ -0,0 +1,77 @@
+import os
+import subprocess
+import time
+
+import pytest
+
+from services import jobs
+
+
+@pytest.fixture(autouse=True)
+def jobs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs, "LOAD_LOCK_PATH", str(tmp_path / "load.lock"))
+    monkeypatch.setattr(jobs, "LAST_JOB_PATH", str(tmp_path / "last_job"))
+
+
+def _exited_pid():
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+def test_running_job_with_a_live_process():
+    jobs._write_job({"id": "a", "state": "running", "created_at": time.time(), "pid": os.getpid()})
+    assert jobs.get_job("a")["state"] == "running"
+
+
+def test_job_whose_process_exited_has_failed():
+    jobs._write_job({"id": "a", "state": "running", "created_at": time.time(), "pid": _exited_pid()})
+    job = jobs.get_job("a")
+    assert job["state"] == "failed" and job["error"] == "Job process exited"
+    assert jobs._read_job("a")["state"] == "failed"
+
+
+def test_job_without_a_process_fails_after_the_start_timeout():
+    jobs._write_job({"id": "new", "state": "queued", "created_at": time.time()})
+    jobs._write_job({"id": "old", "state": "queued", "created_at": time.time() - jobs.JOB_START_TIMEOUT - 1})
+    assert jobs.get_job("new")["state"] == "queued"
+    assert jobs.get_job("old")["state"] == "failed"
+
+
+def test_job_pruned_while_checked_is_unknown(monkeypatch):
+    jobs._write_job({"id": "a", "state": "running", "created_at": time.time(), "pid": _exited_pid()})
+    read_job = jobs._read_job
+    reads = []
+
+    def prune_after_first_read(job_id):
+        reads.append(job_id)
+        job = read_job(job_id)
+        if os.path.exists(jobs.job_path(job_id)):
+            os.remove(jobs.job_path(job_id))
+        return job
+
+    monkeypatch.setattr(jobs, "_read_job", prune_after_first_read)
+    assert jobs.get_job("a") is None
+    assert len(reads) == 2
+
+
+
+def test_load_lock_is_exclusive():
+    with jobs.load_lock():
+        with pytest.raises(jobs.JobBusy):
+            with jobs.load_lock():
+                pass
+    with jobs.load_lock():
+        pass
+
+
+def test_load_lock_held_outside_of_a_job_is_not_blamed_on_the_last_job():
+    jobs._write_job({"id": "old", "state": "done"})
+    with open(jobs.LAST_JOB_PATH, "w") as f:
+        f.write("old")
+    with jobs.load_lock():
+        with pytest.raises(jobs.JobBusy) as busy:
+            with jobs.load_lock():
+                pass
+    assert busy.value.job_id is None
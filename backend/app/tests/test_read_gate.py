@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+import pytest
+
+from services import read_gate
+
+
+@pytest.fixture(autouse=True)
+def lock_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(read_gate, "GATE_LOCK_PATH", str(tmp_path / "read_gate.lock"))
+    monkeypatch.setattr(read_gate, "READERS_LOCK_PATH", str(tmp_path / "readers.lock"))
+
+
+def _switch_in_thread(events, entered, release):
+    def run():
+        with read_gate.switching():
+            events.append("switch")
+            entered.set()
+            release.wait(5)
+            events.append("switched")
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_readers_wait_for_a_switch():
+    events = []
+    entered, release = threading.Event(), threading.Event()
+    thread = _switch_in_thread(events, entered, release)
+    entered.wait(5)
+
+    async def read():
+        async with read_gate.reading():
+            events.append("read")
+
+    async def main():
+        reader = asyncio.create_task(read())
+        await asyncio.sleep(0.2)
+        assert events == ["switch"]
+        release.set()
+        await reader
+
+    asyncio.run(main())
+    thread.join(5)
+    assert events == ["switch", "switched", "read"]
+
+
+def test_switch_waits_for_open_readers():
+    events = []
+    entered, release = threading.Event(), threading.Event()
+
+    async def main():
+        async with read_gate.reading():
+            events.append("read")
+            thread = _switch_in_thread(events, entered, release)
+            await asyncio.sleep(0.2)
+            assert events == ["read"]
+            events.append("read done")
+        release.set()
+        return thread
+
+    thread = asyncio.run(main())
+    thread.join(5)
+    assert events == ["read", "read done", "switch", "switched"]
+
+
+def test_readers_share_the_gate():
+    async def main():
+        async with read_gate.reading():
+            async with read_gate.reading():
+                return True
+
+    assert asyncio.run(asyncio.wait_for(main(), 2))
@@ -0,0 +1,66 @@
+from services.relationship_collapse import collapse_relationships
+
+NODES = [
+    {"id": "Alice", "type": "Entity", "sub_type": "Person"},
+    {"id": "Bob", "type": "Entity", "sub_type": "Person"},
+    {"id": "Carol", "type": "Entity", "sub_type": "Person"},
+    {"id": "msg_1", "type": "Event", "sub_type": "Communication", "content": "Meet at the reef"},
+    {"id": "msg_2", "type": "Event", "sub_type": "Communication"},
+    {"id": "report_1", "type": "Event", "sub_type": "Monitoring"},
+    {"id": "rel_1", "type": "Relationship", "sub_type": "Colleagues", "start_date": "2040-10-01"},
+    {"id": "rel_2", "type": "Relationship", "sub_type": "Suspicious"},
+]
+EDGES = [
+    {"source": "Alice", "target": "rel_1", "type": "sent"},
+    {"source": "rel_1", "target": "Bob", "type": "received"},
+    {"source": "msg_1", "target": "rel_1", "type": "evidence_for"},
+    {"source": "msg_2", "target": "rel_1", "type": "evidence_for"},
+    # Duplicates of (source, type, target) count once
+    {"source": "msg_1", "target": "rel_1", "type": "evidence_for"},
+    {"source": "Alice", "target": "rel_1", "type": "sent"},
+    # Only communications are evidence
+    {"source": "report_1", "target": "rel_1", "type": "evidence_for"},
+    {"source": "Alice", "target": "rel_2", "type": "sent"},
+    {"source": "Bob", "target": "rel_2", "type": "sent"},
+    {"source": "Carol", "target": "rel_2", "type": "sent"},
+    {"source": "Alice", "target": "msg_1", "type": "sent"},
+]
+
+
+def _by_pair(rows, rel_type):
+    return {(row["source"], row["target"]): row["props"] for row in rows if row["type"] == rel_type}
+
+
+def test_relationship_nodes_become_entity_edges():
+    nodes, edges, relationship_edges = collapse_relationships(NODES, EDGES)
+    assert "rel_1" not in {node["id"] for node in nodes} and "rel_2" not in {node["id"] for node in nodes}
+    assert edges == [{"source": "Alice", "target": "msg_1", "type": "sent"}]
+    assert sorted((row["type"], row["source"], row["target"]) for row in relationship_edges) == [
+        ("Colleagues", "Alice", "Bob"),
+        ("Suspicious", "Alice", "Bob"),
+        ("Suspicious", "Alice", "Carol"),
+        ("Suspicious", "Bob", "Carol"),
+    ]
+
+
+def test_evidence_and_direction():
+    _, _, relationship_edges = collapse_relationships(NODES, EDGES)
+    colleagues = _by_pair(relationship_edges, "Colleagues")[("Alice", "Bob")]
+    assert colleagues["evidence_count"] == 2
+    assert colleagues["CommIDs"] == ["msg_1", "msg_2"]
+    assert colleagues["evidence_contents"] == ["Meet at the reef"]
+    assert colleagues["source"] == ["Alice"] and colleagues["target"] == ["Bob"]
+    assert colleagues["directed"] is True
+    # The properties of the Relationship node are kept
+    assert colleagues["start_date"] == "2040-10-01" and colleagues["id"] == "rel_1"
+
+    suspicious = _by_pair(relationship_edges, "Suspicious")
+    assert all(props["directed"] is False and props["evidence_count"] == 0 for props in suspicious.values())
+    assert suspicious[("Alice", "Carol")]["source"] == ["Alice", "Bob", "Carol"]
+
+
+def test_edges_between_one_pair_are_numbered():
+    _, _, relationship_edges = collapse_relationships(NODES, EDGES)
+    assert _by_pair(relationship_edges, "Colleagues")[("Alice", "Bob")]["number"] == 1
+    assert _by_pair(relationship_edges, "Suspicious")[("Alice", "Bob")]["number"] == 2
+    assert _by_pair(relationship_edges, "Suspicious")[("Bob", "Carol")]["number"] == 1
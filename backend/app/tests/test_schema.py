@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+from services import schema
+from services.timestamps import to_epoch
+
+
+class Result:
+    def __init__(self, records=None):
+        self.records = records or []
+
+    def data(self):
+        return self.records
+
+    def consume(self):
+        pass
+
+
+class RecordingSession:
+    def __init__(self, events):
+        self.events = events
+        self.writes = []
+
+    def run(self, query, **params):
+        if "RETURN elementId(n)" in query:
+            return Result([{"element_id": element_id, "timestamp": timestamp} for element_id, timestamp in self.events])
+        self.writes.append(params["rows"])
+        return Result()
+
+
+def test_backfill_skips_malformed_timestamps(monkeypatch):
+    monkeypatch.setattr(schema, "BACKFILL_BATCH_SIZE", 2)
+    session = RecordingSession([
+        ("4:a:1", "2040-10-01 08:00:00"),
+        ("4:a:2", "not a timestamp"),
+        ("4:a:3", "2040-10-01T10:00:00+02:00"),
+        ("4:a:4", ""),
+        ("4:a:5", "2040-10-02"),
+    ])
+    schema.BACKFILLS["event_timestamp_epoch"](session)
+    assert [len(rows) for rows in session.writes] == [2, 1]
+    rows = [row for rows in session.writes for row in rows]
+    assert [row["element_id"] for row in rows] == ["4:a:1", "4:a:3", "4:a:5"]
+    assert [row["epoch"] for row in rows] == [
+        to_epoch("2040-10-01 08:00:00"), to_epoch("2040-10-01 08:00:00"), to_epoch("2040-10-02")
+    ]
+    assert rows[0]["dt"] == datetime(2040, 10, 1, 8, tzinfo=timezone.utc)
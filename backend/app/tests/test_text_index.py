@@ -0,0 +1,84 @@
+import math
+import threading
+
+from services.text_index import InvertedIndex, reciprocal_rank_fusion, tokenize
+
+DOCS = [
+    "Fishing permit for the north reef",
+    "The reef is closed",
+    "Meeting at the harbor about fishing permits, fishing season",
+    "Harbor meeting moved",
+]
+
+
+def _index():
+    index = InvertedIndex()
+    index.add_many([f"doc_{i}" for i in range(len(DOCS))], DOCS)
+    return index
+
+
+def _bm25(index, query, position):
+    """
+    BM25 of one document, straight from the formula.
+    """
+    tokens = tokenize(DOCS[position])
+    avg_length = sum(len(tokenize(doc)) for doc in DOCS) / len(DOCS)
+    score = 0.0
+    for token in dict.fromkeys(tokenize(query)):
+        for term in sorted({t for doc in DOCS for t in tokenize(doc) if t.startswith(token)}):
+            tf = tokens.count(term)
+            if not tf:
+                continue
+            df = sum(term in tokenize(doc) for doc in DOCS)
+            idf = math.log(1 + (len(DOCS) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (index.k1 + 1) / (tf + index.k1 * (1 - index.b + index.b * len(tokens) / avg_length))
+    return score
+
+
+def test_every_query_token_must_match_a_word_prefix():
+    index = _index()
+    assert sorted(position for position, _ in index.search("fish permit")) == [0, 2]
+    assert sorted(position for position, _ in index.search("permit fish")) == [0, 2]
+    assert [position for position, _ in index.search("harbor closed")] == []
+    # Text inside a word does not match
+    assert index.search("shing") == []
+
+
+def test_scores_are_bm25():
+    index = _index()
+    results = index.search("fishing harbor")
+    assert [position for position, _ in results] == [2]
+    for query in ("reef", "fish", "meeting harbor"):
+        results = index.search(query)
+        assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+        for position, score in results:
+            assert math.isclose(score, _bm25(index, query, position))
+
+
+def test_search_limit_and_empty_queries():
+    index = _index()
+    assert len(index.search("the", k=1)) == 1
+    assert index.search("") == [] and InvertedIndex().search("reef") == []
+
+
+def test_search_waits_for_a_running_add():
+    index = _index()
+    index.search("reef")  # vocabulary is up to date, nothing left to rebuild
+    results = []
+    searching = threading.Thread(target=lambda: results.append(index.search("reef")))
+    with index._lock:
+        # An add holds the lock while it writes the postings of its document
+        searching.start()
+        searching.join(timeout=0.2)
+        assert searching.is_alive() and not results
+    searching.join()
+    assert len(results[0]) == 2
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=60)
+    # a: 1/61 + 1/62, c: 1/63 + 1/61, b: 1/62, d: 1/63
+    assert fused == ["a", "c", "b", "d"]
+    assert reciprocal_rank_fusion([["a", "b"], ["b", "a"]]) == ["a", "b"]  # ties keep the first seen
+    assert reciprocal_rank_fusion([["a", "b", "c"]], limit=2) == ["a", "b"]
+    assert reciprocal_rank_fusion([]) == []
@@ -0,0 +1,51 @@
+import pytest
+
+from services.timestamps import DAY_SECONDS, range_bounds, to_epoch
+
+OCT_1 = to_epoch("2040-10-01")
+
+
+def test_to_epoch_reads_naive_timestamps_as_utc():
+    assert OCT_1 == 2232662400
+    assert to_epoch("2040-10-01 08:09:00") == OCT_1 + 8 * 3600 + 9 * 60
+    assert to_epoch("2040-10-01T08:09:00") == to_epoch("2040-10-01 08:09:00")
+    assert to_epoch("2040-10-01T08:09:00+02:00") == OCT_1 + 6 * 3600 + 9 * 60
+
+
+def test_range_bounds_without_bounds():
+    assert range_bounds() == (None, None)
+    assert range_bounds("", "") == (None, None)
+
+
+def test_range_bounds_open_ends():
+    assert range_bounds(start="2040-10-01 08:00:00") == (OCT_1 + 8 * 3600, None)
+    assert range_bounds(end="2040-10-01") == (None, OCT_1 + DAY_SECONDS)
+
+
+def test_date_only_end_covers_the_whole_day():
+    assert range_bounds("2040-10-01", "2040-10-01") == (OCT_1, OCT_1 + DAY_SECONDS)
+    assert range_bounds("2040-10-01", "2040-10-03") == (OCT_1, OCT_1 + 3 * DAY_SECONDS)
+    assert range_bounds("2040-10-01", " 2040-10-01 ") == (OCT_1, OCT_1 + DAY_SECONDS)
+    # Whole days do not depend on inclusive_end
+    assert range_bounds("2040-10-01", "2040-10-01", inclusive_end=False) == (OCT_1, OCT_1 + DAY_SECONDS)
+
+
+def test_timestamp_end_is_inclusive_by_default():
+    end = OCT_1 + 10 * 3600
+    assert range_bounds("2040-10-01 08:00:00", "2040-10-01 10:00:00") == (OCT_1 + 8 * 3600, end + 1)
+    assert range_bounds("2040-10-01 08:00:00", "2040-10-01T10:00:00", inclusive_end=False) == (OCT_1 + 8 * 3600, end)
+
+
+def test_date_only_start_is_midnight():
+    assert range_bounds("2040-10-02", None) == (OCT_1 + DAY_SECONDS, None)
+
+
+@pytest.mark.parametrize("start, end", [
+    ("junk", None),
+    (None, "junk"),
+    ("2040-13-01", None),
+    (None, "2040-10-01 25:00:00"),
+])
+def test_malformed_bounds_raise(start, end):
+    with pytest.raises(ValueError, match="is not a timestamp"):
+        range_bounds(start, end)
@@ -0,0 +1,53 @@
+import numpy as np
+
+from services import topics
+from services.topics import build_model, member_centroids
+
+
+def _corpus(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(topics.TOPIC_COUNT, 16)) * 4
+    truth = rng.integers(topics.TOPIC_COUNT, size=n)
+    embeddings = (centers[truth] + rng.normal(size=(n, 16))).astype(np.float32)
+    return [f"msg_{i}" for i in range(n)], [f"message {i}" for i in range(n)], embeddings
+
+
+def _unit(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_member_centroids_are_unit_means_of_the_members():
+    _, _, embeddings = _corpus(50)
+    labels = np.array([i % 3 for i in range(50)])
+    labels[:5] = -1
+    previous = _unit(np.ones((4, 16), dtype=np.float32))
+    centroids, counts = member_centroids(embeddings, labels, previous, chunk_rows=7)
+    for topic in range(3):
+        expected = _unit(_unit(embeddings[labels == topic]).sum(axis=0, keepdims=True))[0]
+        np.testing.assert_allclose(centroids[topic], expected, rtol=1e-5, atol=1e-6)
+    # No rows: the topic keeps its centroid
+    np.testing.assert_allclose(centroids[3], previous[3])
+    assert counts.tolist() == [15, 15, 15, 0]
+
+
+def test_removed_messages_leave_the_counts():
+    ids, texts, embeddings = _corpus()
+    first = build_model("v1", ids, texts, embeddings)
+    # Drop a third of the messages and edit one
+    keep = np.arange(len(ids)) % 3 != 0
+    ids2 = [message_id for message_id, kept in zip(ids, keep) if kept]
+    texts2 = [text for text, kept in zip(texts, keep) if kept]
+    texts2[0] += " edited"
+    second = build_model("v2", ids2, texts2, embeddings[keep], previous=first)
+    assert second["meta"]["mode"] == "incremental" and second["meta"]["assigned"] == 1
+    assert second["counts"].tolist() == np.bincount(second["labels"], minlength=len(first["centroids"])).tolist()
+    # Unchanged messages keep their topic
+    assert (second["labels"][1:] == first["labels"][keep][1:]).all()
+
+
+def test_only_added_messages_move_the_centroids():
+    ids, texts, embeddings = _corpus()
+    first = build_model("v1", ids[:300], texts[:300], embeddings[:300])
+    second = build_model("v2", ids, texts, embeddings, previous=first)
+    assert second["meta"]["mode"] == "incremental" and second["meta"]["assigned"] == 100
+    assert second["counts"].sum() == first["counts"].sum() + 100
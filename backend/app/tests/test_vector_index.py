@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from services.vector_index import ExactIndex, build_index
+
+
+def _brute_force(vectors, query):
+    vectors = np.asarray(vectors, dtype=np.float64)
+    norms = np.linalg.norm(vectors, axis=1)
+    norms[norms == 0] = 1.0
+    scores = vectors @ (query / np.linalg.norm(query)) / norms
+    return np.argsort(-scores, kind="stable"), scores
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 24)).astype(np.float32)
+    vectors[7] = 0  # a zero vector scores 0 instead of dividing by zero
+    return vectors, rng.normal(size=24).astype(np.float32)
+
+
+@pytest.mark.parametrize("k", [1, 10, 499, 500, 1000])
+def test_top_k_matches_brute_force(corpus, k):
+    vectors, query = corpus
+    order, expected = _brute_force(vectors, query)
+    positions, scores = ExactIndex(vectors).search(query, k=k)
+    assert positions.tolist() == order[:k].tolist()
+    np.testing.assert_allclose(scores, expected[order[:k]], rtol=1e-5, atol=1e-6)
+
+
+def test_threshold_matches_brute_force(corpus):
+    vectors, query = corpus
+    order, expected = _brute_force(vectors, query)
+    positions, scores = ExactIndex(vectors).search(query, threshold=0.2)
+    assert positions.tolist() == [p for p in order.tolist() if expected[p] >= 0.2]
+    assert (scores >= 0.2).all()
+    # k and threshold together: the best k, then those above the threshold
+    positions, _ = ExactIndex(vectors).search(query, k=5, threshold=0.3)
+    assert positions.tolist() == [p for p in order[:5].tolist() if expected[p] >= 0.3]
+
+
+def test_added_vectors_keep_insertion_positions(corpus):
+    vectors, query = corpus
+    index = ExactIndex(vectors[:200])
+    index.add(vectors[200:])
+    index.add(vectors[0])
+    order, _ = _brute_force(np.vstack([vectors, vectors[:1]]), query)
+    assert len(index) == 501
+    assert index.search(query, k=20)[0].tolist() == order[:20].tolist()
+
+
+def test_empty_index():
+    positions, scores = ExactIndex().search(np.ones(4), k=3)
+    assert len(positions) == 0 and len(scores) == 0
+    assert build_index(np.ones((3, 4)), kind="exact").info() == {"kind": "exact", "size": 3, "dim": 4}